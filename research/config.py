@@ -1,4 +1,6 @@
 """Настройки для тестирования производительности БД Mongo и Cassandra."""
+from typing import Optional
+
 from pydantic import BaseSettings
 
 
@@ -12,7 +14,45 @@ class Settings(BaseSettings):
 
     bookmarks_count: int = 100000
     likes_count: int = 100000
-    films_count_factor: float = 1.001
+
+    # Набор данных (dataset.py): кол-во фильмов, пользователей, обзоров и
+    # лайков обзоров, показатели степенных распределений популярности фильмов
+    # и активности пользователей, начальное значение генератора и каталог.
+    films_count: int = 10000
+    users_count: int = 100000
+    reviews_count: int = 20000
+    review_likes_count: int = 100000
+    film_zipf: float = 1.1
+    user_zipf: float = 1.2
+    dataset_seed: int = 42
+    dataset_dir: str = 'data'
+
+    # Кол-во потоков, выполняющих запросы, и частота поступления запросов в
+    # секунду для open loop (None - closed loop, без ограничения частоты).
+    concurrency: int = 16
+    rate: Optional[float] = None
+
+    # Размеры пакетов и кол-во потоков для тестов пакетной записи.
+    ingest_batch_sizes: list[int] = [100, 1000]
+    ingest_concurrency: int = 4
+
+    # Смешанные нагрузки (workloads.py): доли операций каждой нагрузки, кол-во
+    # операций, размер страницы и кол-во страниц последовательного чтения.
+    # Например, WORKLOADS='{"like_storm": {"like": 0.5, "film_card": 0.5}}'.
+    workloads: dict[str, dict[str, float]] = {
+        'film_card': {'film_card': 0.95, 'like': 0.05},
+        'like_storm': {'like': 0.9, 'film_card': 0.1},
+        'reviews_list': {'reviews_by_avg': 0.9, 'review_like': 0.1},
+        'user_dashboard': {'user_dashboard': 0.8, 'bookmark': 0.2},
+        'paged_scan': {'likes_scan': 0.95, 'like': 0.05},
+    }
+    workload_operations: int = 20000
+    workload_page_size: int = 10
+    workload_scan_pages: int = 10
+
+    # Значащие цифры гистограммы задержек и файл с результатами в JSON.
+    histogram_digits: int = 3
+    results_file: str = 'results.json'
 
 
 settings = Settings()
@@ -0,0 +1,147 @@
+"""Воспроизводимый набор данных для тестов БД и нагрузочного тестирования API.
+
+Набор создается генератором (generator.py), зависит только от seed и
+настроек и записывается в каталог в виде двоичных файлов. Файлы читаются
+через memory map без разбора и используются повторно при следующих запусках:
+- films.bin, users.bin, review_ids.bin - UUID по 16 байт, фильмы и обзоры в
+  порядке убывания популярности, review_ids[i] - идентификатор reviews[i];
+- likes.bin, reviews.bin, review_likes.bin, bookmarks.bin - записи по 36 байт:
+  UUID объекта (16 байт), UUID пользователя (16 байт) и значение
+  (int32 little-endian): оценка или место просмотра в секундах;
+- meta.json - параметры генерации и фактическое кол-во записей.
+
+Записи переводятся в UUID пакетами по ROW_BATCH_SIZE по мере чтения, поэтому
+в памяти не держится весь набор в виде объектов Python.
+
+Формат читается и без NumPy (ugs_api/src/bench/files.py).
+
+Пример:
+    python dataset.py
+
+"""
+import json
+import logging
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from types import MappingProxyType
+from typing import Iterator
+from uuid import UUID
+
+import numpy as np
+
+from config import settings
+from generator import UGC_DTYPE, UUID_DTYPE, generate
+
+FORMAT_VERSION = 1
+ROW_BATCH_SIZE = 10000
+RECORD_FORMAT = MappingProxyType({'obj_id': '16s', 'user_id': '16s', 'value': '<i4'})
+
+UGCRow = tuple[UUID, UUID, int]
+
+
+@dataclass
+class Dataset:
+    """Набор данных, прочитанный из каталога через memory map."""
+
+    path: Path
+    meta: dict
+
+    def ids(self, name: str) -> np.ndarray:
+        """Массив UUID (V16) из файла films, users или review_ids."""
+        return np.memmap(self._bin_path(name), dtype=UUID_DTYPE, mode='r')
+
+    def table(self, name: str) -> np.ndarray:
+        """Массив записей из файла likes, reviews, review_likes или bookmarks."""
+        return np.memmap(self._bin_path(name), dtype=UGC_DTYPE, mode='r')
+
+    def uuids(self, name: str) -> Iterator[UUID]:
+        """Идентификаторы в виде UUID для драйверов БД, читаются пакетами."""
+        ids = self.ids(name)
+        batches = (
+            uuid_list(ids[start:start + ROW_BATCH_SIZE])
+            for start in range(0, len(ids), ROW_BATCH_SIZE)
+        )
+        return chain.from_iterable(batches)
+
+    def rows(self, name: str) -> Iterator[UGCRow]:
+        """Записи в виде кортежей (obj_id, user_id, value) для драйверов БД по одной."""
+        return chain.from_iterable(self.batches(name))
+
+    def batches(self, name: str, size: int = ROW_BATCH_SIZE) -> Iterator[list[UGCRow]]:
+        """Записи в виде кортежей (obj_id, user_id, value) пакетами не больше size.
+
+        Args:
+          name: название файла записей;
+          size: кол-во записей в пакете.
+
+        """
+        records = self.table(name)
+        for start in range(0, len(records), size):
+            batch = records[start:start + size]
+            yield list(zip(
+                uuid_list(batch['obj_id']),
+                uuid_list(batch['user_id']),
+                batch['value'].tolist(),
+            ))
+
+    def _bin_path(self, name: str) -> Path:
+        return self.path / '{0}.bin'.format(name)
+
+
+def generation_spec(seed: int) -> dict:
+    """Параметры генерации: при их изменении набор создается заново."""
+    return {
+        'version': FORMAT_VERSION,
+        'seed': seed,
+        'films': settings.films_count,
+        'users': settings.users_count,
+        'likes': settings.likes_count,
+        'reviews': settings.reviews_count,
+        'review_likes': settings.review_likes_count,
+        'bookmarks': settings.bookmarks_count,
+        'film_zipf': settings.film_zipf,
+        'user_zipf': settings.user_zipf,
+    }
+
+
+def load_or_generate(seed: int) -> Dataset:
+    """Читаем набор из settings.dataset_dir или создаем его.
+
+    Args:
+      seed: начальное значение генератора, у каждого seed свой каталог.
+
+    """
+    path = Path(settings.dataset_dir) / 'seed_{0}'.format(seed)
+    spec = generation_spec(seed)
+    meta_path = path / 'meta.json'
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        if meta['spec'] == spec:
+            return Dataset(path, meta)
+
+    logging.info('Generating dataset {0}'.format(path))
+    arrays = generate(spec)
+    path.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for name, array in arrays.items():
+        array.tofile(path / '{0}.bin'.format(name))
+        counts[name] = len(array)
+    meta = {
+        'spec': spec,
+        'counts': counts,
+        'record_format': dict(RECORD_FORMAT),
+    }
+    meta_path.write_text(json.dumps(meta, indent=2))
+    return Dataset(path, meta)
+
+
+def uuid_list(raw: np.ndarray) -> list[UUID]:
+    """Массив V16 в список UUID, tolist() возвращает bytes."""
+    return [UUID(bytes=uuid_bytes) for uuid_bytes in raw.tolist()]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    for dataset_seed in (settings.dataset_seed, settings.dataset_seed + 1):
+        logging.info(load_or_generate(dataset_seed).meta['counts'])
@@ -0,0 +1,297 @@
+"""Модель данных ugs_api в Cassandra для смешанных нагрузок (workloads.py).
+
+Таблицы строятся под запросы: кроме таблиц с ключом (объект, пользователь)
+оценки, обзоры и закладки дублируются в таблицы с партицией по фильму или
+пользователю и сортировкой по убыванию даты. Рейтинг хранится в таблицах
+счетчиков (counter).
+
+Объединений в Cassandra нет, поэтому список обзоров по средней оценке
+собирается в приложении: обзоры фильма, затем счетчики их рейтинга одним
+запросом с IN и сортировка. При замене оценки строка со старой датой
+удаляется из таблиц по фильму и пользователю в том же LOGGED BATCH.
+
+Запросы операции выполняются последовательно, задержка операции - сумма
+задержек запросов.
+
+"""
+import heapq
+from datetime import datetime
+from operator import itemgetter
+from types import MappingProxyType
+from typing import Callable, Iterable, Iterator
+
+from cassandra.cluster import Session
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import BatchStatement, BatchType
+
+from config import settings
+from dataset import Dataset, UGCRow
+from load import batched
+from workloads import Request, ratings, row_date
+
+LOAD_CONCURRENCY = 100
+LOAD_BATCH_SIZE = 10000
+# Порядок колонок для вставки строк (объект, пользователь, значение, дата).
+AS_IS = tuple
+BY_OBJ = itemgetter(0, 3, 1, 2)
+BY_USER = itemgetter(1, 3, 0, 2)
+USER_FIRST = itemgetter(1, 0, 2, 3)
+
+SQL_CREATE_WORKLOAD_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_likes (
+        film_id uuid, user_id uuid, score int, date timestamp,
+        PRIMARY KEY (film_id, user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_likes_by_film (
+        film_id uuid, date timestamp, user_id uuid, score int,
+        PRIMARY KEY (film_id, date, user_id)
+    ) WITH CLUSTERING ORDER BY (date DESC, user_id ASC)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_likes_by_user (
+        user_id uuid, date timestamp, film_id uuid, score int,
+        PRIMARY KEY (user_id, date, film_id)
+    ) WITH CLUSTERING ORDER BY (date DESC, film_id ASC)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_film_rating (
+        film_id uuid PRIMARY KEY, sum counter, count counter
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_reviews_by_film (
+        film_id uuid, date timestamp, user_id uuid, review_id uuid,
+        PRIMARY KEY (film_id, date, user_id)
+    ) WITH CLUSTERING ORDER BY (date DESC, user_id ASC)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_reviews_by_user (
+        user_id uuid, date timestamp, film_id uuid, review_id uuid,
+        PRIMARY KEY (user_id, date, film_id)
+    ) WITH CLUSTERING ORDER BY (date DESC, film_id ASC)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_review_likes (
+        review_id uuid, user_id uuid, score int, date timestamp,
+        PRIMARY KEY (review_id, user_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_review_rating (
+        review_id uuid PRIMARY KEY, sum counter, count counter
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_bookmarks (
+        user_id uuid, film_id uuid, timestamp int, date timestamp,
+        PRIMARY KEY (user_id, film_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS research.wl_bookmarks_by_user (
+        user_id uuid, date timestamp, film_id uuid, timestamp int,
+        PRIMARY KEY (user_id, date, film_id)
+    ) WITH CLUSTERING ORDER BY (date DESC, film_id ASC)
+    """,
+)
+
+SQL_WORKLOAD = MappingProxyType({
+    'insert_like': 'INSERT INTO research.wl_likes(film_id, user_id, score, date) VALUES(?, ?, ?, ?)',
+    'insert_like_by_film': 'INSERT INTO research.wl_likes_by_film(film_id, date, user_id, score) VALUES(?, ?, ?, ?)',
+    'insert_like_by_user': 'INSERT INTO research.wl_likes_by_user(user_id, date, film_id, score) VALUES(?, ?, ?, ?)',
+    'delete_like_by_film': 'DELETE FROM research.wl_likes_by_film WHERE film_id=? AND date=? AND user_id=?',
+    'delete_like_by_user': 'DELETE FROM research.wl_likes_by_user WHERE user_id=? AND date=? AND film_id=?',
+    'select_like': 'SELECT score, date FROM research.wl_likes WHERE film_id=? AND user_id=?',
+    'update_film_rating': 'UPDATE research.wl_film_rating SET sum = sum + ?, count = count + ? WHERE film_id=?',
+    'select_film_rating': 'SELECT sum, count FROM research.wl_film_rating WHERE film_id=?',
+    'recent_likes_by_film': 'SELECT * FROM research.wl_likes_by_film WHERE film_id=? LIMIT ?',
+    'scan_likes_by_film': 'SELECT * FROM research.wl_likes_by_film WHERE film_id=?',
+    'recent_likes_by_user': 'SELECT * FROM research.wl_likes_by_user WHERE user_id=? LIMIT ?',
+    'insert_review_by_film': (
+        'INSERT INTO research.wl_reviews_by_film(film_id, date, user_id, review_id) VALUES(?, ?, ?, ?)'
+    ),
+    'insert_review_by_user': (
+        'INSERT INTO research.wl_reviews_by_user(user_id, date, film_id, review_id) VALUES(?, ?, ?, ?)'
+    ),
+    'recent_reviews_by_film': 'SELECT * FROM research.wl_reviews_by_film WHERE film_id=? LIMIT ?',
+    'review_ids_by_film': 'SELECT review_id FROM research.wl_reviews_by_film WHERE film_id=?',
+    'recent_reviews_by_user': 'SELECT * FROM research.wl_reviews_by_user WHERE user_id=? LIMIT ?',
+    'insert_review_like': 'INSERT INTO research.wl_review_likes(review_id, user_id, score, date) VALUES(?, ?, ?, ?)',
+    'select_review_like': 'SELECT score FROM research.wl_review_likes WHERE review_id=? AND user_id=?',
+    'update_review_rating': 'UPDATE research.wl_review_rating SET sum = sum + ?, count = count + ? WHERE review_id=?',
+    'select_review_ratings': 'SELECT review_id, sum, count FROM research.wl_review_rating WHERE review_id IN ?',
+    'insert_bookmark': 'INSERT INTO research.wl_bookmarks(user_id, film_id, timestamp, date) VALUES(?, ?, ?, ?)',
+    'insert_bookmark_by_user': (
+        'INSERT INTO research.wl_bookmarks_by_user(user_id, date, film_id, timestamp) VALUES(?, ?, ?, ?)'
+    ),
+    'delete_bookmark_by_user': 'DELETE FROM research.wl_bookmarks_by_user WHERE user_id=? AND date=? AND film_id=?',
+    'select_bookmark': 'SELECT timestamp, date FROM research.wl_bookmarks WHERE user_id=? AND film_id=?',
+    'recent_bookmarks_by_user': 'SELECT * FROM research.wl_bookmarks_by_user WHERE user_id=? LIMIT ?',
+})
+
+
+class CassandraReads:
+    """Операции чтения смешанных нагрузок в Cassandra."""
+
+    def __init__(self, session: Session):
+        """Создание таблиц и подготовка запросов.
+
+        Args:
+          session: сессия Cassandra, пространство ключей research уже создано.
+
+        """
+        self.session = session
+        for create_sql in SQL_CREATE_WORKLOAD_TABLES:
+            session.execute(create_sql)
+        statements = SQL_WORKLOAD.items()
+        self.queries = {name: session.prepare(sql) for name, sql in statements}
+        # Постраничное чтение средствами драйвера (paging state).
+        self.queries['scan_likes_by_film'].fetch_size = settings.workload_page_size
+
+    def film_card(self, request: Request):
+        """Карточка фильма: рейтинг, последние оценки и обзоры, закладка пользователя."""
+        page_size = settings.workload_page_size
+        self._execute('select_film_rating', request.obj_id).one()
+        self._execute('recent_likes_by_film', request.obj_id, page_size).all()
+        self._execute('recent_reviews_by_film', request.obj_id, page_size).all()
+        self._execute('select_bookmark', request.user_id, request.obj_id).one()
+
+    def reviews_by_avg(self, request: Request):
+        """Страница обзоров фильма по убыванию средней оценки лайков обзора."""
+        review_ids = [row.review_id for row in self._execute('review_ids_by_film', request.obj_id)]
+        if not review_ids:
+            return
+        review_ratings = self._execute('select_review_ratings', review_ids).all()
+        heapq.nlargest(settings.workload_page_size, review_ratings, key=_average)
+
+    def user_dashboard(self, request: Request):
+        """Личный кабинет: последние оценки, обзоры и закладки пользователя."""
+        page_size = settings.workload_page_size
+        for query_name in ('recent_likes_by_user', 'recent_reviews_by_user', 'recent_bookmarks_by_user'):
+            self._execute(query_name, request.user_id, page_size).all()
+
+    def likes_scan(self, request: Request):
+        """Постраничное чтение оценок фильма от новых к старым.
+
+        Страницы читаются по paging state драйвера, как по курсору в API.
+
+        """
+        page = self._execute('scan_likes_by_film', request.obj_id)
+        for _ in range(settings.workload_scan_pages - 1):
+            if not page.has_more_pages:
+                return
+            page.fetch_next_page()
+
+    def _execute(self, query_name: str, *query_args):
+        return self.session.execute(self.queries[query_name], query_args)
+
+
+class CassandraWorkload(CassandraReads):
+    """Операции смешанных нагрузок в Cassandra: загрузка данных, чтение и запись."""
+
+    def load(self, dataset: Dataset):
+        """Загружаем набор данных во все таблицы.
+
+        Args:
+          dataset: набор данных.
+
+        """
+        self._load(
+            _dated(dataset.rows('likes')),
+            ('insert_like', AS_IS), ('insert_like_by_film', BY_OBJ), ('insert_like_by_user', BY_USER),
+        )
+        self._load(
+            _dated(_review_rows(dataset)),
+            ('insert_review_by_film', BY_OBJ), ('insert_review_by_user', BY_USER),
+        )
+        self._load(_dated(dataset.rows('review_likes')), ('insert_review_like', AS_IS))
+        self._load(
+            _dated(dataset.rows('bookmarks')),
+            ('insert_bookmark', USER_FIRST), ('insert_bookmark_by_user', BY_USER),
+        )
+        self._load(_rating_rows(dataset.rows('likes')), ('update_film_rating', AS_IS))
+        self._load(_rating_rows(dataset.rows('review_likes')), ('update_review_rating', AS_IS))
+
+    def like(self, request: Request):
+        """Оценка фильма с изменением счетчиков рейтинга.
+
+        Старая оценка читается, чтобы удалить ее строки из таблиц по фильму и
+        пользователю и изменить счетчики на разницу оценок.
+
+        """
+        film_id, user_id, score = request.obj_id, request.user_id, request.amount
+        old_like = self._execute('select_like', film_id, user_id).one()
+        date = datetime.now()
+        batch = BatchStatement(batch_type=BatchType.LOGGED)
+        if old_like:
+            batch.add(self.queries['delete_like_by_film'], (film_id, old_like.date, user_id))
+            batch.add(self.queries['delete_like_by_user'], (user_id, old_like.date, film_id))
+        batch.add(self.queries['insert_like'], (film_id, user_id, score, date))
+        batch.add(self.queries['insert_like_by_film'], (film_id, date, user_id, score))
+        batch.add(self.queries['insert_like_by_user'], (user_id, date, film_id, score))
+        self.session.execute(batch)
+        self._execute('update_film_rating', *_rating_delta(score, old_like), film_id)
+
+    def review_like(self, request: Request):
+        """Оценка обзора с изменением счетчиков рейтинга."""
+        review_id, user_id, score = request.obj_id, request.user_id, request.amount
+        old_like = self._execute('select_review_like', review_id, user_id).one()
+        self._execute('insert_review_like', review_id, user_id, score, datetime.now())
+        self._execute('update_review_rating', *_rating_delta(score, old_like), review_id)
+
+    def bookmark(self, request: Request):
+        """Закладка с местом просмотра."""
+        film_id, user_id, timestamp = request.obj_id, request.user_id, request.amount
+        old_bookmark = self._execute('select_bookmark', user_id, film_id).one()
+        date = datetime.now()
+        batch = BatchStatement(batch_type=BatchType.LOGGED)
+        if old_bookmark:
+            batch.add(self.queries['delete_bookmark_by_user'], (user_id, old_bookmark.date, film_id))
+        batch.add(self.queries['insert_bookmark'], (user_id, film_id, timestamp, date))
+        batch.add(self.queries['insert_bookmark_by_user'], (user_id, date, film_id, timestamp))
+        self.session.execute(batch)
+
+    def _load(self, rows: Iterable[tuple], *tables: tuple[str, Callable]):
+        """Пишем строки пакетами в каждую из таблиц (запрос, порядок колонок)."""
+        for batch in batched(rows, LOAD_BATCH_SIZE):
+            for query_name, columns in tables:
+                execute_concurrent_with_args(
+                    self.session,
+                    self.queries[query_name],
+                    list(map(columns, batch)),
+                    concurrency=LOAD_CONCURRENCY,
+                    raise_on_first_error=True,
+                )
+
+
+def _dated(rows: Iterable[tuple]) -> Iterator[tuple]:
+    """Добавляем к строкам набора данных дату."""
+    return ((*row, row_date(index)) for index, row in enumerate(rows))
+
+
+def _review_rows(dataset: Dataset) -> Iterator[tuple]:
+    """Обзоры (фильм, пользователь, обзор), review_ids[i] - идентификатор reviews[i]."""
+    reviews = zip(dataset.rows('reviews'), dataset.uuids('review_ids'))
+    return ((obj_id, user_id, review_id) for (obj_id, user_id, _), review_id in reviews)
+
+
+def _rating_rows(rows: Iterable[UGCRow]) -> list[tuple]:
+    """Параметры изменения счетчиков рейтинга (сумма, кол-во, объект)."""
+    totals = ratings(rows).items()
+    return [(score_sum, score_count, obj_id) for obj_id, (score_sum, score_count) in totals]
+
+
+def _average(review_rating) -> float:
+    if not review_rating.count:
+        return 0
+    return review_rating.sum / review_rating.count
+
+
+def _rating_delta(score: int, old_like) -> tuple[int, int]:
+    """Изменение суммы и кол-ва оценок при замене старой оценки новой."""
+    if old_like:
+        return score - old_like.score, 0
+    return score, 1
@@ -1,10 +1,15 @@
 """Модуль с тестами для Cassandra."""
-import random
-from datetime import datetime
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Iterable
 
-from cassandra.cluster import Cluster
+from cassandra.cluster import Cluster, Session
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import BatchStatement, BatchType, PreparedStatement
 
 from config import settings
+from load import LoadResult, LoadRunner, chunks
 
 
 SQL_CREATE_KEYSPACE = """
@@ -20,7 +25,7 @@ SQL_CREATE_BOOKMARKS = """
 """
 
 SQL_CREATE_LIKES = """
-    CREATE TABLE IF NOT EXISTS research.likes (
+    CREATE TABLE IF NOT EXISTS research.{0} (
         film_id uuid,
         user_id uuid,
         score smallint,
@@ -28,6 +33,8 @@ SQL_CREATE_LIKES = """
     )
 """
 
+SQL_INSERT_LIKE = 'INSERT INTO research.{0}(film_id, user_id, score) VALUES(?, ?, ?)'
+
 
 class TestCassandra:
     """Класс с тестами для Cassandra."""
@@ -36,66 +43,99 @@ class TestCassandra:
         """Подключение к БД и создание необходимых таблиц."""
         self.cluster = Cluster([settings.cassandra_host])
         self.session = self.cluster.connect()
+        self.runner = LoadRunner(settings.concurrency, settings.rate, settings.histogram_digits)
 
         self.session.execute(SQL_CREATE_KEYSPACE)
 
         self.session.execute(SQL_CREATE_BOOKMARKS)
-        self.session.execute(SQL_CREATE_LIKES)
+        self.session.execute(SQL_CREATE_LIKES.format('likes'))
+        self.session.execute(SQL_CREATE_LIKES.format('likes_ingest'))
+
+        self.insert_like = self.session.prepare(SQL_INSERT_LIKE.format('likes'))
+        self.insert_like_ingest = self.session.prepare(SQL_INSERT_LIKE.format('likes_ingest'))
+        self.ingest_runner = LoadRunner(settings.ingest_concurrency, digits=settings.histogram_digits)
 
     def close(self):
         """Очистка БД и закрытие соединения."""
         self.session.execute('DROP KEYSPACE research')
         self.cluster.shutdown()
 
-    def bookmarks(self, bookmarks_data: list) -> list:
+    def bookmarks(self, bookmarks_data: Iterable, user_ids: list) -> LoadResult:
         """Тесты на чтение закладок."""
         insert = self.session.prepare('INSERT INTO research.bookmarks(user_id, film_ids) VALUES(?, ?)')
-        for user_id, film_id in bookmarks_data:
-            self.session.execute(insert, (user_id, (film_id,)))
-
-        res = []
+        for user_id, film_ids in bookmarks_data:
+            self.session.execute(insert, (user_id, set(film_ids)))
 
-        for _ in range(settings.bookmarks_count):
-            start = datetime.now()
+        return self.runner.run(partial(_find_bookmark, self.session), user_ids)
 
-            bookmark = random.choice(bookmarks_data)
-            self.session.execute('SELECT * FROM research.bookmarks WHERE user_id=%s', (bookmark[0],)).one()
+    def likes(self, likes_data: Iterable, film_ids: list) -> LoadResult:
+        """Тесты на чтение средней оценки кинопроизведения."""
+        for row in likes_data:
+            self.session.execute(self.insert_like, row)
 
-            end = datetime.now()
-            res.append((end - start).microseconds)
+        return self.runner.run(partial(_avg_score, self.session), film_ids)
 
+    def likes_insert(self, likes_data: list) -> LoadResult:
+        """Тесты на скорость записи лайков и последующем чтении средней оценки фильма."""
+        return self.runner.run(partial(_insert_like, self.session, self.insert_like), likes_data)
+
+    def likes_ingest(self, likes_data: list, batch_size: int) -> dict[str, LoadResult]:
+        """Тесты на скорость пакетной записи лайков.
+
+        concurrent - пакеты по batch_size строк, строки пакета записываются
+        параллельными запросами (execute_concurrent);
+        unlogged_batch - строки одного фильма (партиции) записываются одним
+        UNLOGGED BATCH не больше batch_size строк.
+
+        Задержка измеряется для пакета, пакеты записываются в
+        settings.ingest_concurrency потоков.
+
+        """
+        by_film = sorted(likes_data, key=itemgetter(0))
+        partition_batches = [
+            _unlogged_batch(self.insert_like_ingest, batch)
+            for _, partition in groupby(by_film, key=itemgetter(0))
+            for batch in chunks(list(partition), batch_size)
+        ]
+        rows = len(likes_data)
+        execute_concurrent = partial(_execute_concurrent, self.session, self.insert_like_ingest)
+        return {
+            'concurrent': self._ingest(execute_concurrent, chunks(likes_data, batch_size), rows),
+            'unlogged_batch': self._ingest(self.session.execute, partition_batches, rows),
+        }
+
+    def _ingest(self, operation: Callable, batches: list, rows: int) -> LoadResult:
+        """Запись пакетов в пустую таблицу."""
+        self.session.execute('TRUNCATE research.likes_ingest')
+        res = self.ingest_runner.run(operation, batches)
+        res.rows = rows
         return res
 
-    def likes(self, likes_data: list, film_ids: list) -> list:
-        """Тесты на чтение средней оценки кинопроизведения."""
-        insert = self.session.prepare('INSERT INTO research.likes(film_id, user_id, score) VALUES(?, ?, ?)')
-        for row in likes_data:
-            self.session.execute(insert, row)
-
-        res = []
 
-        for film_id in film_ids:
-            start = datetime.now()
+def _execute_concurrent(session: Session, insert: PreparedStatement, rows):
+    """Запись строк параллельными запросами."""
+    execute_concurrent_with_args(session, insert, rows, raise_on_first_error=True)
 
-            self.session.execute('SELECT AVG (score) FROM research.likes WHERE film_id=%s', (film_id,)).one()
 
-            end = datetime.now()
-            res.append((end - start).microseconds)
+def _unlogged_batch(insert: PreparedStatement, rows) -> BatchStatement:
+    """Пакет строк одной партиции без журнала пакетов (batchlog)."""
+    batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+    for row in rows:
+        batch.add(insert, row)
+    return batch
 
-        return res
 
-    def likes_insert(self, likes_data: list) -> list:
-        """Тесты на скорость записи лайков и последующем чтении средней оценки фильма."""
-        res = []
+def _find_bookmark(session: Session, user_id):
+    """Закладки пользователя."""
+    session.execute('SELECT * FROM research.bookmarks WHERE user_id=%s', (user_id,)).one()
 
-        insert = self.session.prepare('INSERT INTO research.likes(film_id, user_id, score) VALUES(?, ?, ?)')
-        for film_id, user_id, score in likes_data:
-            start = datetime.now()
 
-            self.session.execute(insert, (film_id, user_id, score))
-            self.session.execute('SELECT AVG (score) FROM research.likes WHERE film_id=%s', (film_id,)).one()
+def _insert_like(session: Session, insert: PreparedStatement, like: tuple):
+    """Запись лайка и чтение средней оценки фильма."""
+    session.execute(insert, like)
+    _avg_score(session, like[0])
 
-            end = datetime.now()
-            res.append((end - start).microseconds)
 
-        return res
+def _avg_score(session: Session, film_id):
+    """Средняя оценка фильма."""
+    session.execute('SELECT AVG (score) FROM research.likes WHERE film_id=%s', (film_id,)).one()
@@ -0,0 +1,196 @@
+"""Модель данных ugs_api в Mongo для смешанных нагрузок (workloads.py).
+
+Как и в API, оценки, обзоры и закладки хранятся записями (obj_id, user_id,
+date, ...) с индексами (obj_id, user_id), (obj_id, date) и (user_id, date),
+рейтинг - счетчиками в отдельных коллекциях. Список обзоров, отсортированный
+по средней оценке, собирается объединением с лайками обзоров ($lookup).
+
+Запросы операции выполняются последовательно, задержка операции - сумма
+задержек запросов.
+
+"""
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+from config import settings
+from dataset import Dataset, UGCRow
+from load import batched
+from workloads import Request, ratings, row_date
+
+LOAD_BATCH_SIZE = 10000
+UGC_INDEXES = (
+    IndexModel([('obj_id', ASCENDING), ('user_id', ASCENDING)], unique=True),
+    IndexModel([('obj_id', ASCENDING), ('date', DESCENDING)]),
+    IndexModel([('user_id', ASCENDING), ('date', DESCENDING)]),
+)
+RATING_INDEXES = (
+    IndexModel([('obj_id', ASCENDING)], unique=True),
+)
+REVIEW_INDEXES = (
+    *UGC_INDEXES,
+    IndexModel([('review_id', ASCENDING)], unique=True),
+)
+RECENT_SORT = (('date', DESCENDING),)
+SCAN_SORT = (('date', DESCENDING), ('_id', DESCENDING))
+
+
+class MongoReads:
+    """Операции чтения смешанных нагрузок в Mongo."""
+
+    def __init__(self, db: Database):
+        """Конструктор класса.
+
+        Args:
+          db: база данных pymongo.
+
+        """
+        self.likes = db.wl_like
+        self.like_ratings = db.wl_like_rating
+        self.reviews = db.wl_review
+        self.review_likes = db.wl_review_like
+        self.review_like_ratings = db.wl_review_like_rating
+        self.bookmarks = db.wl_bookmarks
+
+    def film_card(self, request: Request):
+        """Карточка фильма: рейтинг, последние оценки и обзоры, закладка пользователя."""
+        film_id = str(request.obj_id)
+        self.like_ratings.find_one({'obj_id': film_id})
+        _recent(self.likes, {'obj_id': film_id})
+        _recent(self.reviews, {'obj_id': film_id})
+        self.bookmarks.find_one({'obj_id': film_id, 'user_id': str(request.user_id)})
+
+    def reviews_by_avg(self, request: Request):
+        """Страница обзоров фильма по убыванию средней оценки лайков обзора."""
+        pipeline: list[dict] = [
+            {'$match': {'obj_id': str(request.obj_id)}},
+            {'$lookup': {
+                'from': self.review_likes.name,
+                'localField': 'review_id',
+                'foreignField': 'obj_id',
+                'as': 'related_object',
+            }},
+            {'$addFields': {
+                'avg': {'$avg': '$related_object.score'},
+                'sum': {'$sum': '$related_object.score'},
+                'count': {'$size': '$related_object'},
+            }},
+            {'$sort': {'avg': DESCENDING, '_id': DESCENDING}},
+            {'$limit': settings.workload_page_size},
+        ]
+        list(self.reviews.aggregate(pipeline))
+
+    def user_dashboard(self, request: Request):
+        """Личный кабинет: последние оценки, обзоры и закладки пользователя."""
+        search = {'user_id': str(request.user_id)}
+        for collection in (self.likes, self.reviews, self.bookmarks):
+            _recent(collection, search)
+
+    def likes_scan(self, request: Request):
+        """Постраничное чтение оценок фильма от новых к старым.
+
+        Следующая страница начинается сразу за последней записью предыдущей
+        (keyset pagination), как при чтении с курсором в API.
+
+        """
+        search = {'obj_id': str(request.obj_id)}
+        page_size = settings.workload_page_size
+        query: dict = search
+        for _ in range(settings.workload_scan_pages):
+            cursor = self.likes.find(query).sort(list(SCAN_SORT))
+            docs = list(cursor.limit(page_size))
+            if len(docs) < page_size:
+                return
+            last = docs[-1]
+            after = {'$or': [
+                {'date': {'$lt': last['date']}},
+                {'date': last['date'], '_id': {'$lt': last['_id']}},
+            ]}
+            query = {'$and': [search, after]}
+
+
+class MongoWorkload(MongoReads):
+    """Операции смешанных нагрузок в Mongo: загрузка данных, чтение и запись."""
+
+    def load(self, dataset: Dataset):
+        """Загружаем набор данных в пустые коллекции и создаем индексы.
+
+        Args:
+          dataset: набор данных.
+
+        """
+        collections = (
+            (self.likes, _docs(dataset.rows('likes'), 'score'), UGC_INDEXES),
+            (self.like_ratings, _rating_docs(dataset.rows('likes')), RATING_INDEXES),
+            (self.reviews, _review_docs(dataset), REVIEW_INDEXES),
+            (self.review_likes, _docs(dataset.rows('review_likes'), 'score'), UGC_INDEXES),
+            (self.review_like_ratings, _rating_docs(dataset.rows('review_likes')), RATING_INDEXES),
+            (self.bookmarks, _docs(dataset.rows('bookmarks'), 'timestamp'), UGC_INDEXES),
+        )
+        for collection, docs, indexes in collections:
+            collection.drop()
+            for batch in batched(docs, LOAD_BATCH_SIZE):
+                collection.insert_many(batch, ordered=False)
+            collection.create_indexes(list(indexes))
+
+    def like(self, request: Request):
+        """Оценка фильма с изменением счетчиков рейтинга."""
+        self._rate(self.likes, self.like_ratings, request)
+
+    def review_like(self, request: Request):
+        """Оценка обзора с изменением счетчиков рейтинга."""
+        self._rate(self.review_likes, self.review_like_ratings, request)
+
+    def bookmark(self, request: Request):
+        """Закладка с местом просмотра."""
+        search = {'obj_id': str(request.obj_id), 'user_id': str(request.user_id)}
+        self.bookmarks.replace_one(
+            search, dict(search, timestamp=request.amount, date=datetime.now()), upsert=True,
+        )
+
+    def _rate(self, collection: Collection, rating_collection: Collection, request: Request):
+        """Замена оценки и изменение счетчиков на разницу со старой оценкой."""
+        obj_id = str(request.obj_id)
+        search = {'obj_id': obj_id, 'user_id': str(request.user_id)}
+        old_doc = collection.find_one_and_replace(
+            search,
+            dict(search, score=request.amount, date=datetime.now()),
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+        delta = {'sum': request.amount, 'count': 1}
+        if old_doc:
+            delta = {'sum': request.amount - old_doc['score'], 'count': 0}
+        rating_collection.update_one({'obj_id': obj_id}, {'$inc': delta}, upsert=True)
+
+
+def _recent(collection: Collection, search: dict):
+    """Последние записи по дате."""
+    cursor = collection.find(search).sort(list(RECENT_SORT))
+    list(cursor.limit(settings.workload_page_size))
+
+
+def _docs(rows: Iterable[UGCRow], field: str) -> Iterator[dict]:
+    for index, (obj_id, user_id, row_value) in enumerate(rows):
+        doc = {'obj_id': str(obj_id), 'user_id': str(user_id)}
+        doc.update({'date': row_date(index), field: row_value})
+        yield doc
+
+
+def _review_docs(dataset: Dataset) -> Iterator[dict]:
+    """Обзоры с идентификаторами, review_ids[i] - идентификатор reviews[i]."""
+    reviews = _docs(dataset.rows('reviews'), 'score')
+    for review, review_id in zip(reviews, dataset.uuids('review_ids')):
+        review['review_id'] = str(review_id)
+        yield review
+
+
+def _rating_docs(rows: Iterable[UGCRow]) -> Iterator[dict]:
+    totals = ratings(rows).items()
+    return (
+        {'obj_id': str(obj_id), 'sum': score_sum, 'count': score_count}
+        for obj_id, (score_sum, score_count) in totals
+    )
@@ -1,10 +1,15 @@
 """Модуль с тестами для Mongo."""
-import random
-from datetime import datetime
+from functools import partial
+from typing import Callable, Iterable
 
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.collection import Collection
 
 from config import settings
+from load import LoadResult, LoadRunner, batched, chunks
+
+LIKE_KEY = (('film_id', 1), ('user_id', 1))
+LOAD_BATCH_SIZE = 10000
 
 
 class TestMongo:
@@ -14,6 +19,8 @@ class TestMongo:
         """Подключение к БД и создание индексов."""
         self.client = MongoClient(settings.mongo_host, settings.mongo_port)
         self.db = self.client.research
+        self.runner = LoadRunner(settings.concurrency, settings.rate, settings.histogram_digits)
+        self.ingest_runner = LoadRunner(settings.ingest_concurrency, digits=settings.histogram_digits)
 
         self.db.bookmarks.create_index('user_id', unique=True, sparse=True)
         self.db.likes.create_index('film_id', sparse=True)
@@ -23,85 +30,110 @@ class TestMongo:
         self.client.drop_database('research')
         self.client.close()
 
-    def bookmarks(self, bookmarks_data: list) -> list:
+    def bookmarks(self, bookmarks_data: Iterable, user_ids: list) -> LoadResult:
         """Тесты на чтение закладок."""
-        self.db.bookmarks.insert_many([
+        docs = (
             {
                 'user_id': str(user_id),
-                'film_ids': [str(film_id)],
-            } for user_id, film_id in bookmarks_data
-        ])
-
-        res = []
+                'film_ids': [str(film_id) for film_id in film_ids],
+            } for user_id, film_ids in bookmarks_data
+        )
+        for batch in batched(docs, LOAD_BATCH_SIZE):
+            self.db.bookmarks.insert_many(batch)
 
-        for _ in range(settings.bookmarks_count):
-            start = datetime.now()
+        find_bookmark = partial(_find_bookmark, self.db.bookmarks)
+        return self.runner.run(find_bookmark, [str(user_id) for user_id in user_ids])
 
-            user_id, film_id = random.choice(bookmarks_data)
-            self.db.bookmarks.find_one({'user_id': str(user_id)})
+    def likes(self, likes_data: Iterable, film_ids: list) -> LoadResult:
+        """Тесты на чтение средней оценки кинопроизведения."""
+        for batch in batched(map(_like_doc, likes_data), LOAD_BATCH_SIZE):
+            self.db.likes.insert_many(batch)
 
-            res.append((datetime.now() - start).microseconds)
+        return self.runner.run(partial(_avg_score, self.db.likes), film_ids)
 
+    def likes_insert(self, likes_data: list) -> LoadResult:
+        """Тесты на скорость записи лайков и последующем чтении средней оценки фильма."""
+        return self.runner.run(partial(_insert_like, self.db.likes), likes_data)
+
+    def likes_ingest(self, likes_data: list, batch_size: int) -> dict[str, LoadResult]:
+        """Тесты на скорость пакетной записи лайков.
+
+        Пакеты по batch_size строк записываются в коллекцию с уникальным
+        индексом (film_id, user_id), как в API:
+        insert_many - вставка документов;
+        bulk_upsert - bulk_write из UpdateOne с upsert, как при записи оценок.
+        Каждый способ проверяется с ordered=True и ordered=False.
+
+        Задержка измеряется для пакета, пакеты записываются в
+        settings.ingest_concurrency потоков.
+
+        """
+        ingest = {}
+        for ordered in (True, False):
+            suffix = 'ordered' if ordered else 'unordered'
+            ingest['insert_many_{0}'.format(suffix)] = self._ingest(
+                partial(self.db.likes_ingest.insert_many, ordered=ordered),
+                likes_data,
+                batch_size,
+                _like_doc,
+            )
+            ingest['bulk_upsert_{0}'.format(suffix)] = self._ingest(
+                partial(self.db.likes_ingest.bulk_write, ordered=ordered),
+                likes_data,
+                batch_size,
+                _like_upsert,
+            )
+        return ingest
+
+    def _ingest(
+        self, operation: Callable, likes_data: list, batch_size: int, to_request: Callable,
+    ) -> LoadResult:
+        """Запись пакетов в пустую коллекцию, запросы готовятся заранее."""
+        self.db.likes_ingest.drop()
+        self.db.likes_ingest.create_index(LIKE_KEY, unique=True)
+        requests = [to_request(like) for like in likes_data]
+        batches = chunks(requests, batch_size)
+        res = self.ingest_runner.run(operation, batches)
+        res.rows = len(likes_data)
         return res
 
-    def likes(self, likes_data: list, film_ids: list) -> list:
-        """Тесты на чтение средней оценки кинопроизведения."""
-        self.db.likes.insert_many([
-            {
-                'film_id': str(film_id),
-                'user_id': str(user_id),
-                'score': score,
-            } for film_id, user_id, score in likes_data
-        ])
 
-        res = []
+def _like_doc(like: tuple) -> dict:
+    film_id, user_id, score = like
+    return {'film_id': str(film_id), 'user_id': str(user_id), 'score': score}
 
-        for film_id in film_ids:
-            pipeline = [
-                {'$match': {
-                    'film_id': str(film_id),
-                }},
-                {'$group': {
-                    '_id': None,
-                    'avgscore': {'$avg': '$score'},
-                }},
-            ]
 
-            start = datetime.now()
+def _like_upsert(like: tuple) -> UpdateOne:
+    film_id, user_id, score = like
+    return UpdateOne(
+        {'film_id': str(film_id), 'user_id': str(user_id)},
+        {'$set': {'score': score}},
+        upsert=True,
+    )
 
-            for _ in self.db.likes.aggregate(pipeline):
-                pass
 
-            res.append((datetime.now() - start).microseconds)
+def _find_bookmark(bookmarks: Collection, user_id: str):
+    """Закладки пользователя."""
+    bookmarks.find_one({'user_id': user_id})
 
-        return res
 
-    def likes_insert(self, likes_data: list) -> list:
-        """Тесты на скорость записи лайков и последующем чтении средней оценки фильма."""
-        res = []
-
-        for film_id, user_id, score in likes_data:
-            pipeline = [
-                {'$match': {
-                    'film_id': str(film_id),
-                }},
-                {'$group': {
-                    '_id': None,
-                    'avgscore': {'$avg': '$score'},
-                }},
-            ]
-
-            start = datetime.now()
-
-            self.db.likes.insert_one({
-                'film_id': str(film_id),
-                'user_id': str(user_id),
-                'score': score,
-            })
+def _insert_like(likes: Collection, like: tuple):
+    """Запись лайка и чтение средней оценки фильма."""
+    likes.insert_one(_like_doc(like))
+    _avg_score(likes, like[0])
 
-            for _ in self.db.likes.aggregate(pipeline):
-                pass
 
-            res.append((datetime.now() - start).microseconds)
+def _avg_score(likes: Collection, film_id):
+    """Средняя оценка фильма."""
+    pipeline: list[dict] = [
+        {'$match': {
+            'film_id': str(film_id),
+        }},
+        {'$group': {
+            '_id': None,
+            'avgscore': {'$avg': '$score'},
+        }},
+    ]
 
-        return res
+    for _ in likes.aggregate(pipeline):
+        pass
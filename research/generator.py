@@ -0,0 +1,164 @@
+"""Векторная (NumPy) генерация набора данных.
+
+- популярность фильмов и обзоров распределена по закону Ципфа, активность
+  пользователей - по степенному закону;
+- у каждого фильма (обзора) есть "качество", от которого зависит доля
+  лайков. Большая часть оценок - лайк (10) или дизлайк (0), остальные -
+  промежуточные, около качества объекта;
+- пары (объект, пользователь) в таблице не повторяются, повторные пары
+  заменяются новыми.
+
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+
+UUID_SIZE = 16
+UUID_DTYPE = np.dtype('V16')
+UGC_DTYPE = np.dtype([
+    ('obj_id', UUID_DTYPE),
+    ('user_id', UUID_DTYPE),
+    ('value', '<i4'),
+])
+
+# Доля оценок лайк / дизлайк, остальные - от 1 до 9.
+BINARY_SCORE_SHARE = 0.8
+MAX_SCORE = 10
+# Параметры бета-распределения качества объектов: в среднем 2 / 3 лайков.
+QUALITY_ALPHA = 4
+QUALITY_BETA = 2
+MAX_TIMESTAMP = 10800
+# Кол-во досэмплирований повторных пар (объект, пользователь).
+MAX_PAIR_ROUNDS = 20
+
+# Байты и биты версии (4) и варианта (RFC 4122) UUID.
+UUID_VERSION_BYTE = 6
+UUID_VARIANT_BYTE = 8
+UUID_VERSION_MASK = 0xF
+UUID_VERSION_BITS = 0x40
+UUID_VARIANT_MASK = 0x3F
+UUID_VARIANT_BITS = 0x80
+
+UGCPairs = tuple[np.ndarray, np.ndarray]
+
+
+@dataclass
+class Population:
+    """Объекты в порядке убывания популярности и их вероятности по закону Ципфа."""
+
+    ids: np.ndarray
+    exponent: float
+    probabilities: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        """Считаем вероятности объектов."""
+        self.probabilities = zipf_probabilities(len(self.ids), self.exponent)
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Индексы объектов с учетом популярности.
+
+        Args:
+          rng: генератор случайных чисел;
+          size: кол-во индексов.
+
+        """
+        return rng.choice(len(self.ids), size=size, p=self.probabilities)
+
+
+def zipf_probabilities(size: int, exponent: float) -> np.ndarray:
+    """Вероятности элементов с рангами 1..size, пропорциональны 1 / r ** exponent.
+
+    Args:
+      size: кол-во элементов;
+      exponent: показатель распределения.
+
+    """
+    ranks = np.arange(1, size + 1, dtype=np.float64)
+    weights = ranks ** -exponent
+    return weights / weights.sum()
+
+
+def generate(spec: dict) -> dict[str, np.ndarray]:
+    """Создаем набор данных.
+
+    Args:
+      spec: параметры генерации (dataset.generation_spec).
+
+    Returns:
+      Массивы идентификаторов (films, users, review_ids) и записей
+      (likes, reviews, review_likes, bookmarks).
+
+    """
+    rng = np.random.default_rng(spec['seed'])
+    films = Population(_random_uuids(rng, spec['films']), spec['film_zipf'])
+    users = Population(_random_uuids(rng, spec['users']), spec['user_zipf'])
+    film_quality = rng.beta(QUALITY_ALPHA, QUALITY_BETA, len(films.ids))
+
+    likes = _pairs(rng, films, users, spec['likes'])
+    reviews = _pairs(rng, films, users, spec['reviews'])
+    review_ids = _random_uuids(rng, len(reviews[0]))
+    reviewed = Population(review_ids, spec['film_zipf'])
+    review_quality = rng.beta(QUALITY_ALPHA, QUALITY_BETA, len(reviewed.ids))
+    review_likes = _pairs(rng, reviewed, users, spec['review_likes'])
+    bookmarks = _pairs(rng, films, users, spec['bookmarks'])
+    timestamps = rng.integers(0, MAX_TIMESTAMP, len(bookmarks[0]))
+
+    return {
+        'films': films.ids,
+        'users': users.ids,
+        'review_ids': reviewed.ids,
+        'likes': _records(films, users, likes, _scores(rng, film_quality[likes[0]])),
+        'reviews': _records(films, users, reviews, _scores(rng, film_quality[reviews[0]])),
+        'review_likes': _records(
+            reviewed, users, review_likes, _scores(rng, review_quality[review_likes[0]]),
+        ),
+        'bookmarks': _records(films, users, bookmarks, timestamps),
+    }
+
+
+def _random_uuids(rng: np.random.Generator, count: int) -> np.ndarray:
+    """Случайные UUID версии 4."""
+    raw = np.frombuffer(rng.bytes(count * UUID_SIZE), dtype=np.uint8)
+    uuid_bytes = raw.reshape(count, UUID_SIZE).T.copy()
+    uuid_bytes[UUID_VERSION_BYTE] &= UUID_VERSION_MASK
+    uuid_bytes[UUID_VERSION_BYTE] |= UUID_VERSION_BITS
+    uuid_bytes[UUID_VARIANT_BYTE] &= UUID_VARIANT_MASK
+    uuid_bytes[UUID_VARIANT_BYTE] |= UUID_VARIANT_BITS
+    uuid_rows = np.ascontiguousarray(uuid_bytes.T)
+    return uuid_rows.view(UUID_DTYPE).ravel()
+
+
+def _pairs(rng: np.random.Generator, targets: Population, users: Population, count: int) -> UGCPairs:
+    """Уникальные пары (индекс объекта, индекс пользователя) в случайном порядке.
+
+    Повторные пары досэмплируются, пока пар не станет count. Если почти все
+    возможные пары уже выбраны, пар может остаться меньше count.
+
+    """
+    users_count = len(users.ids)
+    keys = np.empty(0, dtype=np.int64)
+    for _ in range(MAX_PAIR_ROUNDS):
+        missing = count - len(keys)
+        if missing <= 0:
+            break
+        target_idx = targets.sample(rng, missing)
+        new_keys = target_idx * users_count + users.sample(rng, missing)
+        keys = np.unique(np.concatenate((keys, new_keys)))
+    keys = rng.permutation(keys)[:count]
+    return keys // users_count, keys % users_count
+
+
+def _scores(rng: np.random.Generator, quality: np.ndarray) -> np.ndarray:
+    """Оценки объектов с заданным качеством (вероятностью лайка)."""
+    size = len(quality)
+    binary = np.where(rng.random(size) < quality, MAX_SCORE, 0)
+    graded = rng.binomial(MAX_SCORE - 2, quality) + 1
+    return np.where(rng.random(size) < BINARY_SCORE_SHARE, binary, graded)
+
+
+def _records(targets: Population, users: Population, pairs: UGCPairs, row_values: np.ndarray) -> np.ndarray:
+    records = np.empty(len(row_values), dtype=UGC_DTYPE)
+    records['obj_id'] = targets.ids[pairs[0]]
+    records['user_id'] = users.ids[pairs[1]]
+    records['value'] = row_values
+    return records
@@ -0,0 +1,109 @@
+"""Гистограмма задержек в духе HdrHistogram.
+
+Значения (наносекунды) раскладываются по логарифмически-линейным корзинам:
+внутри каждого интервала [2^k, 2^(k+1)) корзины одинаковой ширины, поэтому
+относительная погрешность любого значения не превышает 10^-digits при
+фиксированном объеме памяти и без хранения всех измерений.
+
+"""
+import math
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+NANOSECONDS_IN_MS = 1000000
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек в наносекундах."""
+
+    def __init__(self, digits: int = 3):
+        """Конструктор класса.
+
+        Args:
+          digits: кол-во значащих десятичных цифр значения.
+
+        """
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** digits))
+        self.counts: dict[tuple[int, int], int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        """Записываем время выполнения блока по монотонным часам."""
+        start = time.perf_counter_ns()
+        yield
+        self.record(time.perf_counter_ns() - start)
+
+    def record(self, latency: int):
+        """Записываем значение.
+
+        Args:
+          latency: задержка в наносекундах.
+
+        """
+        key = self._key(latency)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.min = min(self.min, latency) if self.count else latency
+        self.max = max(self.max, latency)
+        self.count += 1
+        self.total += latency
+
+    def merge(self, other: 'LatencyHistogram'):
+        """Добавляем измерения другой гистограммы с той же точностью.
+
+        Args:
+          other: гистограмма, например, другого потока.
+
+        """
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        if other.count:
+            self.min = min(self.min, other.min) if self.count else other.min
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, rank: float) -> int:
+        """Задержка, которую не превышают rank процентов измерений.
+
+        Как и в HdrHistogram, возвращается верхняя граница корзины, но не
+        больше максимального записанного значения.
+
+        Args:
+          rank: перцентиль от 0 до 100.
+
+        """
+        target = max(math.ceil(rank / 100 * self.count), 1)
+        seen = 0
+        for bucket, sub_bucket in sorted(self.counts):
+            seen += self.counts[bucket, sub_bucket]
+            if seen >= target:
+                return min(((sub_bucket + 1) << bucket) - 1, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        """Кол-во измерений, общее время и задержки в миллисекундах."""
+        summary = {
+            'count': self.count,
+            'total_s': round(self.total / NANOSECONDS_IN_MS / 1000, 3),
+            'mean_ms': _ms(self.total / self.count if self.count else 0),
+            'min_ms': _ms(self.min),
+            'max_ms': _ms(self.max),
+        }
+        for rank in PERCENTILES:
+            summary['p{0:g}_ms'.format(rank)] = _ms(self.percentile(rank))
+        return summary
+
+    def _key(self, latency: int) -> tuple[int, int]:
+        """Корзина значения: (степень двойки, номер корзины внутри интервала)."""
+        bucket = max(latency.bit_length() - self.sub_bucket_bits, 0)
+        return bucket, latency >> bucket
+
+
+def _ms(latency: float) -> float:
+    return round(latency / NANOSECONDS_IN_MS, 3)
@@ -0,0 +1,197 @@
+"""Подача нагрузки на БД из нескольких потоков.
+
+Операция - функция от элемента заранее подготовленных данных, поэтому в
+задержку входит только обращение к БД. Драйверы Mongo и Cassandra
+потокобезопасны, запросы выполняются в пуле из settings.concurrency потоков.
+
+Режимы:
+- closed loop (по умолчанию): каждый поток выполняет следующий запрос сразу
+  после ответа на предыдущий, результат - предельная пропускная способность;
+- open loop (settings.rate): запросы поступают с фиксированной частотой
+  независимо от ответов. Задержка считается от запланированного времени
+  поступления, поэтому ожидание свободного потока входит в задержку
+  (поправка на coordinated omission).
+
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from histogram import LatencyHistogram
+
+NANOSECONDS_IN_S = 1000000000
+
+TOTAL = ''
+
+Operation = Callable[[Any], object]
+Label = Callable[[Any], str]
+
+
+@dataclass
+class LoadResult:
+    """Задержки операций и время выполнения всей нагрузки."""
+
+    histogram: LatencyHistogram
+    elapsed_ns: int
+    concurrency: int
+    rate: Optional[float]
+    # Кол-во записанных строк, если одна операция записывает пакет строк.
+    rows: int = 0
+    # Задержки по типам операций смешанной нагрузки.
+    operations: dict[str, LatencyHistogram] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        """Режим, пропускная способность и задержки."""
+        elapsed = self.elapsed_ns / NANOSECONDS_IN_S
+        summary = {
+            'mode': 'open' if self.rate else 'closed',
+            'concurrency': self.concurrency,
+            'rate': self.rate,
+            'throughput': round(self.histogram.count / elapsed, 1) if elapsed else 0,
+        }
+        if self.rows:
+            summary['rows'] = self.rows
+            summary['rows_per_s'] = round(self.rows / elapsed, 1) if elapsed else 0
+        summary.update(self.histogram.to_dict())
+        summary['elapsed_s'] = round(elapsed, 3)
+        if self.operations:
+            summary['operations'] = {
+                name: histogram.to_dict() for name, histogram in self.operations.items()
+            }
+        return summary
+
+
+class LoadRunner:
+    """Выполнение операций в пуле потоков."""
+
+    def __init__(self, concurrency: int, rate: Optional[float] = None, digits: int = 3):
+        """Конструктор класса.
+
+        Args:
+          concurrency: кол-во потоков;
+          rate: частота поступления запросов в секунду, None - closed loop;
+          digits: значащие цифры гистограммы задержек.
+
+        """
+        self.concurrency = concurrency
+        self.rate = rate
+        self.digits = digits
+        self._local = threading.local()
+        self._histograms: list[tuple[str, LatencyHistogram]] = []
+        self._lock = threading.Lock()
+        self._label: Label = _total
+
+    def run(self, operation: Operation, operands: Sequence, label: Optional[Label] = None) -> LoadResult:
+        """Выполняем операцию для каждого элемента operands.
+
+        Ошибка операции прерывает поток и передается после завершения пула.
+
+        Args:
+          operation: функция от элемента operands, один вызов - один запрос;
+          operands: данные запросов;
+          label: тип операции по элементу operands, задержки каждого типа
+          дополнительно собираются в отдельную гистограмму.
+
+        """
+        self._histograms = []
+        self._local = threading.local()
+        self._label = label or _total
+        start = time.perf_counter_ns()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            if self.rate:
+                futures = self._open_loop(executor, operation, operands, start, self.rate)
+            else:
+                pending = iter(operands)
+                futures = [
+                    executor.submit(self._closed_loop_worker, operation, pending)
+                    for _ in range(self.concurrency)
+                ]
+        elapsed_ns = time.perf_counter_ns() - start
+        for future in futures:
+            future.result()
+
+        histogram = LatencyHistogram(self.digits)
+        operations: dict[str, LatencyHistogram] = {}
+        for name, thread_histogram in self._histograms:
+            histogram.merge(thread_histogram)
+            operations.setdefault(name, LatencyHistogram(self.digits)).merge(thread_histogram)
+        if not label:
+            operations = {}
+        return LoadResult(histogram, elapsed_ns, self.concurrency, self.rate, operations=operations)
+
+    def _closed_loop_worker(self, operation: Operation, pending: Iterator):
+        """Поток выполняет запросы один за другим, пока они не закончатся."""
+        # next() у итератора списка защищен GIL, элементы не повторяются.
+        for operand in pending:
+            with self._histogram(operand).measure():
+                operation(operand)
+
+    def _open_loop(
+        self, executor: ThreadPoolExecutor, operation: Operation, operands: Sequence, start: int, rate: float,
+    ) -> list[Future]:
+        """Отправляем запросы в пул по расписанию, не дожидаясь ответов."""
+        interval_ns = NANOSECONDS_IN_S / rate
+        futures = []
+        for index, operand in enumerate(operands):
+            scheduled = start + int(index * interval_ns)
+            delay = scheduled - time.perf_counter_ns()
+            if delay > 0:
+                time.sleep(delay / NANOSECONDS_IN_S)
+            futures.append(executor.submit(self._scheduled, operation, operand, scheduled))
+        return futures
+
+    def _scheduled(self, operation: Operation, operand, scheduled: int):
+        operation(operand)
+        self._histogram(operand).record(time.perf_counter_ns() - scheduled)
+
+    def _histogram(self, operand) -> LatencyHistogram:
+        """Гистограмма типа операции в текущем потоке, потоки не делят общие гистограммы."""
+        name = self._label(operand)
+        histograms = getattr(self._local, 'histograms', None)
+        if histograms is None:
+            histograms = {}
+            self._local.histograms = histograms
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = LatencyHistogram(self.digits)
+            histograms[name] = histogram
+            with self._lock:
+                self._histograms.append((name, histogram))
+        return histogram
+
+
+def _total(operand) -> str:
+    return TOTAL
+
+
+def chunks(operands: Sequence, size: int) -> list[Sequence]:
+    """Разбиваем данные на пакеты не больше size элементов.
+
+    Args:
+      operands: данные;
+      size: размер пакета.
+
+    """
+    starts = range(0, len(operands), size)
+    return [operands[start:start + size] for start in starts]
+
+
+def batched(operands: Iterable, size: int) -> Iterator[list]:
+    """Разбиваем поток данных на пакеты не больше size элементов по мере чтения.
+
+    В отличие от chunks данные не читаются целиком, поэтому подходит для
+    загрузки набора данных в БД, но не для операций нагрузки.
+
+    Args:
+      operands: данные;
+      size: размер пакета.
+
+    """
+    pending = iter(operands)
+    batch = list(islice(pending, size))
+    while batch:
+        yield batch
+        batch = list(islice(pending, size))
@@ -1,91 +1,126 @@
 """Тестирование производительности БД Mongo и Cassandra."""
 import logging
-from datetime import timedelta
-from math import log
-from random import choice, randint
-from uuid import uuid4
+from functools import partial
+from operator import attrgetter
+from uuid import UUID
 
 from config import settings
+from dataset import UGCRow, load_or_generate, uuid_list
+from db.cassandra_workload import CassandraWorkload
 from db.cassandradb import TestCassandra
+from db.mongo_workload import MongoWorkload
 from db.mongodb import TestMongo
+from load import LoadRunner
+from report import compare, res_format, save_results
+from workloads import execute, plan
 
 
 logging.basicConfig(level=logging.INFO)
 
-
-def res_format(db, res, size) -> str:
-    """Форматирование результатов тестирования."""
-    return '\t {0}: {1}, avg={2}, min={3}, max={4}'.format(
-        db,
-        timedelta(microseconds=sum(res)),
-        timedelta(microseconds=sum(res) / size),
-        timedelta(microseconds=min(res)),
-        timedelta(microseconds=max(res)),
-    )
+# Набор для тестов чтения и отдельный набор для тестов записи, чтобы
+# записываемые лайки не совпадали с уже загруженными.
+dataset = load_or_generate(settings.dataset_seed)
+write_dataset = load_or_generate(settings.dataset_seed + 1)
 
 
-def test_bookmarks(cassandra: TestCassandra, mongo: TestMongo):
+def test_bookmarks(cassandra: TestCassandra, mongo: TestMongo) -> dict:
     """Тесты на чтение закладок."""
-    logging.info('Test reading {0} bookmarks:'.format(
-        settings.bookmarks_count,
+    bookmarks: dict[UUID, list[UUID]] = {}
+    for film_id, user_id, _ in dataset.rows('bookmarks'):
+        bookmarks.setdefault(user_id, []).append(film_id)
+    # Закладки читаются так же часто, как пользователи их добавляют.
+    user_ids = uuid_list(dataset.table('bookmarks')['user_id'])
+
+    logging.info('Test reading bookmarks of {0} users {1} times:'.format(
+        len(bookmarks),
+        len(user_ids),
     ))
 
-    bookmarks = []
-    for _ in range(settings.bookmarks_count):
-        bookmarks.append((uuid4(), uuid4()))
-
-    res = cassandra.bookmarks(bookmarks)
-    logging.info(res_format('cassandra', res, len(bookmarks)))
-    res = mongo.bookmarks(bookmarks)
-    logging.info(res_format('mongo', res, len(bookmarks)))
+    return compare(
+        cassandra.bookmarks(bookmarks.items(), user_ids), mongo.bookmarks(bookmarks.items(), user_ids),
+    )
 
 
-def test_likes(cassandra: TestCassandra, mongo: TestMongo):
+def test_likes(cassandra: TestCassandra, mongo: TestMongo) -> dict:
     """Тесты на чтение средней оценки кинопроизведения."""
-    likes = []
-    films_count = int(log(settings.likes_count, settings.films_count_factor))
-    film_ids = [uuid4() for _ in range(films_count)]
+    # Рейтинг фильма читается так же часто, как фильм оценивают.
+    film_ids = uuid_list(dataset.table('likes')['obj_id'])
 
     logging.info('Test average rating of {0} films in {1} likes:'.format(
+        dataset.meta['counts']['films'],
         len(film_ids),
-        settings.likes_count,
     ))
 
-    for _ in range(settings.likes_count):
-        likes.append((
-            choice(film_ids),
-            uuid4(),
-            randint(0, 10),
-        ))
+    cassandra_res = cassandra.likes(dataset.rows('likes'), film_ids)
+    return compare(cassandra_res, mongo.likes(dataset.rows('likes'), film_ids))
 
-    res = cassandra.likes(likes, film_ids)
-    logging.info(res_format('cassandra', res, len(film_ids)))
-    res = mongo.likes(likes, film_ids)
-    logging.info(res_format('mongo', res, len(film_ids)))
 
-
-def test_likes_insert(cassandra: TestCassandra, mongo: TestMongo):
+def test_likes_insert(cassandra: TestCassandra, mongo: TestMongo) -> dict:
     """Тесты на скорость записи лайков и последующем чтении средней оценки фильма."""
-    likes = []
-    films_count = int(log(settings.likes_count, settings.films_count_factor))
-    film_ids = [uuid4() for _ in range(films_count)]
+    likes = _write_likes()
 
     logging.info('Test insert data and read average rating of {0} films in {1} likes:'.format(
-        len(film_ids),
-        settings.likes_count,
+        write_dataset.meta['counts']['films'],
+        len(likes),
+    ))
+
+    return compare(cassandra.likes_insert(likes), mongo.likes_insert(likes))
+
+
+def test_likes_ingest(cassandra: TestCassandra, mongo: TestMongo) -> dict:
+    """Тесты на скорость пакетной записи лайков."""
+    likes = _write_likes()
+
+    logging.info('Test ingest of {0} likes for {1} films in {2} threads:'.format(
+        len(likes),
+        write_dataset.meta['counts']['films'],
+        settings.ingest_concurrency,
     ))
 
-    for _ in range(settings.likes_count):
-        likes.append((
-            choice(film_ids),
-            uuid4(),
-            randint(0, 10),
-        ))
+    ingest: dict = {'cassandra': {}, 'mongo': {}}
+    for batch_size in settings.ingest_batch_sizes:
+        db_results = (
+            ('cassandra', cassandra.likes_ingest(likes, batch_size)),
+            ('mongo', mongo.likes_ingest(likes, batch_size)),
+        )
+        for db, modes in db_results:
+            for mode, res in modes.items():
+                name = '{0}_{1}'.format(mode, batch_size)
+                logging.info(res_format(db, res, name))
+                ingest[db][name] = res.to_dict()
+    return ingest
+
+
+def test_workloads(cassandra: TestCassandra, mongo: TestMongo) -> dict:
+    """Смешанные нагрузки на моделях данных ugs_api."""
+    models = (
+        ('cassandra', CassandraWorkload(cassandra.session)),
+        ('mongo', MongoWorkload(mongo.db)),
+    )
+    for _, model in models:
+        model.load(dataset)
+
+    runner = LoadRunner(settings.concurrency, settings.rate, settings.histogram_digits)
+    workloads: dict = {}
+    for name, mix in settings.workloads.items():
+        requests = plan(dataset, mix, settings.workload_operations, settings.dataset_seed)
+        logging.info('Test workload {0} {1}:'.format(name, mix))
+        workloads[name] = {}
+        for db, model in models:
+            res = runner.run(partial(execute, model), requests, attrgetter('operation'))
+            logging.info(res_format(db, res))
+            workloads[name][db] = res.to_dict()
+    return workloads
+
+
+def _write_likes() -> list[UGCRow]:
+    """Лайки для тестов записи.
+
+    Лайки - данные операций нагрузки, поэтому читаются целиком заранее,
+    чтобы перевод в UUID не входил в задержку.
 
-    res = cassandra.likes_insert(likes)
-    logging.info(res_format('cassandra', res, len(likes)))
-    res = mongo.likes_insert(likes)
-    logging.info(res_format('mongo', res, len(likes)))
+    """
+    return list(write_dataset.rows('likes'))
 
 
 def start():
@@ -93,9 +128,13 @@ def start():
     cassandra = TestCassandra()
     mongo = TestMongo()
 
-    test_bookmarks(cassandra, mongo)
-    test_likes(cassandra, mongo)
-    test_likes_insert(cassandra, mongo)
+    save_results({
+        'bookmarks': test_bookmarks(cassandra, mongo),
+        'likes': test_likes(cassandra, mongo),
+        'likes_insert': test_likes_insert(cassandra, mongo),
+        'likes_ingest': test_likes_ingest(cassandra, mongo),
+        'workloads': test_workloads(cassandra, mongo),
+    })
 
     cassandra.close()
     mongo.close()
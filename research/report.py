@@ -0,0 +1,58 @@
+"""Вывод и сохранение результатов тестирования."""
+import json
+import logging
+import platform
+from datetime import datetime
+
+from config import settings
+from load import LoadResult
+
+LATENCY_FIELDS = ('mean', 'p50', 'p90', 'p99', 'p99.9', 'max')
+
+
+def res_format(db: str, res: LoadResult, scenario: str = '') -> str:
+    """Форматирование результатов тестирования."""
+    summary = res.to_dict()
+    parts = ['{0} ops in {1}s'.format(summary['count'], summary['elapsed_s'])]
+    parts.append('{0} ops/s'.format(summary['throughput']))
+    if res.rows:
+        parts.append('{0} rows/s'.format(summary['rows_per_s']))
+    parts.append(_latencies(summary))
+    title = '{0} {1}'.format(db, scenario) if scenario else db
+    lines = ['\t {0}: {1}'.format(title, ', '.join(parts))]
+    for operation, histogram in res.operations.items():
+        operation_summary = histogram.to_dict()
+        lines.append('\t\t {0}: {1} ops, {2}'.format(
+            operation, operation_summary['count'], _latencies(operation_summary),
+        ))
+    return '\n'.join(lines)
+
+
+def compare(cassandra_res: LoadResult, mongo_res: LoadResult) -> dict:
+    """Логируем и возвращаем результаты обеих БД."""
+    logging.info(res_format('cassandra', cassandra_res))
+    logging.info(res_format('mongo', mongo_res))
+    return {'cassandra': cassandra_res.to_dict(), 'mongo': mongo_res.to_dict()}
+
+
+def save_results(tests: dict):
+    """Сохраняем результаты тестирования в JSON."""
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'host': platform.node(),
+            'settings': settings.dict(),
+        },
+        'tests': tests,
+    }
+    with open(settings.results_file, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+    logging.info('Results saved to {0}'.format(settings.results_file))
+
+
+def _latencies(summary: dict) -> str:
+    """Задержки из сводки гистограммы."""
+    latencies = [
+        '{0}={1}ms'.format(name, summary['{0}_ms'.format(name)]) for name in LATENCY_FIELDS
+    ]
+    return ', '.join(latencies)
@@ -0,0 +1,134 @@
+"""Смешанные нагрузки в духе YCSB, повторяющие запросы ugs_api.
+
+Нагрузка задается долями операций (settings.workloads). Операции:
+- film_card (чтение): карточка фильма - счетчики рейтинга, последние оценки
+  и обзоры фильма и закладка пользователя;
+- reviews_by_avg (чтение): страница обзоров фильма, отсортированных по
+  средней оценке лайков обзора (объединение с лайками обзоров);
+- user_dashboard (чтение): личный кабинет - последние оценки, обзоры и
+  закладки пользователя;
+- likes_scan (чтение): постраничное чтение оценок фильма от новых к старым,
+  settings.workload_scan_pages страниц;
+- like, review_like (запись): оценка фильма (обзора) с изменением счетчиков
+  рейтинга;
+- bookmark (запись): закладка с местом просмотра.
+
+Фильмы, обзоры и пользователи выбираются с учетом популярности, как и при
+создании набора данных (dataset.py). Операции готовятся заранее, модели
+данных Mongo и Cassandra реализуют их методами с теми же названиями.
+
+"""
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Iterable, NamedTuple
+from uuid import UUID
+
+import numpy as np
+
+from dataset import Dataset, UGCRow, uuid_list
+from generator import MAX_SCORE, MAX_TIMESTAMP, UUID_DTYPE, Population
+
+# Объекты операций: фильмы или обзоры.
+OPERATION_OBJECTS = MappingProxyType({
+    'film_card': 'films',
+    'reviews_by_avg': 'films',
+    'user_dashboard': 'films',
+    'likes_scan': 'films',
+    'like': 'films',
+    'review_like': 'review_ids',
+    'bookmark': 'films',
+})
+# Верхняя граница значения операции записи: оценка или место просмотра.
+OPERATION_VALUES = MappingProxyType({
+    'like': MAX_SCORE + 1,
+    'review_like': MAX_SCORE + 1,
+    'bookmark': MAX_TIMESTAMP,
+})
+# Даты записей набора данных: по секунде на запись, начиная с BASE_DATE.
+BASE_DATE = datetime.fromisoformat('2023-01-01')
+
+
+class Request(NamedTuple):
+    """Операция смешанной нагрузки."""
+
+    operation: str
+    obj_id: UUID
+    user_id: UUID
+    # Оценка или место просмотра для операций записи.
+    amount: int
+
+
+def plan(
+    dataset: Dataset, mix: dict[str, float], count: int, seed: int,
+) -> list[Request]:
+    """Готовим операции нагрузки.
+
+    Args:
+      dataset: набор данных, загруженный в БД;
+      mix: доли операций, например, {'film_card': 0.95, 'like': 0.05};
+      count: кол-во операций;
+      seed: начальное значение генератора.
+
+    Raises:
+      ValueError: неизвестная операция.
+
+    """
+    unknown = sorted(set(mix) - set(OPERATION_OBJECTS))
+    if unknown:
+        raise ValueError('Unknown operations: {0}'.format(', '.join(unknown)))
+
+    rng = np.random.default_rng(seed)
+    names = sorted(mix)
+    shares = np.array([mix[name] for name in names], dtype=np.float64)
+    shares /= shares.sum()
+    chosen = rng.choice(len(names), size=count, p=shares)
+
+    spec = dataset.meta['spec']
+    populations = {
+        'films': Population(dataset.ids('films'), spec['film_zipf']),
+        'review_ids': Population(dataset.ids('review_ids'), spec['film_zipf']),
+    }
+    obj_ids = np.empty(count, dtype=UUID_DTYPE)
+    amounts = np.zeros(count, dtype=np.int64)
+    for index, name in enumerate(names):
+        mask = chosen == index
+        size = int(mask.sum())
+        population = populations[OPERATION_OBJECTS[name]]
+        obj_ids[mask] = population.ids[population.sample(rng, size)]
+        amounts[mask] = rng.integers(0, OPERATION_VALUES.get(name, 1), size)
+    users = Population(dataset.ids('users'), spec['user_zipf'])
+    user_ids = users.ids[users.sample(rng, count)]
+
+    operations = [names[chosen_index] for chosen_index in chosen.tolist()]
+    requests = zip(operations, uuid_list(obj_ids), uuid_list(user_ids), amounts.tolist())
+    return [Request(*request) for request in requests]
+
+
+def execute(model, request: Request):
+    """Выполняем операцию методом модели данных с тем же названием.
+
+    Args:
+      model: модель данных (MongoWorkload / CassandraWorkload);
+      request: операция.
+
+    """
+    getattr(model, request.operation)(request)
+
+
+def row_date(index: int) -> datetime:
+    """Дата записи набора данных по ее номеру."""
+    return BASE_DATE + timedelta(seconds=index)
+
+
+def ratings(rows: Iterable[UGCRow]) -> dict[UUID, tuple[int, int]]:
+    """Сумма и кол-во оценок каждого объекта для счетчиков рейтинга.
+
+    Args:
+      rows: оценки (obj_id, user_id, score).
+
+    """
+    totals: dict[UUID, tuple[int, int]] = {}
+    for obj_id, _, score in rows:
+        score_sum, score_count = totals.get(obj_id, (0, 0))
+        totals[obj_id] = (score_sum + score, score_count + 1)
+    return totals
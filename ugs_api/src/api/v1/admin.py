@@ -0,0 +1,94 @@
+"""Служебные ручки для диагностики работы API.
+
+Подключаются только при ADMIN_API=1 и доступны только пользователям из
+ADMIN_USERS. Данные, кроме журнала медленных запросов, относятся к процессу,
+который обработал запрос.
+
+"""
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from db_managers.abstract_manager import AbstractDBManager
+from db_managers.mongo import get_db_manager
+from db_managers.slow_queries import SLOW_QUERIES_COLLECTION
+from logger import queue_handlers
+from services.auth import bearer
+from services.write_buffer import write_buffers
+from settings import settings
+
+
+async def admin_user(user_id: UUID = Depends(bearer)) -> UUID:
+    """DI для FastAPI. Доступ к служебным ручкам только для settings.admin_users.
+
+    Raises:
+      HTTPException: HTTP_403_FORBIDDEN
+
+    """
+    if user_id not in settings.admin_users:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Admin access required.')
+    return user_id
+
+
+router = APIRouter(dependencies=[Depends(admin_user)])
+
+
+@router.get(
+    '/auth_cache',
+    summary='Кэш токенов',
+    description='Счетчики попаданий и промахов кэша проверки токенов.',
+)
+async def auth_cache_stats():
+    """Счетчики локального кэша и кэша в Redis для проверки токенов."""
+    return bearer.cache_stats()
+
+
+@router.get(
+    '/write_buffers',
+    summary='Буферы записи',
+    description='Глубина очереди и время сброса буферов отложенной записи.',
+)
+async def write_buffers_stats():
+    """Метрики буферов отложенной записи (WRITE_BEHIND=1)."""
+    return {buffer.name: buffer.stats() for buffer in write_buffers}
+
+
+@router.get(
+    '/logging',
+    summary='Очереди логов',
+    description='Глубина очередей логов и кол-во отброшенных записей.',
+)
+async def logging_stats():
+    """Счетчики очередей логирования (LOGGING.queue)."""
+    return {name: queue_handler.stats() for name, queue_handler in queue_handlers.items()}
+
+
+@router.get(
+    '/slow_queries',
+    summary='Медленные запросы',
+    description='Последние медленные запросы к Mongo всех процессов API.',
+)
+async def slow_queries(
+    collection: Optional[str] = Query(default=None, alias='collection'),
+    collscan: Optional[bool] = Query(default=None, alias='collscan'),
+    limit: int = Query(default=100, alias='limit', ge=1, le=1000),
+    db: AbstractDBManager = Depends(get_db_manager),
+):
+    """Журнал медленных запросов, начиная с последних.
+
+    Можно отфильтровать запросы по коллекции и по наличию полного
+    сканирования коллекции (COLLSCAN) в плане, полученном через explain.
+
+    """
+    search: dict = {}
+    if collection:
+        search['collection'] = collection
+    if collscan is not None:
+        search['plan.collscan'] = collscan
+    # Журнал - ограниченная коллекция, последние записи читаются в обратном порядке записи.
+    sort = [('$natural', -1)]
+    docs = await db.search(SLOW_QUERIES_COLLECTION, search, limit, 0, sort=sort)
+    for doc in docs:
+        doc.pop('_id', None)
+    return docs
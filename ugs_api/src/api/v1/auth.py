@@ -0,0 +1,35 @@
+"""Ручки для работы с токенами пользователя."""
+import logging
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Request, status
+
+from services.auth import bearer, revoke_token
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post(
+    '/logout',
+    summary='Выход',
+    description='Отозвать токен пользователя во всех процессах API.',
+    status_code=status.HTTP_200_OK,
+)
+async def logout(
+    request: Request,
+    user_id: UUID = Depends(bearer),
+):
+    """Отозвать токен, которым подписан запрос.
+
+    Отрицательный результат проверки хранится в Redis до истечения срока
+    действия токена, процессы API удаляют токен из локального кэша по
+    сообщению в канале отзыва.
+
+    """
+    if settings.jwt_validate:
+        await revoke_token(request.state.token_payload)
+    logger.debug('Logout of user {0}'.format(user_id))
+    return {'status': 'successfully logged out'}
@@ -2,17 +2,49 @@
 import logging
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
 
-from models.aggregate_models import FilmAggregateModel
-from services.aggregate_service import AggregateService, get_film_aggregate_service
+from api.v1.params import film_ids_param
+from db_managers.abstract_manager import DBManagerError
+from models.aggregate_models import FilmAggregateModel, FilmRatingModel
+from models.batch_models import BatchItemResult, LikeOperation
+from services.aggregate_service import AggregateService, Branch, gather_branches, get_film_aggregate_service
 from services.auth import bearer
+from services.cache import merge_json
+from services.versions import FILM_SCOPE, USER_SCOPE, etag_headers, not_modified, versions
+from settings import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+@router.get(
+    '/ratings',
+    response_model=list[FilmRatingModel],
+    summary='Рейтинг фильмов',
+    description='Рейтинг нескольких фильмов без последних оценок и обзоров.',
+)
+async def get_ratings(
+    film_ids: list[UUID] = Depends(film_ids_param),
+    service: AggregateService = Depends(get_film_aggregate_service),
+):
+    """Рейтинг до RATINGS_MAX_IDS фильмов одним запросом к БД.
+
+    Идентификаторы передаются через запятую (ids=a,b,c) или повторением
+    параметра (ids=a&ids=b). Рейтинги возвращаются в порядке запроса, для
+    фильмов без оценок счетчики равны нулю.
+
+    Ручка объявлена до /{film_id}, иначе 'ratings' будет принят за id фильма.
+
+    """
+    ratings = await service.get_ratings(film_ids)
+    return [
+        FilmRatingModel(film_id=rating.pop('obj_id'), **rating)
+        for rating in ratings
+    ]
+
+
 @router.get(
     '/{film_id}',
     response_model=FilmAggregateModel,
@@ -20,23 +52,33 @@ router = APIRouter()
     description='Подробные данные о фильме.',
 )
 async def get_film(
+    request: Request,
     film_id: UUID,
     user_id: UUID = Depends(bearer),
     service: AggregateService = Depends(get_film_aggregate_service),
 ):
-    """Получить информацию о фильме."""
-    ratings = await service.get_rating(film_id)
-    reviews = await service.review.search(film_id, sort='-date', page_size=10)
-    bookmark = await service.bookmark.get(film_id, user_id)
+    """Получить информацию о фильме.
 
-    film_data = {
-        'film_id': film_id,
-        'recent_reviews': reviews,
-        'bookmark': bookmark,
-    }
-    film_data.update(ratings)
+    Общая для всех пользователей часть берется из кэша, закладка
+    пользователя запрашивается одновременно с ней и добавляется к ответу
+    отдельно. Без закладки (при ошибке или таймауте) страница фильма все
+    равно вернется.
 
-    return FilmAggregateModel(**film_data)
+    ETag зависит от версий фильма и пользователя (закладка), при совпадении
+    с If-None-Match возвращается 304 без запросов к БД.
+
+    """
+    etag = await versions.etag((FILM_SCOPE, film_id), (USER_SCOPE, user_id))
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+
+    branches = await gather_branches({
+        'film': Branch(service.get_film_card(film_id)),
+        'bookmark': Branch(service.bookmark.get(film_id, user_id), required=False),
+    })
+    bookmark = branches['bookmark']
+    film = merge_json(branches['film'], bookmark=bookmark.json() if bookmark else 'null')
+    return Response(content=film, media_type='application/json', headers=etag_headers(etag))
 
 
 @router.post(
@@ -81,6 +123,41 @@ async def delete_like(
     return {'status': 'successfully deleted'}
 
 
+@router.post(
+    '/likes/batch',
+    response_model=list[BatchItemResult],
+    summary='Пакетная запись лайков',
+    description='Добавить, заменить или удалить несколько оценок одним запросом.',
+)
+async def batch_likes(
+    operations: list[LikeOperation] = Body(default=..., max_items=settings.batch_max_size),
+    user_id: UUID = Depends(bearer),
+    service: AggregateService = Depends(get_film_aggregate_service),
+):
+    """Пакетная запись оценок пользователя, например при синхронизации офлайн активности.
+
+    Каждая оценка записывается атомарным запросом к БД, запросы выполняются
+    параллельно, результат возвращается для каждой операции в порядке их
+    следования. Повторная отправка пакета не изменяет счетчики рейтинга.
+
+    Raises:
+      HTTPException: HTTP_503_SERVICE_UNAVAILABLE, БД недоступна.
+
+    """
+    try:
+        errors = await service.like.write_many(
+            user_id, [(operation.film_id, operation.changes()) for operation in operations],
+        )
+    except DBManagerError as exc:
+        logger.error('Batch of {0} likes failed: {1}'.format(len(operations), exc))
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Database is unavailable.')
+    logger.debug('Batch of {0} likes from user {1}'.format(len(operations), user_id))
+    return [
+        BatchItemResult.from_error(operation.film_id, error)
+        for operation, error in zip(operations, errors)
+    ]
+
+
 @router.post(
     '/{film_id}/add_review',
     summary='Добавить обзор',
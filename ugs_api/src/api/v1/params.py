@@ -0,0 +1,29 @@
+"""Общие параметры запросов ручек."""
+from uuid import UUID
+
+from fastapi import HTTPException, Query, status
+
+from settings import settings
+
+
+def film_ids_param(ids: list[str] = Query(default=..., alias='ids')) -> list[UUID]:
+    """Разбираем список идентификаторов фильмов, удаляя повторы.
+
+    Идентификаторы передаются через запятую (ids=a,b,c) или повторением
+    параметра (ids=a&ids=b).
+
+    Raises:
+      HTTPException: HTTP_422_UNPROCESSABLE_ENTITY
+
+    """
+    raw_ids = [raw_id.strip() for ids_param in ids for raw_id in ids_param.split(',')]
+    try:
+        film_ids = list(dict.fromkeys(UUID(raw_id) for raw_id in raw_ids if raw_id))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail='Invalid film id.')
+    if not film_ids or len(film_ids) > settings.ratings_max_ids:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='From 1 to {0} film ids are allowed.'.format(settings.ratings_max_ids),
+        )
+    return film_ids
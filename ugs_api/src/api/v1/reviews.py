@@ -3,16 +3,20 @@ import logging
 from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 
+from db_managers.abstract_manager import InvalidCursorError
 from models.aggregate_models import ReviewAggregateBriefModel, ReviewAggregateDetailModel
 from services.aggregate_service import AggregateService, get_review_aggregate_service
 from services.auth import bearer
+from services.versions import REVIEW_SCOPE, etag_headers, not_modified, versions
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+NEXT_PAGE_HEADER = 'X-Next-Page'
+
 
 @router.get(
     '/{review_id}',
@@ -21,26 +25,24 @@ router = APIRouter()
     description='Подробная информация об обзоре.',
 )
 async def get_by_id(
+    request: Request,
     review_id: UUID,
     service: AggregateService = Depends(get_review_aggregate_service),
 ):
-    """Подробная информация об обзоре."""
-    review = await service.review.get_by_id(review_id)
-    if not review:
-        return None
+    """Подробная информация об обзоре. Ответ кэшируется.
+
+    При совпадении версии обзора с If-None-Match возвращается 304 без
+    запросов к БД.
 
-    like = await service.like.get(obj_id=review.obj_id, user_id=review.user_id)
-    rating = await service.get_rating(review_id)
-    review_data = {
-        'review_id': review.review_id,
-        'title': review.title,
-        'text': review.text,
-        'film_score': like.score if like else None,
-        'film_id': review.obj_id,
-        'user_id': review.user_id,
-    }
-    review_data.update(rating)
-    return ReviewAggregateDetailModel(**review_data)
+    """
+    etag = await versions.etag((REVIEW_SCOPE, review_id))
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+
+    review = await service.get_review_card(review_id)
+    if review is None:
+        return None
+    return Response(content=review, media_type='application/json', headers=etag_headers(etag))
 
 
 @router.get(
@@ -51,42 +53,51 @@ async def get_by_id(
 )
 async def get_reviews_list(
     film_id: UUID,
+    response: Response,
     page_size: int = Query(default=10, alias='page[size]', ge=10, le=100),
     page_number: int = Query(default=1, alias='page[number]', ge=1),
+    page_after: Optional[str] = Query(default=None, alias='page[after]'),
     sort: str = Query(default='_id', alias='sort'),
     service: AggregateService = Depends(get_review_aggregate_service),
 ):
     """Получить список обзоров для конкретного фильма.
 
-    Метод aggregate добавляет дополнительные поля с данными о лайках.
+    Сумма и средняя оценка лайков хранятся в самом обзоре, поэтому список
+    читается одним запросом по индексу без объединения с коллекцией лайков.
     Сортировку можно изменить на '-avg' (средний бал) или '-sum' (суммарный бал).
     Кроме того, сортировать можно по date, _id или user_id.
 
+    Курсор следующей страницы возвращается в заголовке X-Next-Page, его
+    нужно передать в page[after] вместо page[number]. Время ответа при этом
+    не зависит от номера страницы.
+
     """
-    docs = await service.review.aggregate(
-        'review_like',
-        ['review_id', 'obj_id'],
-        'score',
-        obj_id=film_id,
-        user_id=None,
-        page_size=page_size,
-        page_number=page_number,
-        sort=sort,
-    )
-    review_data = []
-    for doc in docs:
-        review_data.append(
-            {
-                'review_id': doc['review_id'],
-                'title': doc['title'],
-                'text': doc['text'],
-                'film_id': doc['obj_id'],
-                'user_id': doc['user_id'],
-                'absolute_rating': doc['sum'],
-                'average_rating': doc['avg'],
-            },
+    try:
+        reviews, next_page = await service.review.search_page(
+            obj_id=film_id,
+            page_size=page_size,
+            page_number=page_number,
+            sort=sort,
+            after=page_after,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    if next_page:
+        response.headers[NEXT_PAGE_HEADER] = next_page
+
+    return [
+        ReviewAggregateBriefModel(
+            review_id=review.review_id,
+            title=review.title,
+            text=review.text,
+            film_id=review.obj_id,
+            user_id=review.user_id,
+            absolute_rating=review.likes_sum,
+            average_rating=review.likes_avg,
         )
-    return [ReviewAggregateBriefModel(**cur_data) for cur_data in review_data]
+        for review in reviews
+    ]
 
 
 @router.post(
@@ -2,16 +2,24 @@
 import logging
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
+from db_managers.abstract_manager import DBManagerError
 from models.aggregate_models import UserResponseModel
-from services.aggregate_service import AggregateService, get_user_aggregate_service
+from models.batch_models import BatchItemResult, BookmarkOperation
+from services.aggregate_service import AggregateService, Branch, gather_branches, get_user_aggregate_service
 from services.auth import bearer
+from services.export import ExportService, get_export_service
+from services.versions import USER_SCOPE, etag_headers, not_modified, versions
+from settings import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
 
 @router.get(
     '/my_account',
@@ -20,34 +28,94 @@ router = APIRouter()
     description='Подробная информация о своей активности.',
 )
 async def user_detail(
+    request: Request,
+    response: Response,
     user_id: UUID = Depends(bearer),
     service: AggregateService = Depends(get_user_aggregate_service),
 ):
-    """Личный кабинет пользователя с полной информацией."""
-    likes = await service.like.search(user_id=user_id, sort='-date', page_size=10)
-    reviews = await service.review.search(user_id=user_id, sort='-date', page_size=10)
-    bookmarks = await service.bookmark.search(user_id=user_id, sort='-date', page_size=10)
-
-    user_data = {
-        'user_id': user_id,
-        'recent_likes': likes,
-        'recent_reviews': reviews,
-        'bookmarks': bookmarks,
-    }
+    """Личный кабинет пользователя с полной информацией.
+
+    Лайки, обзоры и закладки запрашиваются одновременно. При ошибке запроса
+    лайков или обзоров соответствующий список будет пустым, а ошибка запроса
+    закладок прерывает ответ, чтобы недоступность БД не выглядела как пустой
+    личный кабинет.
+
+    При совпадении версии пользователя с If-None-Match возвращается 304 без
+    запросов к БД.
+
+    """
+    etag = await versions.etag((USER_SCOPE, user_id))
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+    response.headers.update(etag_headers(etag))
+
+    branches = await gather_branches({
+        'recent_likes': Branch(
+            service.like.search(user_id=user_id, sort='-date', page_size=10), required=False, default=[],
+        ),
+        'recent_reviews': Branch(
+            service.review.search(user_id=user_id, sort='-date', page_size=10), required=False, default=[],
+        ),
+        'bookmarks': Branch(service.bookmark.search(user_id=user_id, sort='-date', page_size=10)),
+    })
+
+    user_data = {'user_id': user_id}
+    user_data.update(branches)
 
     return UserResponseModel(**user_data)
 
 
+@router.get(
+    '/my_account/export',
+    summary='Выгрузка данных',
+    description='Все лайки, обзоры и закладки пользователя в формате NDJSON.',
+    response_class=StreamingResponse,
+)
+async def export_user_data(
+    compress: bool = Query(default=False, alias='gzip'),
+    user_id: UUID = Depends(bearer),
+    service: ExportService = Depends(get_export_service),
+):
+    """Потоковая выгрузка всей истории пользователя.
+
+    Каждая строка - JSON объект одной записи с полем type. Данные читаются
+    из БД пачками и отдаются по мере чтения, при gzip=true сжимаются.
+
+    """
+    headers = {
+        'Content-Disposition': 'attachment; filename="{0}.ndjson"'.format(user_id),
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    logger.debug('Export data of user {0}'.format(user_id))
+    return StreamingResponse(
+        service.export(user_id, compress=compress),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers=headers,
+    )
+
+
 @router.get(
     '/{user_id}',
     summary='Информация о пользователе',
     description='Минимальная информация о любом пользователе.',
 )
 async def get_user(
+    request: Request,
+    response: Response,
     user_id: UUID,
     service: AggregateService = Depends(get_user_aggregate_service),
 ):
-    """Просмотр минимальной информации о любом пользователе."""
+    """Просмотр минимальной информации о любом пользователе.
+
+    При совпадении версии пользователя с If-None-Match возвращается 304.
+
+    """
+    etag = await versions.etag((USER_SCOPE, user_id))
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+    response.headers.update(etag_headers(etag))
+
     reviews = await service.review.search(user_id, sort='-date', page_size=10)
 
     user_data = {
@@ -82,6 +150,62 @@ async def add_bookmark(
     return {'status': 'successfully created'}
 
 
+@router.post(
+    '/bookmarks/progress/{film_id}',
+    summary='Место просмотра',
+    description='Сохранить место просмотра фильма, о котором часто сообщает плеер.',
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def update_progress(
+    film_id: UUID,
+    timestamp: int = Query(default=..., alias='timestamp', ge=0),
+    user_id: UUID = Depends(bearer),
+    service: AggregateService = Depends(get_user_aggregate_service),
+):
+    """Сохранить место просмотра.
+
+    Место просмотра записывается в Redis и сбрасывается в БД периодически,
+    поэтому в БД попадает только последнее место за период сброса.
+
+    """
+    await service.bookmark.update_progress(film_id, user_id, timestamp)
+    return {'status': 'successfully updated'}
+
+
+@router.post(
+    '/bookmarks/batch',
+    response_model=list[BatchItemResult],
+    summary='Пакетная запись закладок',
+    description='Добавить, заменить или удалить несколько закладок (мест просмотра) одним запросом.',
+)
+async def batch_bookmarks(
+    operations: list[BookmarkOperation] = Body(default=..., max_items=settings.batch_max_size),
+    user_id: UUID = Depends(bearer),
+    service: AggregateService = Depends(get_user_aggregate_service),
+):
+    """Пакетная запись закладок пользователя, например при синхронизации офлайн активности.
+
+    Все операции выполняются одним неупорядоченным запросом к БД, результат
+    возвращается для каждой операции в порядке их следования.
+
+    Raises:
+      HTTPException: HTTP_503_SERVICE_UNAVAILABLE, БД недоступна.
+
+    """
+    try:
+        errors = await service.bookmark.write_many(
+            user_id, [(operation.film_id, operation.changes()) for operation in operations],
+        )
+    except DBManagerError as exc:
+        logger.error('Batch of {0} bookmarks failed: {1}'.format(len(operations), exc))
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Database is unavailable.')
+    logger.debug('Batch of {0} bookmarks from user {1}'.format(len(operations), user_id))
+    return [
+        BatchItemResult.from_error(operation.film_id, error)
+        for operation, error in zip(operations, errors)
+    ]
+
+
 @router.delete(
     '/bookmarks/remove/{film_id}',
     summary='Удалить закладку',
@@ -0,0 +1 @@
+"""Нагрузочное тестирование ручек UGS API."""
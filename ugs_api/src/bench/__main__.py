@@ -0,0 +1,133 @@
+"""Нагрузочное тестирование ручек UGS API.
+
+Примеры (из каталога src, параметры - переменные окружения BENCH_*):
+    python -m bench seed --drop
+    python -m bench run
+    BENCH_RATE=500 BENCH_BASELINE=baseline.json python -m bench run
+    python -m bench compare bench_results.json baseline.json
+
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+import orjson
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from bench import report
+from bench.config import BenchSettings, bench_settings
+from bench.files import load_or_generate
+from bench.load import LoadRunner
+from bench.routes import select_routes
+from bench.seed import seed
+from db_managers.mongo import MongoManager
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+SEEDED_COLLECTIONS = (
+    'like', 'like_rating', 'review', 'review_like', 'review_like_rating', 'bookmarks',
+)
+COLUMNS = ('requests', 'errors', 'throughput', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+
+
+async def seed_db(bench: BenchSettings, drop: bool) -> int:
+    """Заполнение БД набором данных.
+
+    Args:
+      bench: настройки нагрузочного тестирования;
+      drop: удалить UGC коллекции перед заполнением.
+
+    """
+    client = AsyncIOMotorClient(settings.MONGO_HOST, settings.MONGO_PORT)
+    if drop:
+        mongo_db = client[settings.MONGO_DB_NAME]
+        await asyncio.gather(*[
+            mongo_db.drop_collection(collection) for collection in SEEDED_COLLECTIONS
+        ])
+    db = MongoManager(client=client, db_name=settings.MONGO_DB_NAME)
+    written = await seed(db, load_or_generate(bench), bench)
+    client.close()
+    sys.stdout.write('{0}\n'.format(orjson.dumps(written).decode()))
+    return 0
+
+
+async def run_load(bench: BenchSettings) -> int:
+    """Нагрузка на API, сохранение сводки и сравнение с baseline.
+
+    Args:
+      bench: настройки нагрузочного тестирования.
+
+    Returns:
+      Код завершения: 1, если найдены ухудшения относительно baseline.
+
+    """
+    runner = LoadRunner(bench, load_or_generate(bench), select_routes(bench.routes))
+    summary = report.summarize(await runner.run(), bench)
+    report.save(summary, bench.output)
+    print_table(summary)
+    if not bench.baseline:
+        return 0
+    return check_regressions(summary, report.load(bench.baseline), bench.tolerance)
+
+
+def check_regressions(summary: dict, baseline: dict, tolerance: float) -> int:
+    """Выводим ухудшения относительно baseline.
+
+    Args:
+      summary: сводка текущего прогона;
+      baseline: сводка прогона, с которым сравниваем;
+      tolerance: допустимое относительное ухудшение.
+
+    Returns:
+      Код завершения: 1, если найдены ухудшения.
+
+    """
+    regressions = report.compare(summary, baseline, tolerance)
+    for regression in regressions:
+        sys.stdout.write('REGRESSION {0}\n'.format(regression))
+    return 1 if regressions else 0
+
+
+def print_table(summary: dict):
+    """Выводим сводку в виде таблицы.
+
+    Args:
+      summary: сводка прогона.
+
+    """
+    header = ''.join('{0:>12}'.format(column) for column in COLUMNS)
+    sys.stdout.write('{0:<24}{1}\n'.format('route', header))
+    for name, stats in summary['routes'].items():
+        cells = ''.join('{0:>12}'.format(stats[column]) for column in COLUMNS)
+        sys.stdout.write('{0:<24}{1}\n'.format(name, cells))
+
+
+def main() -> int:
+    """Разбор аргументов командной строки и запуск команды."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='Заполнить БД набором данных.')
+    seed_parser.add_argument('--drop', action='store_true', help='Удалить UGC коллекции.')
+
+    commands.add_parser('run', help='Подать нагрузку на API.')
+
+    compare_parser = commands.add_parser('compare', help='Сравнить сводки двух прогонов.')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('baseline')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'seed':
+        return asyncio.run(seed_db(bench_settings, args.drop))
+    if args.command == 'run':
+        return asyncio.run(run_load(bench_settings))
+    return check_regressions(
+        report.load(args.current), report.load(args.baseline), bench_settings.tolerance,
+    )
+
+
+if __name__ == '__main__':
+    sys.exit(main())
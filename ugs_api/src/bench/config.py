@@ -0,0 +1,51 @@
+"""Настройки нагрузочного тестирования.
+
+Задаются переменными окружения с префиксом BENCH_, например
+BENCH_CONCURRENCY=64 или BENCH_RATE=500.
+
+"""
+from typing import Optional
+
+from pydantic import BaseSettings
+
+
+class BenchSettings(BaseSettings):
+    """Настройки нагрузочного тестирования."""
+
+    api_url: str = 'http://127.0.0.1:8000'
+
+    # Объем данных для заполнения БД.
+    seed: int = 42
+    films: int = 10000
+    users: int = 10000
+    likes: int = 200000
+    reviews: int = 20000
+    review_likes: int = 50000
+    bookmarks: int = 50000
+    # Показатели степенных распределений популярности фильмов и активности пользователей.
+    film_zipf: float = 1.1
+    user_zipf: float = 1.2
+    seed_batch_size: int = 10000
+    # Каталог набора, созданного research/dataset.py (например, research/data/seed_42).
+    # Если задан, параметры объема данных выше не используются.
+    dataset_dir: Optional[str] = None
+
+    # Нагрузка: фиксированное кол-во одновременных запросов (closed loop)
+    # или фиксированная частота запросов в секунду (open loop), если задана rate.
+    concurrency: int = 32
+    rate: Optional[float] = None
+    duration: float = 10.0
+    warmup: float = 2.0
+    timeout: float = 10.0
+    routes: list[str] = []
+
+    output: str = 'bench_results.json'
+    baseline: Optional[str] = None
+    # Допустимое ухудшение p95 / p99 и пропускной способности относительно baseline.
+    tolerance: float = 0.1
+
+    class Config:
+        env_prefix = 'BENCH_'
+
+
+bench_settings = BenchSettings()
@@ -0,0 +1,116 @@
+"""Воспроизводимый набор данных для нагрузочного тестирования.
+
+Популярность фильмов и обзоров и активность пользователей распределены по
+закону Ципфа: небольшая часть фильмов собирает большую часть оценок, как и
+в рабочей нагрузке. Идентификаторы и выборки зависят только от seed, поэтому
+заполнение БД и нагрузка используют одни и те же фильмы и пользователей.
+
+"""
+import random
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Callable, Sequence
+from uuid import UUID
+
+from bench.config import BenchSettings
+from bench.rows import RowList, UGCRow, UGCRows
+
+# Оценки и их доли: в основном лайки (10) и дизлайки (0).
+SCORES = (10, 0, 9, 8, 7, 6, 5, 4, 3, 2, 1)
+SCORE_WEIGHTS = (55, 20, 5, 5, 4, 3, 3, 2, 1, 1, 1)
+MAX_TIMESTAMP = 10800
+UUID_BITS = 128
+
+ValueFunc = Callable[[random.Random], int]
+
+
+@dataclass
+class Sampler:
+    """Идентификаторы с накопленными весами распределения Ципфа."""
+
+    ids: Sequence[UUID]
+    cum_weights: list[float]
+
+    @classmethod
+    def zipf(cls, ids: Sequence[UUID], exponent: float) -> 'Sampler':
+        """Вес элемента с рангом r пропорционален 1 / r ** exponent.
+
+        Args:
+          ids: идентификаторы в порядке убывания популярности;
+          exponent: показатель распределения, чем больше - тем сильнее перекос.
+
+        """
+        ranks = range(1, len(ids) + 1)
+        weights = [rank ** -exponent for rank in ranks]
+        return cls(ids=ids, cum_weights=list(accumulate(weights)))
+
+    def pick(self, rng: random.Random) -> UUID:
+        """Один идентификатор с учетом весов."""
+        return self.sample(rng, 1)[0]
+
+    def sample(self, rng: random.Random, count: int) -> list[UUID]:
+        """Выборка с повторениями с учетом весов."""
+        return rng.choices(self.ids, cum_weights=self.cum_weights, k=count)
+
+
+@dataclass
+class Dataset:
+    """Фильмы, пользователи и их оценки, обзоры и закладки."""
+
+    films: Sampler
+    users: Sampler
+    reviewed: Sampler
+    likes: UGCRows
+    reviews: UGCRows
+    review_likes: UGCRows
+    bookmarks: UGCRows
+
+
+def generate(settings: BenchSettings) -> Dataset:
+    """Создаем набор данных по настройкам.
+
+    Повторные пары (объект, пользователь) объединяются, поэтому записей
+    может быть меньше заданного кол-ва. Идентификатор обзора reviewed.ids[i]
+    соответствует обзору reviews[i].
+
+    Args:
+      settings: настройки нагрузочного тестирования.
+
+    """
+    rng = random.Random(settings.seed)
+    films = Sampler.zipf(_uuids(rng, settings.films), settings.film_zipf)
+    users = Sampler.zipf(_uuids(rng, settings.users), settings.user_zipf)
+    likes = _rows(rng, films, users, settings.likes, _score)
+    reviews = _rows(rng, films, users, settings.reviews, _score)
+    reviewed = Sampler.zipf(_uuids(rng, len(reviews)), settings.film_zipf)
+    return Dataset(
+        films=films,
+        users=users,
+        reviewed=reviewed,
+        likes=RowList(likes),
+        reviews=RowList(reviews),
+        review_likes=RowList(_rows(rng, reviewed, users, settings.review_likes, _score)),
+        bookmarks=RowList(_rows(rng, films, users, settings.bookmarks, _timestamp)),
+    )
+
+
+def _uuids(rng: random.Random, count: int) -> list[UUID]:
+    random_ints = (rng.getrandbits(UUID_BITS) for _ in range(count))
+    return [UUID(int=random_int, version=4) for random_int in random_ints]
+
+
+def _rows(
+    rng: random.Random, obj_ids: Sampler, users: Sampler, count: int, make_value: ValueFunc,
+) -> list[UGCRow]:
+    """Уникальные пары (объект, пользователь) со значением."""
+    pairs = zip(obj_ids.sample(rng, count), users.sample(rng, count))
+    rows = {pair: make_value(rng) for pair in pairs}
+    return [(*pair, row_value) for pair, row_value in rows.items()]
+
+
+def _score(rng: random.Random) -> int:
+    return rng.choices(SCORES, weights=SCORE_WEIGHTS)[0]
+
+
+def _timestamp(rng: random.Random) -> int:
+    return rng.randrange(MAX_TIMESTAMP)
@@ -0,0 +1,116 @@
+"""Набор данных, созданный генератором research/dataset.py.
+
+Файлы читаются без NumPy: идентификаторы - UUID по 16 байт, записи - по
+36 байт (UUID объекта, UUID пользователя, int32 little-endian). Показатели
+распределений Ципфа берутся из meta.json, поэтому нагрузка на API и тесты
+БД используют одни и те же данные.
+
+Файлы не читаются целиком: идентификатор переводится в UUID при обращении,
+а записи - пакетами по мере заполнения БД.
+
+"""
+import json
+import mmap
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Sequence
+from uuid import UUID
+
+from bench.config import BenchSettings
+from bench.dataset import Dataset, Sampler, generate
+from bench.rows import UGCRow
+
+UUID_SIZE = 16
+RECORD = struct.Struct('<16s16si')
+
+
+def load_or_generate(settings: BenchSettings) -> Dataset:
+    """Набор из settings.dataset_dir, если он задан, иначе создаем его.
+
+    Args:
+      settings: настройки нагрузочного тестирования.
+
+    """
+    if settings.dataset_dir:
+        return load_dataset(Path(settings.dataset_dir))
+    return generate(settings)
+
+
+def load_dataset(path: Path) -> Dataset:
+    """Читаем набор данных из каталога.
+
+    Args:
+      path: каталог набора, например, research/data/seed_42.
+
+    """
+    spec = json.loads((path / 'meta.json').read_text())['spec']
+    film_zipf = spec['film_zipf']
+    return Dataset(
+        films=Sampler.zipf(MappedIds(path / 'films.bin'), film_zipf),
+        users=Sampler.zipf(MappedIds(path / 'users.bin'), spec['user_zipf']),
+        reviewed=Sampler.zipf(MappedIds(path / 'review_ids.bin'), film_zipf),
+        likes=MappedRows(path / 'likes.bin'),
+        reviews=MappedRows(path / 'reviews.bin'),
+        review_likes=MappedRows(path / 'review_likes.bin'),
+        bookmarks=MappedRows(path / 'bookmarks.bin'),
+    )
+
+
+class MappedIds(Sequence[UUID]):
+    """Идентификаторы из файла, UUID создается при обращении по индексу."""
+
+    def __init__(self, file_path: Path):
+        """Конструктор класса.
+
+        Args:
+          file_path: файл с UUID по 16 байт.
+
+        """
+        self.buffer = _mapped(file_path)
+
+    def __len__(self) -> int:
+        """Кол-во идентификаторов."""
+        return len(self.buffer) // UUID_SIZE
+
+    def __getitem__(self, index):
+        """Идентификатор по индексу или список идентификаторов по срезу."""
+        positions = range(len(self))
+        if isinstance(index, slice):
+            return [self._read(position) for position in positions[index]]
+        return self._read(positions[index])
+
+    def _read(self, position: int) -> UUID:
+        offset = position * UUID_SIZE
+        return UUID(bytes=self.buffer[offset:offset + UUID_SIZE])
+
+
+@dataclass
+class MappedRows:
+    """Записи из файла, которые переводятся в кортежи пакетами."""
+
+    file_path: Path
+
+    def __len__(self) -> int:
+        """Кол-во записей."""
+        return self.file_path.stat().st_size // RECORD.size
+
+    def batches(self, size: int) -> Iterator[list[UGCRow]]:
+        """Записи по порядку пакетами не больше size.
+
+        Args:
+          size: кол-во записей в пакете.
+
+        """
+        step = size * RECORD.size
+        with _mapped(self.file_path) as buffer:
+            for start in range(0, len(buffer), step):
+                yield [
+                    (UUID(bytes=obj_id), UUID(bytes=user_id), row_value)
+                    for obj_id, user_id, row_value in RECORD.iter_unpack(buffer[start:start + step])
+                ]
+
+
+def _mapped(file_path: Path) -> mmap.mmap:
+    with open(file_path, 'rb') as bin_file:
+        return mmap.mmap(bin_file.fileno(), 0, access=mmap.ACCESS_READ)
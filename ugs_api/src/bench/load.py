@@ -0,0 +1,168 @@
+"""Подача нагрузки на API.
+
+Два режима:
+- closed loop: settings.concurrency пользователей, каждый отправляет
+  следующий запрос сразу после ответа на предыдущий. Показывает предельную
+  пропускную способность, но при замедлении API нагрузка тоже снижается;
+- open loop (settings.rate): запросы отправляются с фиксированной частотой
+  независимо от ответов. Задержка считается от запланированного времени
+  отправки, а не от фактического, поэтому ожидание свободного соединения
+  входит в задержку (поправка на coordinated omission).
+
+Запросы первых settings.warmup секунд не учитываются.
+
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID, uuid4
+
+import aiohttp
+import jwt
+
+from bench.config import BenchSettings
+from bench.dataset import Dataset
+from bench.routes import BenchRequest, RequestFactory, Route
+
+logger = logging.getLogger(__name__)
+
+TOKEN_TTL = timedelta(days=1)
+# API нагрузочного стенда запускается с JWT_VALIDATE=0, подпись не проверяется.
+TOKEN_SECRET = 'bench'
+CLIENT_ERROR_STATUS = 0
+
+
+@dataclass
+class Sample:
+    """Результат одного запроса."""
+
+    route: str
+    latency: float
+    status: int
+
+
+@dataclass
+class LoadResult:
+    """Результаты запросов и длительность измерения в секундах."""
+
+    samples: list[Sample]
+    elapsed: float
+    mode: str
+
+
+class LoadRunner:
+    """Нагрузка на API по смеси маршрутов."""
+
+    def __init__(self, settings: BenchSettings, dataset: Dataset, routes: list[Route]):
+        """Конструктор класса.
+
+        Args:
+          settings: настройки нагрузочного тестирования;
+          dataset: набор данных, которым заполнена БД;
+          routes: маршруты, доля каждого задается его весом.
+
+        """
+        self.settings = settings
+        self.dataset = dataset
+        self.routes = routes
+        self.rng = random.Random(settings.seed)
+        self.requests = RequestFactory(dataset, self.rng)
+        self._weights = [bench_route.weight for bench_route in routes]
+        self._tokens: dict[UUID, str] = {}
+        self._samples: list[Sample] = []
+        self._measure_from: float = 0
+
+    async def run(self) -> LoadResult:
+        """Подаем нагрузку settings.warmup + settings.duration секунд."""
+        self._samples = []
+        connector = aiohttp.TCPConnector(limit=self.settings.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.settings.timeout)
+        async with aiohttp.ClientSession(
+            self.settings.api_url, connector=connector, timeout=timeout,
+        ) as session:
+            start = time.perf_counter()
+            self._measure_from = start + self.settings.warmup
+            deadline = self._measure_from + self.settings.duration
+            if self.settings.rate:
+                await self._open_loop(session, start, deadline)
+            else:
+                await asyncio.gather(*[
+                    self._closed_loop_user(session, deadline)
+                    for _ in range(self.settings.concurrency)
+                ])
+        return LoadResult(
+            samples=self._samples,
+            elapsed=self.settings.duration,
+            mode='open' if self.settings.rate else 'closed',
+        )
+
+    async def _closed_loop_user(self, session: aiohttp.ClientSession, deadline: float):
+        while time.perf_counter() < deadline:
+            await self._send(session, time.perf_counter())
+
+    async def _open_loop(self, session: aiohttp.ClientSession, start: float, deadline: float):
+        """Отправляем запросы по расписанию, не дожидаясь ответов."""
+        interval = 1 / self.settings.rate
+        tasks = set()
+        scheduled = start
+        while scheduled < deadline:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(self._send(session, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            scheduled += interval
+        await asyncio.gather(*tasks)
+
+    async def _send(self, session: aiohttp.ClientSession, scheduled: float):
+        """Запрос к случайному маршруту, задержка считается от scheduled."""
+        bench_route = self.rng.choices(self.routes, weights=self._weights)[0]
+        user_id = self.dataset.users.pick(self.rng)
+        bench_request = self.requests.build(bench_route, user_id)
+        status = await self._request(session, bench_route, bench_request, user_id)
+        finished = time.perf_counter()
+        if scheduled >= self._measure_from:
+            self._samples.append(Sample(bench_route.name, finished - scheduled, status))
+
+    async def _request(
+        self,
+        session: aiohttp.ClientSession,
+        bench_route: Route,
+        bench_request: BenchRequest,
+        user_id: UUID,
+    ) -> int:
+        headers = {
+            'Authorization': 'Bearer {0}'.format(self._token(user_id)),
+            'X-Request-Id': str(uuid4()),
+        }
+        try:
+            async with session.request(
+                bench_route.method,
+                bench_route.url(bench_request),
+                params=bench_request.query,
+                json=bench_request.json_body,
+                headers=headers,
+            ) as response:
+                await response.read()
+                return response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            logger.debug('{0} failed: {1!r}'.format(bench_route.name, exc))
+            return CLIENT_ERROR_STATUS
+
+    def _token(self, user_id: UUID) -> str:
+        """Токен пользователя, создается один раз на время теста."""
+        token: Optional[str] = self._tokens.get(user_id)
+        if token is None:
+            payload = {
+                'sub': str(user_id),
+                'jti': str(uuid4()),
+                'exp': datetime.now(timezone.utc) + TOKEN_TTL,
+            }
+            token = jwt.encode(payload, TOKEN_SECRET, algorithm='HS256')
+            self._tokens[user_id] = token
+        return token
@@ -0,0 +1,151 @@
+"""Сводка результатов нагрузочного теста и сравнение с baseline.
+
+Для каждого маршрута и для всей смеси считаются пропускная способность,
+доля ошибок и перцентили задержки (по ближайшему рангу, без интерполяции).
+Результат сохраняется в JSON, чтобы сравнивать прогоны до и после изменений.
+
+"""
+import math
+import platform
+from datetime import datetime
+from types import MappingProxyType
+from typing import Iterable, Sequence
+
+import orjson
+
+from bench.config import BenchSettings
+from bench.load import LoadResult, Sample
+
+MILLISECONDS = 1000
+PERCENTILES = MappingProxyType({'p50': 50, 'p95': 95, 'p99': 99})
+# Метрики, рост которых считается ухудшением.
+LATENCY_METRICS = ('p95_ms', 'p99_ms')
+ERROR_STATUS = 400
+TOTAL = 'total'
+
+
+def percentile(sorted_values: Sequence[float], rank: float) -> float:
+    """Перцентиль по ближайшему рангу.
+
+    Args:
+      sorted_values: значения по возрастанию;
+      rank: перцентиль от 0 до 100.
+
+    """
+    if not sorted_values:
+        return 0
+    position = math.ceil(rank / 100 * len(sorted_values))
+    return sorted_values[max(position, 1) - 1]
+
+
+def route_stats(samples: Iterable[Sample], elapsed: float) -> dict:
+    """Пропускная способность, ошибки и задержки запросов.
+
+    Args:
+      samples: результаты запросов;
+      elapsed: длительность измерения в секундах.
+
+    """
+    latencies = []
+    errors = 0
+    for sample in samples:
+        latencies.append(sample.latency * MILLISECONDS)
+        errors += not 0 < sample.status < ERROR_STATUS
+    latencies.sort()
+    count = len(latencies)
+    stats = {
+        'requests': count,
+        'errors': errors,
+        'throughput': round(count / elapsed, 1) if elapsed else 0,
+        'mean_ms': round(sum(latencies) / count, 2) if count else 0,
+        'max_ms': round(latencies[-1], 2) if count else 0,
+    }
+    for name, rank in PERCENTILES.items():
+        stats['{0}_ms'.format(name)] = round(percentile(latencies, rank), 2)
+    return stats
+
+
+def summarize(load_result: LoadResult, settings: BenchSettings) -> dict:
+    """Сводка по маршрутам и по всей смеси с параметрами запуска.
+
+    Args:
+      load_result: результаты нагрузки;
+      settings: настройки нагрузочного тестирования.
+
+    """
+    by_route: dict[str, list[Sample]] = {}
+    for sample in load_result.samples:
+        by_route.setdefault(sample.route, []).append(sample)
+    routes = {
+        name: route_stats(route_samples, load_result.elapsed)
+        for name, route_samples in sorted(by_route.items())
+    }
+    routes[TOTAL] = route_stats(load_result.samples, load_result.elapsed)
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'host': platform.node(),
+            'mode': load_result.mode,
+            'settings': settings.dict(exclude={'baseline', 'output'}),
+        },
+        'routes': routes,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Ухудшения относительно baseline больше допустимого.
+
+    Ухудшением считается рост p95 / p99 больше чем на долю tolerance или
+    такое снижение пропускной способности, что baseline больше текущей
+    больше чем на долю tolerance. Маршруты, которых нет в baseline,
+    не сравниваются.
+
+    Args:
+      report: сводка текущего прогона;
+      baseline: сводка прогона, с которым сравниваем;
+      tolerance: допустимое относительное ухудшение.
+
+    """
+    regressions: list[str] = []
+    for name, stats in report['routes'].items():
+        base = baseline['routes'].get(name)
+        if not base:
+            continue
+        regressions.extend(
+            '{0}: {1} {2} -> {3}'.format(name, metric, base[metric], stats[metric])
+            for metric in LATENCY_METRICS
+            if _worse(stats[metric], base[metric], tolerance)
+        )
+        if _worse(base['throughput'], stats['throughput'], tolerance):
+            regressions.append('{0}: throughput {1} -> {2}'.format(
+                name, base['throughput'], stats['throughput'],
+            ))
+    return regressions
+
+
+def save(report: dict, path: str):
+    """Сохраняем сводку в файл JSON.
+
+    Args:
+      report: сводка прогона;
+      path: путь к файлу.
+
+    """
+    with open(path, 'wb') as report_file:
+        report_file.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+
+def load(path: str) -> dict:
+    """Читаем сводку из файла JSON.
+
+    Args:
+      path: путь к файлу.
+
+    """
+    with open(path, 'rb') as report_file:
+        return orjson.loads(report_file.read())
+
+
+def _worse(current: float, previous: float, tolerance: float) -> bool:
+    """Значение выросло больше чем на долю tolerance."""
+    return previous > 0 and current > previous * (1 + tolerance)
@@ -0,0 +1,186 @@
+"""Маршруты API, на которые подается нагрузка.
+
+Каждый маршрут описывает шаблон пути и метод RequestFactory, который по
+набору данных выбирает параметры запроса: популярные фильмы и активные
+пользователи выбираются чаще, как и в рабочей нагрузке. Вес маршрута задает
+его долю в смешанной нагрузке, по умолчанию преобладает чтение.
+
+"""
+import random
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Optional
+from uuid import UUID
+
+from bench.dataset import MAX_TIMESTAMP, SCORES, Dataset
+
+RATINGS_IDS = 20
+BATCH_SIZE = 20
+REVIEW_SORTS = ('-avg', '-sum', 'date', '_id')
+
+
+@dataclass
+class BenchRequest:
+    """Параметры одного запроса."""
+
+    path_params: dict = field(default_factory=dict)
+    query: dict = field(default_factory=dict)
+    json_body: Optional[Any] = None
+
+
+@dataclass(frozen=True)
+class Route:
+    """Маршрут API и метод RequestFactory для построения запросов к нему."""
+
+    name: str
+    method: str
+    path: str
+    weight: int
+    builder: str
+
+    def url(self, bench_request: BenchRequest) -> str:
+        """Путь запроса с подставленными параметрами.
+
+        Args:
+          bench_request: параметры запроса.
+
+        """
+        return self.path.format(**bench_request.path_params)
+
+
+class ReadRequests:
+    """Параметры запросов на чтение по набору данных."""
+
+    def __init__(self, dataset: Dataset, rng: random.Random):
+        """Конструктор класса.
+
+        Args:
+          dataset: набор данных, которым заполнена БД;
+          rng: генератор случайных чисел.
+
+        """
+        self.dataset = dataset
+        self.rng = rng
+
+    def empty(self, user_id: UUID) -> BenchRequest:
+        """Запрос без параметров."""
+        return BenchRequest()
+
+    def film(self, user_id: UUID) -> BenchRequest:
+        """Запрос к фильму."""
+        return BenchRequest(path_params={'film_id': self.dataset.films.pick(self.rng)})
+
+    def review(self, user_id: UUID) -> BenchRequest:
+        """Запрос к обзору."""
+        return BenchRequest(path_params={'review_id': self.dataset.reviewed.pick(self.rng)})
+
+    def user(self, user_id: UUID) -> BenchRequest:
+        """Запрос к странице другого пользователя."""
+        return BenchRequest(path_params={'user_id': self.dataset.users.pick(self.rng)})
+
+    def ratings(self, user_id: UUID) -> BenchRequest:
+        """Рейтинг нескольких фильмов."""
+        film_ids = self.dataset.films.sample(self.rng, RATINGS_IDS)
+        ids = ','.join(str(film_id) for film_id in film_ids)
+        return BenchRequest(query={'ids': ids})
+
+    def reviews_page(self, user_id: UUID) -> BenchRequest:
+        """Первая страница обзоров фильма с одной из сортировок."""
+        bench_request = self.film(user_id)
+        bench_request.query['sort'] = self.rng.choice(REVIEW_SORTS)
+        return bench_request
+
+
+class RequestFactory(ReadRequests):
+    """Параметры запросов по набору данных: чтение и запись."""
+
+    def build(self, bench_route: Route, user_id: UUID) -> BenchRequest:
+        """Параметры запроса к маршруту от имени пользователя.
+
+        Args:
+          bench_route: маршрут;
+          user_id: пользователь, от имени которого выполняется запрос.
+
+        """
+        return getattr(self, bench_route.builder)(user_id)
+
+    def film_like(self, user_id: UUID) -> BenchRequest:
+        """Оценка фильма."""
+        bench_request = self.film(user_id)
+        bench_request.query['score'] = self.rng.choice(SCORES)
+        return bench_request
+
+    def review_like(self, user_id: UUID) -> BenchRequest:
+        """Оценка обзора."""
+        bench_request = self.review(user_id)
+        bench_request.query['score'] = self.rng.choice(SCORES)
+        return bench_request
+
+    def film_review(self, user_id: UUID) -> BenchRequest:
+        """Обзор фильма."""
+        bench_request = self.film(user_id)
+        bench_request.query.update(title='Bench review', text='Review by {0}'.format(user_id))
+        return bench_request
+
+    def bookmark(self, user_id: UUID) -> BenchRequest:
+        """Закладка или место просмотра фильма."""
+        bench_request = self.film(user_id)
+        bench_request.query['timestamp'] = self.rng.randrange(MAX_TIMESTAMP)
+        return bench_request
+
+    def likes_batch(self, user_id: UUID) -> BenchRequest:
+        """Пакет оценок фильмов."""
+        operations = [
+            {'film_id': str(film_id), 'score': self.rng.choice(SCORES)}
+            for film_id in self.dataset.films.sample(self.rng, BATCH_SIZE)
+        ]
+        return BenchRequest(json_body=operations)
+
+    def bookmarks_batch(self, user_id: UUID) -> BenchRequest:
+        """Пакет мест просмотра фильмов."""
+        operations = [
+            {'film_id': str(film_id), 'timestamp': self.rng.randrange(MAX_TIMESTAMP)}
+            for film_id in self.dataset.films.sample(self.rng, BATCH_SIZE)
+        ]
+        return BenchRequest(json_body=operations)
+
+
+ROUTES = MappingProxyType({
+    bench_route.name: bench_route
+    for bench_route in (
+        Route('films.ratings', 'GET', '/api/v1/films/ratings', 2, 'ratings'),
+        Route('films.get', 'GET', '/api/v1/films/{film_id}', 10, 'film'),
+        Route('films.add_like', 'POST', '/api/v1/films/{film_id}/add_like', 3, 'film_like'),
+        Route('films.remove_like', 'DELETE', '/api/v1/films/{film_id}/remove_like', 1, 'film'),
+        Route('films.likes_batch', 'POST', '/api/v1/films/likes/batch', 1, 'likes_batch'),
+        Route('films.add_review', 'POST', '/api/v1/films/{film_id}/add_review', 1, 'film_review'),
+        Route('films.remove_review', 'DELETE', '/api/v1/films/{film_id}/remove_review', 1, 'film'),
+        Route('reviews.get', 'GET', '/api/v1/reviews/{review_id}', 4, 'review'),
+        Route('reviews.list', 'GET', '/api/v1/reviews/film/{film_id}', 4, 'reviews_page'),
+        Route('reviews.add_like', 'POST', '/api/v1/reviews/{review_id}/add_like', 1, 'review_like'),
+        Route('reviews.remove_like', 'DELETE', '/api/v1/reviews/{review_id}/remove_like', 1, 'review'),
+        Route('users.my_account', 'GET', '/api/v1/users/my_account', 3, 'empty'),
+        Route('users.export', 'GET', '/api/v1/users/my_account/export', 1, 'empty'),
+        Route('users.get', 'GET', '/api/v1/users/{user_id}', 2, 'user'),
+        Route('users.add_bookmark', 'POST', '/api/v1/users/bookmarks/add/{film_id}', 1, 'bookmark'),
+        Route('users.progress', 'POST', '/api/v1/users/bookmarks/progress/{film_id}', 4, 'bookmark'),
+        Route('users.bookmarks_batch', 'POST', '/api/v1/users/bookmarks/batch', 1, 'bookmarks_batch'),
+        Route('users.remove_bookmark', 'DELETE', '/api/v1/users/bookmarks/remove/{film_id}', 1, 'film'),
+    )
+})
+
+
+def select_routes(names: list[str]) -> list[Route]:
+    """Маршруты по названиям, пустой список - все маршруты.
+
+    Args:
+      names: названия маршрутов (films.get, users.progress, ...).
+
+    Raises:
+      ValueError: неизвестное название маршрута.
+
+    """
+    unknown = set(names) - set(ROUTES)
+    if unknown:
+        raise ValueError('Unknown routes: {0}'.format(', '.join(sorted(unknown))))
+    return [ROUTES[name] for name in names] if names else list(ROUTES.values())
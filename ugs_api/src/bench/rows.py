@@ -0,0 +1,37 @@
+"""Записи набора данных (объект, пользователь, значение).
+
+Записи заполняемой БД читаются пакетами, поэтому набор из файла не
+переводится в объекты Python целиком (см. bench.files).
+
+"""
+from dataclasses import dataclass
+from typing import Iterator, Protocol
+from uuid import UUID
+
+UGCRow = tuple[UUID, UUID, int]
+
+
+class UGCRows(Protocol):
+    """Записи набора данных, которые читаются пакетами."""
+
+    def __len__(self) -> int:
+        """Кол-во записей."""
+
+    def batches(self, size: int) -> Iterator[list[UGCRow]]:
+        """Записи по порядку пакетами не больше size."""
+
+
+@dataclass
+class RowList:
+    """Записи, созданные в памяти."""
+
+    rows: list[UGCRow]
+
+    def __len__(self) -> int:
+        """Кол-во записей."""
+        return len(self.rows)
+
+    def batches(self, size: int) -> Iterator[list[UGCRow]]:
+        """Записи по порядку пакетами не больше size."""
+        for start in range(0, len(self.rows), size):
+            yield self.rows[start:start + size]
@@ -0,0 +1,133 @@
+"""Заполнение БД набором данных для нагрузочного тестирования.
+
+Записи пишутся пакетами через apply_batch сервисов, поэтому счетчики
+рейтинга фильмов и обзоров и поля likes_* обзоров заполняются так же, как
+при работе API. Коллекции заполняются одновременно, кроме лайков обзоров:
+они записываются после обзоров, т.к. лайк обзора изменяет уже существующий
+обзор.
+
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable, Iterator, Sequence
+from uuid import UUID
+
+from bench.config import BenchSettings
+from bench.dataset import Dataset
+from bench.rows import UGCRow, UGCRows
+from db_managers.abstract_manager import AbstractDBManager
+from services.indexes import apply_indexes
+from services.ugc.base_service import UGCKey, UGCService
+from services.ugc.bookmark import get_bookmark_service
+from services.ugc.like import get_like_service, get_review_like_service
+from services.ugc.review import get_review_service
+
+logger = logging.getLogger(__name__)
+
+# Даты записей равномерно распределены за этот период.
+DATE_RANGE_DAYS = 365
+DATE_RANGE = timedelta(days=DATE_RANGE_DAYS)
+
+RowFields = Callable[[int, UGCRow], dict]
+SeedTarget = tuple[UGCService, UGCRows, RowFields]
+
+
+async def seed(db: AbstractDBManager, dataset: Dataset, settings: BenchSettings) -> dict[str, int]:
+    """Записываем набор данных в БД.
+
+    Args:
+      db: менеджер для работы с БД;
+      dataset: набор данных;
+      settings: настройки нагрузочного тестирования.
+
+    Returns:
+      Кол-во записанных записей по коллекциям.
+
+    """
+    await apply_indexes(db)
+    review_ids = dataset.reviewed.ids
+    first: Sequence[SeedTarget] = (
+        (get_like_service(db=db), dataset.likes, _score_fields),
+        (get_review_service(db=db), dataset.reviews, partial(_review_fields, review_ids)),
+        (get_bookmark_service(db=db), dataset.bookmarks, _timestamp_fields),
+    )
+    second: Sequence[SeedTarget] = (
+        (get_review_like_service(db=db), dataset.review_likes, _score_fields),
+    )
+    written = await _seed_targets(first, settings.seed_batch_size)
+    written.update(await _seed_targets(second, settings.seed_batch_size))
+    return written
+
+
+async def _seed_targets(targets: Sequence[SeedTarget], batch_size: int) -> dict[str, int]:
+    """Одновременно заполняем коллекции нескольких сервисов."""
+    totals = await asyncio.gather(*[
+        _seed_rows(service, rows, row_fields, batch_size)
+        for service, rows, row_fields in targets
+    ])
+    return {
+        service.collection_name: total
+        for (service, _, _), total in zip(targets, totals)
+    }
+
+
+async def _seed_rows(
+    service: UGCService, rows: UGCRows, row_fields: RowFields, batch_size: int,
+) -> int:
+    """Пишем записи одного сервиса пакетами по batch_size по мере их чтения.
+
+    Пакеты пишутся по очереди, чтобы в памяти был только текущий пакет.
+
+    """
+    total = 0
+    start = 0
+    batches = rows.batches(batch_size)
+    batch: list[UGCRow] = next(batches, [])
+    while batch:
+        changes = dict(_changes(batch, start, len(rows), row_fields))
+        start += len(batch)
+        errors = await service.apply_batch(changes)
+        failed = [error for error in errors.values() if error]
+        if failed:
+            logger.warning('{0}: {1} writes failed: {2}'.format(
+                service.collection_name, len(failed), failed[0],
+            ))
+        total += len(changes) - len(failed)
+        logger.info('{0}: {1} / {2}'.format(service.collection_name, total, len(rows)))
+        batch = next(batches, [])
+    return total
+
+
+def _changes(
+    batch: list[UGCRow], start: int, count: int, row_fields: RowFields,
+) -> Iterator[tuple[UGCKey, dict]]:
+    """Изменения пакета, start - номер первой записи пакета, count - всего записей."""
+    now = datetime.now()
+    for idx, row in enumerate(batch, start):
+        obj_id, user_id, _ = row
+        doc = {
+            'obj_id': str(obj_id),
+            'user_id': str(user_id),
+            'date': now - DATE_RANGE * (idx / count),
+        }
+        doc.update(row_fields(idx, row))
+        yield (doc['obj_id'], doc['user_id']), doc
+
+
+def _score_fields(idx: int, row: UGCRow) -> dict:
+    return {'score': row[2]}
+
+
+def _timestamp_fields(idx: int, row: UGCRow) -> dict:
+    return {'timestamp': row[2]}
+
+
+def _review_fields(review_ids: Sequence[UUID], idx: int, row: UGCRow) -> dict:
+    review_id = review_ids[idx]
+    return {
+        'review_id': str(review_id),
+        'title': 'Review {0}'.format(review_id),
+        'text': 'Film rated {0} of 10. '.format(row[2]) * (row[2] + 1),
+    }
@@ -0,0 +1,9 @@
+"""DI для общей HTTP сессии aiohttp."""
+from aiohttp import ClientSession
+
+session: ClientSession | None = None
+
+
+def get_session() -> ClientSession | None:
+    """DI для общей HTTP сессии aiohttp."""
+    return session
@@ -1,17 +1,74 @@
 """Описание интерфейса для работы с БД."""
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Mapping, Optional, Sequence
+
+# Поле среднего значения -> (поле суммы, поле кол-ва).
+Averages = Mapping[str, tuple[str, str]]
 
 
 class DBManagerError(Exception):
     """Базовое исключение для ошибок в работе менеджера БД."""
 
 
-class AbstractDBManager(ABC):
-    """Простой менеджер для работы с БД."""
+class InvalidCursorError(DBManagerError):
+    """Исключение при попытке использовать некорректный курсор пагинации."""
+
+
+@dataclass(frozen=True)
+class Index:
+    """Описание индекса таблицы (коллекции).
+
+    Args:
+      fields: поля индекса и направление сортировки [('obj_id', 1), ('date', -1)];
+      unique: уникальный индекс.
+
+    """
+
+    fields: tuple[tuple[str, int], ...]
+    unique: bool = False
+
+    @property
+    def name(self) -> str:
+        """Имя индекса в формате MongoDB: obj_id_1_date_-1."""
+        parts = ['{0}_{1}'.format(field, order) for field, order in self.fields]
+        return '_'.join(parts)
+
+
+@dataclass(frozen=True)
+class BulkOperation:
+    """Операция пакетной записи.
+
+    Если не заданы ни obj_data, ни increment, то запись удаляется.
+
+    Args:
+      search: словарь с уникальным ключом записи;
+      obj_data: новая версия записи, запись создается, если ее не существует;
+      increment: изменения счетчиков записи;
+      averages: средние значения, пересчитываемые после изменения счетчиков;
+      upsert: создать запись при изменении счетчиков, если ее не существует.
+
+    """
+
+    search: dict
+    obj_data: Optional[dict] = None
+    increment: Optional[dict] = None
+    averages: Optional[Averages] = None
+    upsert: bool = True
+
+
+class AbstractReader(ABC):
+    """Чтение записей из БД."""
 
     @abstractmethod
     async def search(
-        self, table: str, search: dict, limit: int, offset: int, sort: list,
+        self,
+        table: str,
+        search: dict,
+        limit: int,
+        offset: int,
+        sort: list,
+        after: Optional[str] = None,
     ):
         """Поиск, возвращающий список значений.
 
@@ -20,33 +77,46 @@ class AbstractDBManager(ABC):
           search: словарь с данными для поиска;
           limit: кол-во элементов в выдаче;
           offset: смещение (пропуск первых N элементов);
-          sort: список с полями для сортировки.
+          sort: список с полями для сортировки;
+          after: курсор, полученный из make_cursor, заменяет offset.
+
+        Raises:
+          InvalidCursorError: некорректный курсор.
 
         """
 
     @abstractmethod
-    async def get(self, table: str, search: dict):
-        """Поиск, возвращающий только одно значение.
+    def iterate(
+        self, table: str, search: dict, sort: list, batch_size: int,
+    ) -> AsyncIterator[dict]:
+        """Последовательное чтение всех найденных записей пачками.
+
+        В памяти одновременно находится не более batch_size записей.
 
         Args:
           table: название таблицы (коллекции) БД;
-          search: словарь с данными для поиска.
+          search: словарь с данными для поиска;
+          sort: список полей и направлений сортировки [(id, 1), (name, -1)];
+          batch_size: кол-во записей, получаемых из БД за один запрос.
 
         """
 
     @abstractmethod
-    async def create(self, table: str, obj_data: dict):
-        """Создание записи в БД.
+    def make_cursor(self, doc: dict, sort_field: str) -> str:
+        """Создание курсора для получения следующей страницы.
+
+        Курсор содержит значение поля сортировки и идентификатор последней
+        записи на странице.
 
         Args:
-          table: название таблицы (коллекции) БД;
-          obj_data: словарь с данными для поиска.
+          doc: последняя запись на странице;
+          sort_field: поле, по которому выполняется сортировка.
 
         """
 
     @abstractmethod
-    async def delete(self, table: str, search: dict):
-        """Удаление записи из БД.
+    async def get(self, table: str, search: dict):
+        """Поиск, возвращающий только одно значение.
 
         Args:
           table: название таблицы (коллекции) БД;
@@ -54,6 +124,16 @@ class AbstractDBManager(ABC):
 
         """
 
+    @abstractmethod
+    async def get_many(self, table: str, searches: Sequence[dict]) -> list[dict]:
+        """Поиск записей, соответствующих любому из условий, одним запросом.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          searches: список словарей с данными для поиска.
+
+        """
+
     @abstractmethod
     def aggregate(
         self,
@@ -65,6 +145,7 @@ class AbstractDBManager(ABC):
             limit: int,
             offset: int,
             sort: list,
+            after: Optional[str] = None,
     ):
         """Создание запроса для агрегирования данных.
 
@@ -81,6 +162,152 @@ class AbstractDBManager(ABC):
           desired_property: искомый атрибут у связанного объекта;
           limit: кол-во элементов в выдаче;
           offset: смещение (пропуск первых N элементов);
-          sort: список полей и направление сортировки [('avg', 1)].
+          sort: список полей и направление сортировки [('avg', 1)];
+          after: курсор, полученный из make_cursor, заменяет offset.
+
+        Raises:
+          InvalidCursorError: некорректный курсор.
+
+        """
+
+
+class AbstractWriter(ABC):
+    """Запись и удаление отдельных записей в БД."""
+
+    @abstractmethod
+    async def create(self, table: str, obj_data: dict):
+        """Создание записи в БД.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          obj_data: словарь с данными для поиска.
+
+        """
+
+    @abstractmethod
+    async def replace(self, table: str, search: dict, obj_data: dict):
+        """Атомарная замена записи в БД (upsert).
+
+        Если записи не существует, то она будет создана.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с уникальным ключом записи;
+          obj_data: словарь с данными новой записи.
+
+        Returns:
+          Предыдущая версия записи или None, если запись была создана.
+
+        Raises:
+          DBManagerError: БД недоступна.
+
+        """
+
+    @abstractmethod
+    async def increment(
+        self,
+        table: str,
+        search: dict,
+        fields: dict,
+        averages: Optional[Averages] = None,
+        upsert: bool = True,
+    ):
+        """Атомарное изменение счетчиков записи.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с данными для поиска;
+          fields: словарь с названиями счетчиков и величиной их изменения;
+          averages: поля среднего значения и пары счетчиков (сумма, кол-во),
+          по которым оно пересчитывается в той же операции;
+          upsert: создать запись, если ее не существует.
+
+        """
+
+    @abstractmethod
+    async def update(self, table: str, search: dict, fields: dict):
+        """Изменение значений полей записи.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с данными для поиска;
+          fields: словарь с названиями полей и их новыми значениями.
+
+        """
+
+    @abstractmethod
+    async def delete(self, table: str, search: dict):
+        """Удаление записи из БД.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с данными для поиска.
+
+        """
+
+    @abstractmethod
+    async def delete_one(self, table: str, search: dict):
+        """Удаление одной записи из БД.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с данными для поиска.
+
+        Returns:
+          Удаленная запись или None, если запись не найдена.
+
+        Raises:
+          DBManagerError: БД недоступна.
+
+        """
+
+
+class AbstractDBManager(AbstractReader, AbstractWriter):
+    """Простой менеджер для работы с БД.
+
+    Кроме чтения и записи отдельных записей поддерживает пакетную запись
+    и управление индексами.
+
+    """
+
+    @abstractmethod
+    async def bulk_write(
+        self, table: str, operations: Sequence[BulkOperation],
+    ) -> list[Optional[str]]:
+        """Пакетная запись без соблюдения порядка операций.
+
+        Ошибка одной операции не прерывает выполнение остальных.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          operations: список операций.
+
+        Returns:
+          Ошибки операций в порядке их следования, None - операция выполнена.
+
+        Raises:
+          DBManagerError: БД недоступна.
+
+        """
+
+    @abstractmethod
+    async def create_indexes(self, table: str, indexes: Sequence[Index]):
+        """Создание индексов. Уже существующие индексы не изменяются.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          indexes: список индексов.
+
+        Raises:
+          DBManagerError: индекс не может быть создан.
+
+        """
+
+    @abstractmethod
+    async def get_indexes(self, table: str) -> list[Index]:
+        """Получение списка существующих индексов.
+
+        Args:
+          table: название таблицы (коллекции) БД.
 
         """
@@ -1,16 +1,41 @@
-"""Реализация AbstractDBManager для MongoDB."""
-from functools import lru_cache
+"""Реализация AbstractDBManager для MongoDB.
+
+Чтение (MongoReader) и запись (MongoWriter) отдельных записей реализованы
+в отдельных классах с общим доступом к коллекциям, MongoManager добавляет к
+ним пакетную запись и индексы. Запросы постраничной выборки, пакетной
+записи и индексов собираются в mongo_keyset, mongo_bulk и mongo_indexes.
+
+"""
+import time
+from functools import lru_cache, partial
+from typing import AsyncIterator, Awaitable, Callable, Optional, Sequence
 
 from fastapi import Depends
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 
 from db.mongo_db import get_mongo
-from db_managers.abstract_manager import AbstractDBManager
+from db_managers.abstract_manager import (
+    AbstractDBManager,
+    AbstractReader,
+    AbstractWriter,
+    Averages,
+    BulkOperation,
+    DBManagerError,
+    Index,
+)
+from db_managers.mongo_bulk import bulk_request, increment_update
+from db_managers.mongo_indexes import parse_indexes, index_models
+from db_managers.mongo_keyset import after_query, keyset_sort, make_cursor
+from db_managers.slow_queries import slow_query_log
 from settings import settings
 
+AGGREGATE_FIELDS = ('avg', 'sum')
 
-class MongoManager(AbstractDBManager):
-    """Реализация AbstractDBManager для MongoDB."""
+
+class MongoCollections:
+    """Доступ к коллекциям БД и журнал медленных запросов."""
 
     def __init__(self, client, db_name):
         """Конструктор класса.
@@ -22,57 +47,119 @@ class MongoManager(AbstractDBManager):
         """
         self.db = client[db_name]
 
+    def _check_slow(self, command: dict, start: float):
+        """Передаем запрос в журнал медленных запросов, если он превысил порог."""
+        duration = time.perf_counter() - start
+        if slow_query_log.is_slow(duration):
+            slow_query_log.record(self.db, command, duration)
+
+    def _open_collection(self, collection_name: str):
+        """Переходим к нужной коллекции."""
+        return self.db[collection_name]
+
+
+class MongoReader(MongoCollections, AbstractReader):
+    """Реализация AbstractReader для MongoDB."""
+
     async def search(
-        self, table: str, search: dict, limit: int, offset: int, sort: list,
+        self,
+        table: str,
+        search: dict,
+        limit: int,
+        offset: int,
+        sort: list,
+        after: Optional[str] = None,
     ):
         """Поиск, возвращающий список значений.
 
+        При наличии курсора пропуск записей (skip) не используется, вместо
+        этого выборка начинается сразу за последней записью предыдущей
+        страницы, поэтому стоимость запроса не зависит от номера страницы.
+
         Args:
           table: название таблицы (коллекции) БД;
           search: словарь с данными для поиска;
           limit: кол-во элементов в выдаче;
           offset: смещение (пропуск первых N элементов);
-          sort: список полей и направлений сортировки [(id, 1), (name, -1)].
+          sort: список полей и направлений сортировки [(id, 1), (name, -1)];
+          after: курсор, полученный из make_cursor, заменяет offset.
+
+        Raises:
+          InvalidCursorError: некорректный курсор.
 
         """
         collection = self._open_collection(table)
+        sort_field, sort_order = sort[0]
+        if after:
+            search = {'$and': [search, after_query(after, sort_field, sort_order)]}
+            offset = 0
+        order = keyset_sort(sort_field, sort_order)
+        start = time.perf_counter()
         cursor = collection.find(search).skip(offset).limit(limit)
-        return await cursor.sort(sort).to_list(length=limit)
+        docs = await cursor.sort(order).to_list(length=limit)
+        self._check_slow(
+            {'find': table, 'filter': search, 'sort': dict(order), 'skip': offset, 'limit': limit},
+            start,
+        )
+        return docs
 
-    async def get(self, table: str, search: dict):
-        """Поиск, возвращающий только одно значение.
+    async def iterate(
+        self, table: str, search: dict, sort: list, batch_size: int,
+    ) -> AsyncIterator[dict]:
+        """Последовательное чтение всех найденных записей пачками.
+
+        Записи читаются курсором Motor без to_list, поэтому в памяти
+        одновременно находится не более batch_size записей.
 
         Args:
           table: название таблицы (коллекции) БД;
-          search: словарь с данными для поиска.
+          search: словарь с данными для поиска;
+          sort: список полей и направлений сортировки [(id, 1), (name, -1)];
+          batch_size: кол-во записей, получаемых из БД за один запрос.
 
         """
         collection = self._open_collection(table)
-        return await collection.find_one(search)
+        cursor = collection.find(search).sort(sort).batch_size(batch_size)
+        async for doc in cursor:
+            yield doc
 
-    async def create(self, table: str, obj_data: dict):
-        """Создание записи в БД.
+    def make_cursor(self, doc: dict, sort_field: str) -> str:
+        """Создание курсора для получения следующей страницы (см. mongo_keyset).
+
+        Args:
+          doc: последняя запись на странице;
+          sort_field: поле, по которому выполняется сортировка.
+
+        """
+        return make_cursor(doc, sort_field)
+
+    async def get(self, table: str, search: dict):
+        """Поиск, возвращающий только одно значение.
 
         Args:
           table: название таблицы (коллекции) БД;
-          obj_data: словарь с данными для поиска.
+          search: словарь с данными для поиска.
 
         """
         collection = self._open_collection(table)
-        await collection.insert_one(obj_data)
+        return await collection.find_one(search)
 
-    async def delete(self, table: str, search: dict):
-        """Удаление записи из БД.
+    async def get_many(self, table: str, searches: Sequence[dict]) -> list[dict]:
+        """Поиск записей, соответствующих любому из условий, одним запросом.
+
+        Условия по одному и тому же полю объединяются в один $in.
 
         Args:
           table: название таблицы (коллекции) БД;
-          search: словарь с данными для поиска.
+          searches: список словарей с данными для поиска.
 
         """
+        if not searches:
+            return []
         collection = self._open_collection(table)
-        await collection.delete_many(search)
+        return await collection.find(self._any_of(searches)).to_list(length=None)
 
-    def aggregate(
+    async def aggregate(
         self,
             table: str,
             search: dict,
@@ -82,14 +169,24 @@ class MongoManager(AbstractDBManager):
             limit: int,
             offset: int,
             sort: list,
+            after: Optional[str] = None,
     ):
         """Создание запроса для агрегирования данных.
 
         Объединяет две таблицы (коллекции) на основе двух связанных полей.
         Создает поля со средним и суммарным значением искомого атрибута.
-        Добавляет поля "avg" и "sum" которые можно использовать для сортировки.
+        Добавляет поля "avg" и "sum" которые можно использовать для сортировки,
+        а также кол-во связанных объектов "count".
         Пример: добавляет рейтинг и среднюю оценку и обзору.
 
+        Если сортировка выполняется не по "avg" или "sum", то связанные
+        объекты подгружаются только для записей выбранной страницы, и с
+        курсором стоимость запроса не зависит от номера страницы. При
+        сортировке по "avg" или "sum" $lookup и $sort выполняются для всех
+        найденных записей: курсор лишь заменяет $skip, стоимость запроса
+        растет с кол-вом записей. Для глубоких страниц по рейтингу нужно
+        хранить значения в записи и сортировать по индексу, как в обзорах.
+
         Args:
           table: название таблицы (коллекции) БД;
           search: словарь с данными для поиска;
@@ -98,10 +195,15 @@ class MongoManager(AbstractDBManager):
           desired_property: искомый атрибут у связанного объекта;
           limit: кол-во элементов в выдаче;
           offset: смещение (пропуск первых N элементов);
-          sort: список полей и направление сортировки [('avg', 1)].
+          sort: список полей и направление сортировки [('avg', 1)];
+          after: курсор, полученный из make_cursor, заменяет offset.
+
+        Raises:
+          InvalidCursorError: некорректный курсор.
 
         """
         collection = self._open_collection(table)
+        sort_field, sort_order = sort
         lookup = {
             'from': related_table,
             'localField': related_fields[0],
@@ -110,20 +212,224 @@ class MongoManager(AbstractDBManager):
         }
         avg_filed = {'$avg': '$related_object.{0}'.format(desired_property)}
         sum_field = {'$sum': '$related_object.{0}'.format(desired_property)}
-        return collection.aggregate(
-            [
-                {'$match': search},
-                {'$lookup': lookup},
-                {'$addFields': {'avg': avg_filed, 'sum': sum_field}},
-                {'$sort': {sort[0]: sort[1]}},
-                {'$skip': offset},
-                {'$limit': limit},
-            ],
-        ).to_list(length=limit)
+        count_field = {'$size': '$related_object'}
+        join = [
+            {'$lookup': lookup},
+            {'$addFields': {'avg': avg_filed, 'sum': sum_field, 'count': count_field}},
+        ]
 
-    def _open_collection(self, collection_name: str):
-        """Переходим к нужной коллекции."""
-        return self.db[collection_name]
+        page: list = []
+        if after:
+            page.append({'$match': after_query(after, sort_field, sort_order)})
+            offset = 0
+        page += [
+            {'$sort': dict(keyset_sort(sort_field, sort_order))},
+            {'$skip': offset},
+            {'$limit': limit},
+        ]
+
+        if sort_field in AGGREGATE_FIELDS:
+            pipeline = [{'$match': search}, *join, *page]
+        else:
+            pipeline = [{'$match': search}, *page, *join]
+        start = time.perf_counter()
+        docs = await collection.aggregate(pipeline).to_list(length=limit)
+        self._check_slow({'aggregate': table, 'pipeline': pipeline, 'cursor': {}}, start)
+        return docs
+
+    def _any_of(self, searches: Sequence[dict]) -> dict:
+        """Условие "любое из": $in для условий по одному полю, иначе $or."""
+        fields = {tuple(search) for search in searches}
+        if len(fields) != 1 or len(searches[0]) != 1:
+            return {'$or': list(searches)}
+        field = next(iter(searches[0]))
+        return {field: {'$in': [search[field] for search in searches]}}
+
+
+class MongoWriter(MongoCollections, AbstractWriter):
+    """Реализация AbstractWriter для MongoDB."""
+
+    async def create(self, table: str, obj_data: dict):
+        """Создание записи в БД.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          obj_data: словарь с данными для поиска.
+
+        """
+        collection = self._open_collection(table)
+        await collection.insert_one(obj_data)
+
+    async def replace(self, table: str, search: dict, obj_data: dict):
+        """Атомарная замена записи в БД (upsert).
+
+        Уникальность записи обеспечивается уникальным индексом по полям из
+        search. При одновременной вставке двух записей одна из операций
+        получит DuplicateKeyError, повторная попытка заменит уже созданную
+        запись.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с уникальным ключом записи;
+          obj_data: словарь с данными новой записи.
+
+        Returns:
+          Предыдущая версия записи или None, если запись была создана.
+
+        Raises:
+          DBManagerError: БД недоступна.
+
+        """
+        collection = self._open_collection(table)
+        replace = partial(
+            collection.find_one_and_replace,
+            search,
+            obj_data,
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+        try:
+            return await _retry_duplicate(replace)
+        except PyMongoError as exc:
+            raise DBManagerError('{0}: {1}'.format(table, exc))
+
+    async def increment(
+        self,
+        table: str,
+        search: dict,
+        fields: dict,
+        averages: Optional[Averages] = None,
+        upsert: bool = True,
+    ):
+        """Атомарное изменение счетчиков записи.
+
+        Средние значения пересчитываются в том же запросе (update с
+        конвейером агрегации), поэтому не расходятся со счетчиками при
+        одновременных изменениях. Если кол-во равно нулю, среднее - null.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с данными для поиска;
+          fields: словарь с названиями счетчиков и величиной их изменения;
+          averages: поля среднего значения и пары счетчиков (сумма, кол-во),
+          по которым оно пересчитывается в той же операции;
+          upsert: создать запись, если ее не существует.
+
+        """
+        collection = self._open_collection(table)
+        await collection.update_one(
+            search, increment_update(fields, averages), upsert=upsert,
+        )
+
+    async def update(self, table: str, search: dict, fields: dict):
+        """Изменение значений полей записи.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с данными для поиска;
+          fields: словарь с названиями полей и их новыми значениями.
+
+        """
+        collection = self._open_collection(table)
+        await collection.update_one(search, {'$set': fields})
+
+    async def delete(self, table: str, search: dict):
+        """Удаление записи из БД.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с данными для поиска.
+
+        """
+        collection = self._open_collection(table)
+        await collection.delete_many(search)
+
+    async def delete_one(self, table: str, search: dict):
+        """Удаление одной записи из БД.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          search: словарь с данными для поиска.
+
+        Returns:
+          Удаленная запись или None, если запись не найдена.
+
+        Raises:
+          DBManagerError: БД недоступна.
+
+        """
+        collection = self._open_collection(table)
+        try:
+            return await collection.find_one_and_delete(search)
+        except PyMongoError as exc:
+            raise DBManagerError('{0}: {1}'.format(table, exc))
+
+
+class MongoManager(MongoReader, MongoWriter, AbstractDBManager):
+    """Реализация AbstractDBManager для MongoDB."""
+
+    async def bulk_write(
+        self, table: str, operations: Sequence[BulkOperation],
+    ) -> list[Optional[str]]:
+        """Пакетная запись без соблюдения порядка операций (ordered=False).
+
+        Все операции отправляются одним запросом bulk_write, ошибка одной
+        операции (например, DuplicateKeyError) не прерывает выполнение
+        остальных.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          operations: список операций.
+
+        Returns:
+          Ошибки операций в порядке их следования, None - операция выполнена.
+
+        Raises:
+          DBManagerError: БД недоступна.
+
+        """
+        errors: list[Optional[str]] = [None for _ in operations]
+        if not operations:
+            return errors
+        collection = self._open_collection(table)
+        requests = [bulk_request(operation) for operation in operations]
+        try:
+            await collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as exc:
+            for write_error in exc.details.get('writeErrors', []):
+                errors[write_error['index']] = write_error['errmsg']
+        except PyMongoError as exc:
+            raise DBManagerError('{0}: {1}'.format(table, exc))
+        return errors
+
+    async def create_indexes(self, table: str, indexes: Sequence[Index]):
+        """Создание индексов. Уже существующие индексы не изменяются.
+
+        Args:
+          table: название таблицы (коллекции) БД;
+          indexes: список индексов.
+
+        Raises:
+          DBManagerError: индекс не может быть создан или БД недоступна.
+
+        """
+        if not indexes:
+            return
+        collection = self._open_collection(table)
+        try:
+            await collection.create_indexes(index_models(indexes))
+        except PyMongoError as exc:
+            raise DBManagerError('{0}: {1}'.format(table, exc))
+
+    async def get_indexes(self, table: str) -> list[Index]:
+        """Получение списка существующих индексов, кроме индекса по _id.
+
+        Args:
+          table: название таблицы (коллекции) БД.
+
+        """
+        collection = self._open_collection(table)
+        return parse_indexes(await collection.index_information())
 
 
 @lru_cache
@@ -132,3 +438,16 @@ def get_db_manager(
 ) -> AbstractDBManager:
     """DI для FastAPI. Получаем менеджер для MONGO."""
     return MongoManager(client=client, db_name=settings.MONGO_DB_NAME)
+
+
+async def _retry_duplicate(operation: Callable[[], Awaitable]):
+    """Выполняем upsert, при DuplicateKeyError повторяем один раз.
+
+    DuplicateKeyError означает, что запись с тем же ключом была создана
+    одновременным запросом, повторная попытка ее заменит.
+
+    """
+    try:
+        return await operation()
+    except DuplicateKeyError:
+        return await operation()
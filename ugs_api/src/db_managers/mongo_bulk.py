@@ -0,0 +1,48 @@
+"""Запросы pymongo для изменения счетчиков и пакетной записи."""
+from typing import Optional
+
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+
+from db_managers.abstract_manager import Averages, BulkOperation
+
+
+def bulk_request(operation: BulkOperation):
+    """Запрос pymongo для операции пакетной записи.
+
+    Args:
+      operation: операция пакетной записи.
+
+    """
+    if operation.obj_data is not None:
+        return ReplaceOne(operation.search, operation.obj_data, upsert=True)
+    if operation.increment is not None:
+        update = increment_update(operation.increment, operation.averages)
+        return UpdateOne(operation.search, update, upsert=operation.upsert)
+    return DeleteOne(operation.search)
+
+
+def increment_update(fields: dict, averages: Optional[Averages]):
+    """Изменение счетчиков: $inc или конвейер с пересчетом средних.
+
+    Args:
+      fields: словарь с названиями счетчиков и величиной их изменения;
+      averages: поля среднего значения и пары счетчиков (сумма, кол-во).
+
+    """
+    if not averages:
+        return {'$inc': fields}
+    counters = {
+        field: {'$add': [{'$ifNull': ['${0}'.format(field), 0]}, delta]}
+        for field, delta in fields.items()
+    }
+    return [{'$set': counters}, {'$set': _average_fields(averages)}]
+
+
+def _average_fields(averages: Averages) -> dict:
+    """Выражения для пересчета средних значений после изменения счетчиков."""
+    average_fields = {}
+    for avg_field, (sum_field, count_field) in averages.items():
+        count = '${0}'.format(count_field)
+        average = {'$divide': ['${0}'.format(sum_field), count]}
+        average_fields[avg_field] = {'$cond': [{'$gt': [count, 0]}, average, None]}
+    return average_fields
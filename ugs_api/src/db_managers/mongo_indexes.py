@@ -0,0 +1,38 @@
+"""Преобразование описаний индексов (Index) в формат MongoDB и обратно."""
+from typing import Sequence
+
+from pymongo import IndexModel
+
+from db_managers.abstract_manager import Index
+
+ID_INDEX_NAME = '_id_'
+
+
+def index_models(indexes: Sequence[Index]) -> list[IndexModel]:
+    """Модели pymongo для создания индексов.
+
+    Args:
+      indexes: список индексов.
+
+    """
+    return [
+        IndexModel(list(index.fields), name=index.name, unique=index.unique)
+        for index in indexes
+    ]
+
+
+def parse_indexes(index_information: dict) -> list[Index]:
+    """Индексы из ответа index_information, кроме индекса по _id.
+
+    Args:
+      index_information: описания индексов коллекции по их именам.
+
+    """
+    indexes = []
+    for name, index_spec in index_information.items():
+        if name == ID_INDEX_NAME:
+            continue
+        fields = [(field, int(order)) for field, order in index_spec['key']]
+        unique = index_spec.get('unique', False)
+        indexes.append(Index(fields=tuple(fields), unique=unique))
+    return indexes
@@ -0,0 +1,102 @@
+"""Постраничная выборка MongoDB по курсору (keyset pagination).
+
+Курсор содержит поле и значение сортировки и _id последней записи на
+странице. Следующая страница начинается сразу за этой записью, поэтому
+пропуск записей (skip) не нужен.
+
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from bson import json_util
+from bson.errors import InvalidId
+
+from db_managers.abstract_manager import InvalidCursorError
+
+CURSOR_SIZE = 3
+UNIQUE_SORT_FIELDS = ('_id',)
+# Порядок записи, для ограниченных (capped) коллекций - порядок вставки.
+NATURAL_ORDER = '$natural'
+
+
+def make_cursor(doc: dict, sort_field: str) -> str:
+    """Создание курсора для получения следующей страницы.
+
+    Для сохранения типов (datetime, ObjectId) используется Extended JSON.
+
+    Args:
+      doc: последняя запись на странице;
+      sort_field: поле, по которому выполняется сортировка.
+
+    """
+    cursor_data = json_util.dumps([sort_field, doc.get(sort_field), doc['_id']])
+    return urlsafe_b64encode(cursor_data.encode()).decode()
+
+
+def after_query(after: str, sort_field: str, sort_order: int) -> dict:
+    """Условие для выборки записей, следующих за курсором.
+
+    Учитывается, что null в MongoDB меньше любого другого значения, а
+    записи с одинаковым значением поля сортировки упорядочены по _id.
+
+    Args:
+      after: курсор, полученный из make_cursor;
+      sort_field: поле сортировки;
+      sort_order: направление сортировки, 1 или -1.
+
+    Raises:
+      InvalidCursorError: некорректный курсор.
+
+    """
+    cursor_field, cursor_value, last_id = _decode_cursor(after)
+    if cursor_field != sort_field:
+        raise InvalidCursorError('Cursor was created for sorting by {0}'.format(cursor_field))
+
+    operator = '$gt' if sort_order == 1 else '$lt'
+    if sort_field == '_id':
+        return {'_id': {operator: last_id}}
+
+    same_value = {sort_field: cursor_value, '_id': {operator: last_id}}
+    if cursor_value is None:
+        if sort_order == 1:
+            return {'$or': [same_value, {sort_field: {'$ne': None}}]}
+        return same_value
+
+    conditions = [{sort_field: {operator: cursor_value}}, same_value]
+    if sort_order == -1:
+        conditions.append({sort_field: None})
+    return {'$or': conditions}
+
+
+def keyset_sort(sort_field: str, sort_order: int) -> list:
+    """Сортировка с _id в качестве второго поля для однозначного порядка.
+
+    Порядок по _id уже однозначен. Порядок записи ($natural) тоже
+    однозначен и не сочетается с другими полями, поэтому сортировка по нему
+    передается без изменений.
+
+    Args:
+      sort_field: поле сортировки;
+      sort_order: направление сортировки, 1 или -1.
+
+    """
+    if sort_field == NATURAL_ORDER:
+        return [(NATURAL_ORDER, sort_order)]
+    if sort_field in UNIQUE_SORT_FIELDS:
+        return [('_id', sort_order)]
+    return [(sort_field, sort_order), ('_id', sort_order)]
+
+
+def _decode_cursor(after: str) -> list:
+    """Декодирование курсора, созданного в make_cursor.
+
+    Raises:
+      InvalidCursorError: некорректный курсор.
+
+    """
+    try:
+        cursor_data = json_util.loads(urlsafe_b64decode(after.encode()).decode())
+    except (ValueError, TypeError, InvalidId):
+        raise InvalidCursorError('Invalid cursor')
+    if not isinstance(cursor_data, list) or len(cursor_data) != CURSOR_SIZE:
+        raise InvalidCursorError('Invalid cursor')
+    return cursor_data
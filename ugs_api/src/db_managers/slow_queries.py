@@ -0,0 +1,234 @@
+"""Журнал медленных запросов к MongoDB.
+
+Запросы search и aggregate, выполнявшиеся дольше settings.slow_query_ms,
+записываются в лог и в ограниченную (capped) коллекцию slow_queries. Значения
+в условиях запроса заменяются на '?', поэтому в журнал не попадают
+идентификаторы пользователей и другие данные.
+
+Для доли settings.slow_query_explain_rate медленных запросов в фоне
+выполняется explain, из плана сохраняются этапы (COLLSCAN, IXSCAN, ...) и
+использованные индексы. Одновременно выполняется не больше одного explain,
+остальные пропускаются, чтобы не нагружать и без того медленную БД.
+
+"""
+import asyncio
+import logging
+import random
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+from bson import json_util
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES_COLLECTION = 'slow_queries'
+REDACTED = '?'
+MATCH_STAGE = '$match'
+PAGE_STAGES = ('$sort', '$skip', '$limit')
+MILLISECONDS = 1000
+
+
+@dataclass
+class SlowQuery:
+    """Запись журнала медленных запросов."""
+
+    collection: str
+    operation: str
+    query: str
+    sort: str
+    skip: int
+    limit: int
+    duration_ms: float
+    date: datetime = field(default_factory=datetime.utcnow)
+    plan: Optional[dict] = None
+
+    @classmethod
+    def from_command(cls, command: dict, duration: float) -> 'SlowQuery':
+        """Запись журнала по команде find или aggregate.
+
+        Args:
+          command: команда, как ее принимает explain;
+          duration: длительность запроса в секундах.
+
+        """
+        operation = next(iter(command))
+        page = dict(command)
+        for stage in command.get('pipeline', []):
+            page.update({
+                stage_name.lstrip('$'): spec
+                for stage_name, spec in stage.items()
+                if stage_name in PAGE_STAGES
+            })
+        return cls(
+            collection=command[operation],
+            operation=operation,
+            query=query_shape(command.get('filter', command.get('pipeline'))),
+            sort=json_util.dumps(page.get('sort')),
+            skip=page.get('skip', 0),
+            limit=page.get('limit', 0),
+            duration_ms=round(duration * MILLISECONDS, 1),
+        )
+
+
+class SlowQueryLog:
+    """Журнал медленных запросов с выборочным explain."""
+
+    def __init__(self) -> None:
+        """Конструктор класса."""
+        self._tasks: set[asyncio.Task] = set()
+        self._explain_lock = asyncio.Lock()
+
+    def is_slow(self, duration: float) -> bool:
+        """Проверяем, превышает ли длительность запроса порог.
+
+        Args:
+          duration: длительность запроса в секундах.
+
+        """
+        return bool(settings.slow_query_ms) and duration * MILLISECONDS >= settings.slow_query_ms
+
+    def record(self, db, command: dict, duration: float):
+        """Логируем медленный запрос и в фоне сохраняем его в коллекцию.
+
+        Args:
+          db: база данных Motor;
+          command: команда find или aggregate, как ее принимает explain;
+          duration: длительность запроса в секундах.
+
+        """
+        slow_query = SlowQuery.from_command(command, duration)
+        if slow_query.collection == SLOW_QUERIES_COLLECTION:
+            return
+        logger.warning(
+            'Slow {0} on {1}: {2:.1f} ms, query {3}, sort {4}, skip {5}, limit {6}'.format(
+                slow_query.operation,
+                slow_query.collection,
+                slow_query.duration_ms,
+                slow_query.query,
+                slow_query.sort,
+                slow_query.skip,
+                slow_query.limit,
+            ),
+        )
+        explain = random.random() < settings.slow_query_explain_rate  # noqa: S311
+        task = asyncio.create_task(self._save(db, slow_query, command if explain else None))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def setup(self, db):
+        """Создаем ограниченную по размеру коллекцию журнала.
+
+        Args:
+          db: база данных Motor.
+
+        """
+        try:
+            await db.create_collection(
+                SLOW_QUERIES_COLLECTION, capped=True, size=settings.slow_query_log_size,
+            )
+        except CollectionInvalid:
+            logger.debug('Collection {0} already exists'.format(SLOW_QUERIES_COLLECTION))
+
+    async def _save(self, db, slow_query: SlowQuery, explain_command: Optional[dict]):
+        if explain_command and not self._explain_lock.locked():
+            async with self._explain_lock:
+                slow_query.plan = await self._explain(db, explain_command)
+        try:
+            await db[SLOW_QUERIES_COLLECTION].insert_one(asdict(slow_query))
+        except PyMongoError as exc:
+            logger.warning('Failed to save slow query: {0!r}'.format(exc))
+
+    async def _explain(self, db, explain_command: dict) -> Optional[dict]:
+        try:
+            explain = await db.command(
+                {'explain': explain_command, 'verbosity': settings.slow_query_explain_verbosity},
+            )
+        except PyMongoError as exc:
+            logger.warning('Explain failed: {0!r}'.format(exc))
+            return None
+        return plan_summary(explain)
+
+
+def redact(query_part: Any) -> Any:
+    """Форма запроса: операторы и поля сохраняются, значения заменяются на '?'.
+
+    Args:
+      query_part: условие запроса или его часть.
+
+    """
+    if isinstance(query_part, dict):
+        return {key: redact(sub_part) for key, sub_part in query_part.items()}
+    is_sequence = isinstance(query_part, (list, tuple)) and bool(query_part)
+    if is_sequence and isinstance(query_part[0], dict):
+        return [redact(sub_part) for sub_part in query_part]
+    return REDACTED
+
+
+def query_shape(query_part: Any) -> str:
+    """Форма условия запроса или конвейера агрегации в виде строки JSON.
+
+    В конвейере значения скрываются только в $match, остальные этапы
+    содержат лишь названия полей и размеры страниц.
+
+    Args:
+      query_part: условие запроса или конвейер агрегации.
+
+    """
+    if isinstance(query_part, list):
+        query_part = [_redact_stage(step) for step in query_part]
+    else:
+        query_part = redact(query_part)
+    return json_util.dumps(query_part)
+
+
+def plan_summary(explain: dict) -> dict:
+    """Этапы и индексы выбранного плана запроса.
+
+    Отклоненные планы (rejectedPlans) не учитываются.
+
+    Args:
+      explain: результат команды explain.
+
+    """
+    stages = set()
+    indexes = set()
+    for node in _plan_nodes(explain):
+        stage = node.get('stage')
+        index_name = node.get('indexName')
+        if isinstance(stage, str):
+            stages.add(stage)
+        if isinstance(index_name, str):
+            indexes.add(index_name)
+    return {
+        'stages': sorted(stages),
+        'indexes': sorted(indexes),
+        'collscan': 'COLLSCAN' in stages,
+    }
+
+
+def _redact_stage(step: dict) -> dict:
+    return {
+        stage: redact(spec) if stage == MATCH_STAGE else spec
+        for stage, spec in step.items()
+    }
+
+
+def _plan_nodes(explain: dict) -> Iterator[dict]:
+    """Все вложенные документы результата explain, кроме отклоненных планов."""
+    nodes: list = [explain]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, list):
+            nodes.extend(node)
+        elif isinstance(node, dict):
+            yield node
+            nodes.extend(
+                sub_node for key, sub_node in node.items() if key != 'rejectedPlans'
+            )
+
+
+slow_query_log = SlowQueryLog()
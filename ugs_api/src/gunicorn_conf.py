@@ -0,0 +1,28 @@
+"""Настройки gunicorn.
+
+Каталог PROMETHEUS_MULTIPROC_DIR очищается при запуске, а файлы метрик
+завершившихся процессов помечаются, чтобы их значения livesum не учитывались.
+
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+# Модуль metrics не импортируется: метрики, созданные в главном процессе,
+# записали бы файлы в каталог до его очистки.
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+
+def on_starting(server):
+    """Очищаем каталог метрик прошлого запуска."""
+    multiproc_dir = os.environ.get(MULTIPROC_DIR_ENV)
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir)
+
+
+def child_exit(server, worker):
+    """Помечаем метрики завершившегося процесса."""
+    if MULTIPROC_DIR_ENV in os.environ:
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,10 +1,31 @@
-"""Config for logger."""
+"""Config for logger.
+
+При settings.logging.queue записи логов помещаются в ограниченную очередь, а
+в обработчики (поток вывода, из которого Docker отправляет их в Logstash)
+передаются отдельным потоком QueueListener. Медленный вывод не блокирует
+цикл событий; при переполнении очереди записи отбрасываются и учитываются
+в счетчиках.
+
+"""
+import contextlib
+import copy
+import logging
+import queue
 import types
+from datetime import datetime, timezone
+from logging import config as logging_config
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
 
 from settings import settings
 
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DEFAULT_HANDLERS = ('console', )
+ACCESS_LOGGER = 'uvicorn.access'
+# Логгеры, обработчики которых переводятся на очередь.
+QUEUE_LOGGERS = ('', ACCESS_LOGGER)
+EXCEPTION_FORMATTER = logging.Formatter()
 
 LOGGING = types.MappingProxyType({
     'version': 1,
@@ -13,6 +34,9 @@ LOGGING = types.MappingProxyType({
         'verbose': {
             'format': LOG_FORMAT,
         },
+        'json': {
+            '()': 'logger.JSONFormatter',
+        },
         'default': {
             '()': 'uvicorn.logging.DefaultFormatter',
             'fmt': '%(levelprefix)s %(message)s',
@@ -27,7 +51,7 @@ LOGGING = types.MappingProxyType({
         'console': {
             'level': settings.logging.level_console,
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': 'json' if settings.logging.json_format else 'verbose',
         },
         'default': {
             'formatter': 'default',
@@ -60,3 +84,147 @@ LOGGING = types.MappingProxyType({
         'handlers': LOG_DEFAULT_HANDLERS,
     },
 })
+
+
+class JSONFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON с полями, которые ожидает Logstash.
+
+    Поле tag используется Logstash для выбора индекса, request_id
+    добавляется, если передан в extra.
+
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Форматируем запись лога.
+
+        Args:
+          record: запись лога.
+
+        """
+        log_record = {
+            '@timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'tag': getattr(record, 'tag', settings.logging.tag),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            log_record['request_id'] = request_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            log_record['exception'] = record.exc_text
+        return orjson.dumps(log_record, default=str).decode()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler с ограниченной очередью, который никогда не ждет.
+
+    При переполнении очереди отбрасывается новая или самая старая запись.
+
+    """
+
+    def __init__(self, maxsize: int, drop_oldest: bool = False):
+        """Конструктор класса.
+
+        Args:
+          maxsize: максимальное кол-во записей в очереди;
+          drop_oldest: при переполнении отбрасывать самую старую запись.
+
+        """
+        self.records: queue.Queue = queue.Queue(maxsize)
+        super().__init__(self.records)
+        self.drop_oldest = drop_oldest
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Готовим копию записи для потока вывода.
+
+        Сообщение форматируется сразу (msg % args), чтобы в очередь не
+        попадали изменяемые аргументы, а исключение заменяется текстом.
+        Аргументы записей uvicorn.access сохраняются, они нужны AccessFormatter.
+
+        Args:
+          record: запись лога.
+
+        """
+        record = copy.copy(record)
+        if record.name != ACCESS_LOGGER:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        """Помещаем запись в очередь без ожидания.
+
+        Args:
+          record: подготовленная запись лога.
+
+        """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.drop_oldest:
+                self._replace_oldest(record)
+            return
+        self.enqueued += 1
+
+    def stats(self) -> dict:
+        """Глубина очереди и счетчики записей."""
+        return {
+            'depth': self.records.qsize(),
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+        }
+
+    def _replace_oldest(self, record: logging.LogRecord):
+        """Освобождаем место в очереди, отбрасывая самую старую запись."""
+        with contextlib.suppress(queue.Empty):
+            self.records.get_nowait()
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            return
+        self.enqueued += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener, который при остановке дожидается места в очереди."""
+
+    def enqueue_sentinel(self):
+        """Ждем места для метки остановки, чтобы не потерять ее в полной очереди."""
+        self.queue.put(self._sentinel)
+
+
+queue_handlers: dict[str, DroppingQueueHandler] = {}
+queue_listeners: list[QueueListener] = []
+
+
+def configure_logging():
+    """Настраиваем логирование, при settings.logging.queue - через очередь."""
+    logging_config.dictConfig(LOGGING)
+    if not settings.logging.queue:
+        return
+    drop_oldest = settings.logging.queue_drop == 'old'
+    for logger_name in QUEUE_LOGGERS:
+        target = logging.getLogger(logger_name)
+        queue_handler = DroppingQueueHandler(settings.logging.queue_size, drop_oldest)
+        listener = DrainingQueueListener(
+            queue_handler.records, *target.handlers, respect_handler_level=True,
+        )
+        target.handlers = [queue_handler]
+        queue_handlers[logger_name or 'root'] = queue_handler
+        queue_listeners.append(listener)
+        listener.start()
+
+
+def stop_logging():
+    """Записываем оставшиеся в очередях записи и останавливаем потоки вывода."""
+    while queue_listeners:
+        queue_listeners.pop().stop()
@@ -1,18 +1,29 @@
 """Приложение FastAPI."""
+import asyncio
 import logging
-from logging import config as logging_config
 
+import aiohttp
 import backoff
 import sentry_sdk
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.responses import ORJSONResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
 from redis import asyncio as aioredis
 
-from api.v1 import films, reviews, users
-from db import mongo_db, redis_db
-from logger import LOGGING
+from api.v1 import admin, auth, films, reviews, users
+from db import http_client, mongo_db, redis_db
+from db_managers.abstract_manager import DBManagerError
+from db_managers.mongo import get_db_manager
+from db_managers.slow_queries import slow_query_log
+from logger import configure_logging, stop_logging
+from metrics import MongoCommandListener, metrics_endpoint, metrics_middleware
+from services.auth import bearer, listen_revocations
+from services.indexes import apply_indexes
+from services.jwt_keys import public_keys
+from services.ugc.bookmark import flush_progress_periodically, get_bookmark_service
+from services.write_buffer import close_buffers
 from settings import settings
 
 if settings.sentry_dsn is not None:
@@ -21,11 +32,13 @@ if settings.sentry_dsn is not None:
         traces_sample_rate=settings.traces_sample_rate,
     )
 
-logging_config.dictConfig(LOGGING)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 MAX_CONNECTIONS = 20
 
+background_tasks: set[asyncio.Task] = set()
+
 
 app = FastAPI(
     title=settings.project_name,
@@ -44,10 +57,11 @@ async def before_request(request: Request, call_next):
         logger.warning('X-Request-Id is required')
         raise RuntimeError('X-Request-Id is required')
 
-    custom_logger = logging.LoggerAdapter(
-        logger, extra={'tag': 'ugs_api', 'request_id': request_id},
-    )
-    custom_logger.info('X-Request-Id: {0}'.format(request_id))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            'X-Request-Id: {0}'.format(request_id),
+            extra={'tag': settings.logging.tag, 'request_id': request_id},
+        )
 
     return await call_next(request)
 
@@ -55,9 +69,25 @@ async def before_request(request: Request, call_next):
 @app.on_event('startup')
 @backoff.on_exception(backoff.expo, (ConnectionError,))
 async def startup():
-    """Поднимаем Redis и Mongo при закуске API."""
-    mongo_db.mongo = AsyncIOMotorClient(settings.MONGO_HOST, settings.MONGO_PORT)
-    if settings.jwt_validate:
+    """Поднимаем Redis, Mongo и HTTP сессию при закуске API."""
+    event_listeners = [MongoCommandListener()] if settings.metrics else []
+    mongo_db.mongo = AsyncIOMotorClient(
+        settings.MONGO_HOST, settings.MONGO_PORT, event_listeners=event_listeners,
+    )
+    if settings.MONGO_CREATE_INDEXES:
+        try:
+            await apply_indexes(get_db_manager(client=mongo_db.mongo))
+        except DBManagerError as exc:
+            logger.error('Failed to create indexes: {0}'.format(exc))
+    if settings.slow_query_ms:
+        try:
+            await slow_query_log.setup(mongo_db.mongo[settings.MONGO_DB_NAME])
+        except PyMongoError as exc:
+            logger.error('Failed to create slow query log: {0!r}'.format(exc))
+    redis_required = (
+        settings.jwt_validate, settings.aggregate_cache, settings.progress_cache, settings.etag,
+    )
+    if any(redis_required):
         redis_db.client = await aioredis.from_url(
             'redis://{redis_host}:{redis_port}'.format(
                 redis_host=settings.redis_host, redis_port=settings.redis_port,
@@ -66,19 +96,47 @@ async def startup():
             decode_responses=True,
             max_connections=MAX_CONNECTIONS,
         )
+    if settings.progress_cache:
+        bookmark_service = get_bookmark_service(get_db_manager(client=mongo_db.mongo))
+        background_tasks.add(asyncio.create_task(flush_progress_periodically(bookmark_service)))
+    if settings.jwt_validate and settings.jwt_verify_mode == 'local':
+        public_keys.load()
+    if settings.jwt_validate:
+        http_client.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=settings.auth_pool_size),
+            timeout=aiohttp.ClientTimeout(total=settings.auth_timeout),
+        )
+        background_tasks.add(asyncio.create_task(listen_revocations(bearer)))
 
 
 @app.on_event('shutdown')
 async def shutdown():
-    """Закрываем подключения к БД при выключении API."""
+    """Сбрасываем буферы записи, закрываем подключения к БД и HTTP сессию при выключении API."""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await close_buffers()
+    if settings.progress_cache:
+        bookmark_service = get_bookmark_service(get_db_manager(client=mongo_db.mongo))
+        await bookmark_service.flush_progress(settings.progress_flush_batch_size)
     mongo_db.mongo.close()
-    if settings.jwt_validate:
+    if redis_db.client is not None:
         await redis_db.client.close()
+    if http_client.session is not None:
+        await http_client.session.close()
+    stop_logging()
+
 
+if settings.metrics:
+    app.middleware('http')(metrics_middleware)
+    app.get('/metrics', include_in_schema=False)(metrics_endpoint)
 
 app.include_router(films.router, prefix='/api/v1/films', tags=['films'])
 app.include_router(reviews.router, prefix='/api/v1/reviews', tags=['reviews'])
 app.include_router(users.router, prefix='/api/v1/users', tags=['users'])
+app.include_router(auth.router, prefix='/api/v1/auth', tags=['auth'])
+if settings.admin_api:
+    app.include_router(admin.router, prefix='/api/v1/admin', tags=['admin'])
 
 
 if __name__ == '__main__':
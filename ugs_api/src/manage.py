@@ -0,0 +1,129 @@
+"""Служебные команды для обслуживания БД.
+
+Примеры:
+    python manage.py indexes apply
+    python manage.py indexes diff
+    python manage.py reviews backfill
+    python manage.py ratings backfill
+
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from types import MappingProxyType
+
+import orjson
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from db_managers.mongo import MongoManager
+from models.ugc_models import Like, Review
+from services.indexes import apply_indexes, diff_indexes
+from services.ugc.like import LikeService
+from services.ugc.review import ReviewService
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Коллекции оценок и счетчиков рейтинга.
+RATING_COLLECTIONS = (('like', 'like_rating'), ('review_like', 'review_like_rating'))
+
+
+async def indexes(db: MongoManager, action: str) -> int:
+    """Создание индексов или сравнение их с описанными в сервисах.
+
+    Args:
+      db: менеджер для работы с БД;
+      action: apply - создать недостающие индексы, diff - вывести расхождения.
+
+    Returns:
+      Код завершения: 1, если при сравнении найдены расхождения.
+
+    """
+    exit_code = 0
+    if action == 'apply':
+        await apply_indexes(db)
+    else:
+        diff = await diff_indexes(db)
+        sys.stdout.write(orjson.dumps(diff, option=orjson.OPT_INDENT_2).decode())
+        sys.stdout.write('\n')
+        exit_code = 1 if diff else 0
+    return exit_code
+
+
+async def reviews(db: MongoManager, action: str) -> int:
+    """Заполнение сумм, кол-ва и средней оценки лайков в обзорах.
+
+    Args:
+      db: менеджер для работы с БД;
+      action: backfill - посчитать значения по коллекции лайков обзоров.
+
+    """
+    service = ReviewService(model=Review, db=db, collection_name='review')
+    total = await service.backfill_likes('review_like')
+    logger.info('Backfilled likes of {0} reviews'.format(total))
+    return 0
+
+
+async def ratings(db: MongoManager, action: str) -> int:
+    """Заполнение счетчиков рейтинга фильмов и обзоров.
+
+    Args:
+      db: менеджер для работы с БД;
+      action: backfill - посчитать счетчики по коллекциям лайков.
+
+    """
+    services = [
+        LikeService(
+            model=Like,
+            db=db,
+            collection_name=collection_name,
+            rating_collection_name=rating_collection_name,
+        )
+        for collection_name, rating_collection_name in RATING_COLLECTIONS
+    ]
+    totals = await asyncio.gather(*[service.backfill_ratings() for service in services])
+    for service, total in zip(services, totals):
+        logger.info('Backfilled {0} {1} objects'.format(total, service.ratings.collection_name))
+    return 0
+
+
+COMMANDS = MappingProxyType({'indexes': indexes, 'reviews': reviews, 'ratings': ratings})
+
+
+async def run(command: str, action: str) -> int:
+    """Запуск команды с подключением к БД.
+
+    Args:
+      command: название команды;
+      action: действие команды.
+
+    """
+    client = AsyncIOMotorClient(settings.MONGO_HOST, settings.MONGO_PORT)
+    db = MongoManager(client=client, db_name=settings.MONGO_DB_NAME)
+    exit_code = await COMMANDS[command](db, action)
+    client.close()
+    return exit_code
+
+
+def main() -> int:
+    """Разбор аргументов командной строки и запуск команды."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    indexes_parser = commands.add_parser('indexes', help='Индексы UGC коллекций.')
+    indexes_parser.add_argument('action', choices=('apply', 'diff'))
+
+    reviews_parser = commands.add_parser('reviews', help='Обслуживание коллекции обзоров.')
+    reviews_parser.add_argument('action', choices=('backfill',))
+
+    ratings_parser = commands.add_parser('ratings', help='Счетчики рейтинга фильмов и обзоров.')
+    ratings_parser.add_argument('action', choices=('backfill',))
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    return asyncio.run(run(args.command, args.action))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
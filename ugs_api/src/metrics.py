@@ -0,0 +1,153 @@
+"""Метрики Prometheus.
+
+Метрики отдаются по адресу /metrics. При запуске в нескольких процессах
+gunicorn значения каждого процесса пишутся в файлы каталога
+PROMETHEUS_MULTIPROC_DIR и суммируются при запросе метрик (см. gunicorn_conf.py).
+
+"""
+import os
+import time
+
+from fastapi import Request, Response, status
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+UNMATCHED_ROUTE = '<unmatched>'
+MICROSECONDS = 1000000
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+request_duration = Histogram(
+    'ugs_http_request_duration_seconds',
+    'Время обработки запроса.',
+    ('method', 'route', 'status'),
+    buckets=LATENCY_BUCKETS,
+)
+requests_in_progress = Gauge(
+    'ugs_http_requests_in_progress',
+    'Кол-во запросов в обработке.',
+    multiprocess_mode='livesum',
+)
+auth_cache_requests = Counter(
+    'ugs_auth_cache_requests',
+    'Обращения к кэшу проверки токенов.',
+    ('cache', 'result'),
+)
+mongo_command_duration = Histogram(
+    'ugs_mongo_command_duration_seconds',
+    'Время выполнения команд Mongo.',
+    ('collection', 'command', 'status'),
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Время выполнения команд Mongo по коллекциям и командам.
+
+    Коллекция известна только из события начала команды, поэтому она
+    запоминается по request_id до события завершения.
+
+    """
+
+    def __init__(self) -> None:
+        """Конструктор класса."""
+        self._collections: dict[int, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        """Запоминаем коллекцию команды.
+
+        Args:
+          event: событие начала команды.
+
+        """
+        if event.command_name == 'getMore':
+            collection = event.command.get('collection')
+        else:
+            collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ''
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        """Учитываем время успешной команды.
+
+        Args:
+          event: событие успешного завершения команды.
+
+        """
+        self._observe(event, 'ok')
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        """Учитываем время команды, завершившейся ошибкой.
+
+        Args:
+          event: событие ошибки команды.
+
+        """
+        self._observe(event, 'error')
+
+    def _observe(self, event, command_status: str):
+        collection = self._collections.pop(event.request_id, '')
+        mongo_command_duration.labels(
+            collection, event.command_name, command_status,
+        ).observe(event.duration_micros / MICROSECONDS)
+
+
+def observe_auth_cache(cache: str, hit: bool):
+    """Учитываем обращение к кэшу проверки токенов.
+
+    Args:
+      cache: уровень кэша (local, redis);
+      hit: значение найдено в кэше.
+
+    """
+    auth_cache_requests.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+async def metrics_middleware(request: Request, call_next):
+    """Время обработки запроса по шаблону пути и статусу ответа.
+
+    Шаблон пути (/api/v1/films/{film_id}) вместо самого пути ограничивает
+    кол-во рядов метрики.
+
+    """
+    start = time.perf_counter()
+    with requests_in_progress.track_inprogress():
+        try:
+            response = await call_next(request)
+        except Exception:
+            _observe_request(request, status.HTTP_500_INTERNAL_SERVER_ERROR, start)
+            raise
+    _observe_request(request, response.status_code, start)
+    return response
+
+
+def metrics_endpoint(request: Request) -> Response:
+    """Метрики в формате Prometheus, при нескольких процессах - суммарные.
+
+    Функция синхронная, поэтому чтение файлов метрик выполняется в пуле
+    потоков и не блокирует цикл событий.
+
+    """
+    registry = REGISTRY
+    if MULTIPROC_DIR_ENV in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def _observe_request(request: Request, status_code: int, start: float):
+    route = request.scope.get('route')
+    route_path = route.path if route else UNMATCHED_ROUTE
+    request_duration.labels(request.method, route_path, str(status_code)).observe(
+        time.perf_counter() - start,
+    )
@@ -60,6 +60,16 @@ class ReviewAggregateBriefModel(ORJSONBaseModel):
     average_rating: Optional[float]
 
 
+class FilmRatingModel(ORJSONBaseModel):
+    """Рейтинг фильма без последних оценок и обзоров (для каталога)."""
+
+    film_id: UUID
+    absolute_rating: Optional[int]
+    average_rating: Optional[float]
+    likes: Optional[int]
+    dislikes: Optional[int]
+
+
 class UserResponseModel(ORJSONBaseModel):
     """Общая информация и пользователе: закладки, рецензии и пр."""
 
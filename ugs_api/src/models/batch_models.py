@@ -0,0 +1,60 @@
+"""Модели для пакетной записи UGC.
+
+Используются клиентами, которые синхронизируют накопленную офлайн активность
+(мобильные приложения, Smart TV) одним запросом.
+
+"""
+from typing import Optional
+from uuid import UUID
+
+from pydantic import Field
+
+from models.ugc_models import ORJSONBaseModel
+
+BATCH_STATUS_OK = 'ok'
+BATCH_STATUS_ERROR = 'error'
+
+
+class LikeOperation(ORJSONBaseModel):
+    """Добавление (замена) или удаление оценки фильму."""
+
+    film_id: UUID
+    score: int = Field(default=10, ge=0, le=10)
+    delete: bool = False
+
+    def changes(self) -> Optional[dict]:
+        """Данные записи, None - запись удаляется."""
+        return None if self.delete else {'score': self.score}
+
+
+class BookmarkOperation(ORJSONBaseModel):
+    """Добавление (замена) или удаление закладки с местом окончания просмотра."""
+
+    film_id: UUID
+    timestamp: int = Field(default=0, ge=0)
+    delete: bool = False
+
+    def changes(self) -> Optional[dict]:
+        """Данные записи, None - запись удаляется."""
+        return None if self.delete else {'timestamp': self.timestamp}
+
+
+class BatchItemResult(ORJSONBaseModel):
+    """Результат одной операции пакетной записи."""
+
+    film_id: UUID
+    status: str
+    detail: Optional[str] = None
+
+    @classmethod
+    def from_error(cls, film_id: UUID, error: Optional[str]) -> 'BatchItemResult':
+        """Результат операции по ошибке записи, None - операция выполнена.
+
+        Args:
+          film_id: идентификатор фильма;
+          error: ошибка записи.
+
+        """
+        if error is None:
+            return cls(film_id=film_id, status=BATCH_STATUS_OK)
+        return cls(film_id=film_id, status=BATCH_STATUS_ERROR, detail='Write failed.')
@@ -4,6 +4,7 @@
 
 """
 from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
 import orjson
@@ -59,14 +60,46 @@ class Bookmark(UGCModel):
 
 
 class Review(UGCModel):
-    """Рецензия на фильм. Состоит из заглавия и тела рецензии."""
+    """Рецензия на фильм. Состоит из заглавия и тела рецензии.
+
+    Сумма, кол-во и средняя оценка лайков обзора хранятся в самом обзоре и
+    изменяются при каждой записи или удалении лайка.
+
+    """
 
     review_id: UUID
     title: str
     text: str
+    likes_sum: int = 0
+    likes_count: int = 0
+    likes_avg: Optional[float] = None
 
 
 class Like(UGCModel):
     """Оценка фильму - лайк (10) или дизлайк (0)."""
 
     score: int = 10
+
+
+class Rating(ORJSONBaseModel):
+    """Счетчики рейтинга объекта (фильма / обзора).
+
+    Поддерживаются в актуальном состоянии при каждой записи или удалении
+    оценки, поэтому для получения рейтинга не нужно читать все лайки.
+
+    """
+
+    obj_id: UUID
+    sum: int = 0
+    count: int = 0
+    likes: int = 0
+    dislikes: int = 0
+
+    def summary(self) -> dict:
+        """Метрики рейтинга: суммарная и средняя оценка, лайки и дизлайки."""
+        return {
+            'absolute_rating': self.sum if self.count else None,
+            'average_rating': (self.sum / self.count) if self.count else None,
+            'likes': self.likes,
+            'dislikes': self.dislikes,
+        }
@@ -1,16 +1,87 @@
 """Сервис для сбора информации из нескольких таблиц (коллекций)."""
+import asyncio
+import logging
+from dataclasses import dataclass
 from functools import lru_cache
+from typing import Any, Awaitable, Optional, Sequence
 from uuid import UUID
 
 from fastapi import Depends
 from pydantic import BaseModel
 
 from models.aggregate_models import FilmAggregateModel, ReviewAggregateDetailModel, UserResponseModel
+from services.cache import AggregateCache, film_cache, review_cache
 from services.ugc.bookmark import BookmarkService, get_bookmark_service
 from services.ugc.like import LikeService, get_like_service, get_review_like_service
 from services.ugc.review import ReviewService, get_review_service
+from settings import settings
 
-MAX_PAGE_SIZE = 9999
+logger = logging.getLogger(__name__)
+
+RECENT_LIKES_SIZE = 10
+RECENT_REVIEWS_SIZE = 10
+
+
+@dataclass
+class Branch:
+    """Независимый подзапрос для gather_branches.
+
+    Args:
+      query: корутина с запросом;
+      required: ошибка обязательного подзапроса прерывает все остальные,
+      ошибка необязательного заменяется значением default;
+      default: результат необязательного подзапроса при ошибке или таймауте.
+
+    """
+
+    query: Awaitable
+    required: bool = True
+    default: Any = None
+
+
+async def gather_branches(
+    branches: dict[str, Branch], timeout: Optional[float] = None,
+) -> dict[str, Any]:
+    """Выполняем независимые подзапросы одновременно.
+
+    Время ответа равно времени самого долгого подзапроса, а не их сумме.
+    Каждый подзапрос ограничен таймаутом. Если обязательный подзапрос
+    завершился ошибкой, то остальные отменяются, а ошибка пробрасывается
+    дальше. Ошибка необязательного подзапроса логируется и заменяется
+    значением по умолчанию.
+
+    Args:
+      branches: подзапросы с их названиями;
+      timeout: таймаут для каждого подзапроса в секундах, по умолчанию
+      settings.branch_timeout.
+
+    Returns:
+      Результаты подзапросов с теми же названиями.
+
+    """
+    timeout = settings.branch_timeout if timeout is None else timeout
+    tasks = {
+        name: asyncio.ensure_future(_run_branch(name, branch, timeout))
+        for name, branch in branches.items()
+    }
+    try:
+        await asyncio.gather(*tasks.values())
+    except Exception:
+        for pending_task in tasks.values():
+            pending_task.cancel()
+        raise
+    return {name: task.result() for name, task in tasks.items()}
+
+
+async def _run_branch(name: str, branch: Branch, timeout: float) -> Any:
+    """Выполняем подзапрос с таймаутом, применяя политику ошибок."""
+    try:
+        return await asyncio.wait_for(branch.query, timeout)
+    except Exception as exc:
+        if branch.required:
+            raise
+        logger.warning('Branch {0} failed: {1!r}'.format(name, exc))
+        return branch.default
 
 
 class AggregateService:
@@ -22,6 +93,7 @@ class AggregateService:
         like: LikeService,
         review: ReviewService,
         bookmark: BookmarkService,
+        cache: Optional[AggregateCache] = None,
     ):
         """Базовый конструктор класса.
 
@@ -29,35 +101,125 @@ class AggregateService:
           model: модель Pydantic для валидации данных;
           like: сервис для работы с лайками;
           review: сервис для работы с обзорами;
-          bookmark: сервис для работы с закладками.
+          bookmark: сервис для работы с закладками;
+          cache: кэш сериализованных ответов.
 
         """
         self.model = model
         self.like = like
         self.review = review
         self.bookmark = bookmark
+        self.cache = cache
+
+    async def get_film_card(self, film_id: UUID) -> str:
+        """Общая для всех пользователей информация о фильме в виде JSON.
+
+        Рейтинг и последние обзоры берутся из кэша, при отсутствии в кэше -
+        запрашиваются одновременно и сохраняются в кэш. Закладка пользователя
+        в ответ не входит.
+
+        Args:
+          film_id: идентификатор фильма.
+
+        """
+        body = await self.cache.get(film_id) if self.cache else None
+        if body is not None:
+            return body
+
+        branches = await gather_branches({
+            'rating': Branch(self.get_rating(film_id)),
+            'recent_reviews': Branch(
+                self.review.search(film_id, sort='-date', page_size=RECENT_REVIEWS_SIZE), required=False,
+            ),
+        })
+        recent_reviews = branches['recent_reviews']
+        film = FilmAggregateModel(
+            film_id=film_id, recent_reviews=recent_reviews or [], **branches['rating'],
+        )
+        body = film.json(exclude={'bookmark'})
+        if self.cache and recent_reviews is not None:
+            await self.cache.set(film_id, body)
+        return body
+
+    async def get_review_card(self, review_id: UUID) -> Optional[str]:
+        """Подробная информация об обзоре в виде JSON.
+
+        Обзор и его рейтинг запрашиваются одновременно, оценка фильма автором
+        обзора - после получения обзора. Результат сохраняется в кэш.
+
+        Args:
+          review_id: идентификатор обзора.
+
+        Returns:
+          JSON или None, если обзор не найден.
+
+        """
+        body = await self.cache.get(review_id) if self.cache else None
+        if body is not None:
+            return body
+
+        branches = await gather_branches({
+            'review': Branch(self.review.get_by_id(review_id)),
+            'rating': Branch(self.get_rating(review_id)),
+        })
+        review = branches['review']
+        if not review:
+            return None
+
+        like = await self.like.get(obj_id=review.obj_id, user_id=review.user_id)
+        review_detail = ReviewAggregateDetailModel(
+            review_id=review.review_id,
+            title=review.title,
+            text=review.text,
+            film_score=like.score if like else None,
+            film_id=review.obj_id,
+            user_id=review.user_id,
+            **branches['rating'],
+        )
+        body = review_detail.json()
+        if self.cache:
+            await self.cache.set(review_id, body)
+        return body
 
     async def get_rating(self, obj_id: UUID) -> dict:
         """Получаем разные метрики рейтинга.
 
+        Рейтинг читается из заранее подсчитанных счетчиков, последние оценки -
+        отдельным запросом с ограничением по кол-ву. Оба запроса выполняются
+        одновременно.
+
         Args:
           obj_id: id объекта для которого нужно посчитать рейтинг.
 
         """
-        likes = await self.like.search(
-            obj_id=obj_id,
-            page_size=MAX_PAGE_SIZE,
-            page_number=1,
-            sort='-date',
+        branches = await gather_branches({
+            'rating': Branch(self.like.ratings.get(obj_id)),
+            'recent_likes': Branch(self.like.search(
+                obj_id=obj_id,
+                page_size=RECENT_LIKES_SIZE,
+                page_number=1,
+                sort='-date',
+            )),
+        })
+        return dict(
+            branches['rating'].summary(),
+            recent_likes=branches['recent_likes'],
         )
-        scores = [like.score for like in likes]
-        return {
-            'recent_likes': likes[:10],
-            'absolute_rating': sum(scores) if scores else None,
-            'average_rating': (sum(scores) / len(likes)) if scores else None,
-            'likes': len([1 for like in likes if like.score == 10]),
-            'dislikes': len([1 for like in likes if like.score == 0]),
-        }
+
+    async def get_ratings(self, obj_ids: Sequence[UUID]) -> list[dict]:
+        """Получаем метрики рейтинга нескольких объектов одним запросом.
+
+        Последние оценки не запрашиваются.
+
+        Args:
+          obj_ids: id объектов, порядок сохраняется.
+
+        """
+        ratings = await self.like.ratings.get_many(obj_ids)
+        return [
+            dict(rating.summary(), obj_id=rating.obj_id)
+            for rating in ratings
+        ]
 
 
 @lru_cache()
@@ -72,6 +234,7 @@ def get_film_aggregate_service(
         like=like,
         review=review,
         bookmark=bookmark,
+        cache=film_cache,
     )
 
 
@@ -83,7 +246,7 @@ def get_review_aggregate_service(
 ):
     """DI для FastAPI. Возвращает сервис для работы с обзорами."""
     return AggregateService(
-        model=ReviewAggregateDetailModel, like=like, review=review, bookmark=bookmark,
+        model=ReviewAggregateDetailModel, like=like, review=review, bookmark=bookmark, cache=review_cache,
     )
 
 
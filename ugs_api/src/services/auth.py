@@ -1,26 +1,129 @@
-"""Сервис авторизации."""
+"""Сервис авторизации.
+
+Подпись токена проверяется либо во внешнем сервисе авторизации
+(JWT_VERIFY_MODE=remote), либо локально по публичным ключам
+(JWT_VERIFY_MODE=local). В локальном режиме дополнительно проверяется только
+отсутствие токена в списке отозванных в Redis.
+
+Результаты проверки токенов кэшируются в двух уровнях: в памяти процесса
+(TTLCache) и в Redis. Отзыв токена (logout) публикуется в канал Redis
+settings.token_revoke_channel, каждый процесс API подписан на этот канал и
+удаляет отозванный токен из своего локального кэша.
+
+"""
+import asyncio
 import logging
 from datetime import datetime, timezone
+from typing import Optional
 from uuid import UUID
 
 import aiohttp
 import backoff
 from fastapi import HTTPException, Request, status
 from fastapi.security import HTTPBearer
-from jwt import decode
+from jwt import decode, get_unverified_header
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
 
-from db import redis_db
+from db import http_client, redis_db
+from metrics import observe_auth_cache
+from services.jwt_keys import public_keys
+from services.token_cache import TTLCache
 from settings import settings
 
+REVOCATION_RETRY_DELAY = 1
+LOCAL_VERIFY_MODE = 'local'
+# Ошибки запроса к сервису авторизации: ошибка соединения или таймаут сессии.
+AUTH_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
 logger = logging.getLogger(__name__)
 
 
+class TokenCache:
+    """Результаты проверки токенов в памяти процесса и в Redis."""
+
+    def __init__(self):
+        """Конструктор класса."""
+        self.local = TTLCache(settings.token_local_cache_size)
+        self.redis_hits = 0
+        self.redis_misses = 0
+
+    async def get(self, payload: dict) -> Optional[str]:
+        """Результат проверки токена: '1' - валидный, '0' - нет, None - нет в кэше.
+
+        :param payload: Данные из токена
+
+        """
+        jti = str(UUID(payload.get('jti')))
+        cache = self.local.get(jti)
+        observe_auth_cache('local', hit=cache is not None)
+        if cache is not None:
+            return cache
+
+        cache = await redis_db.client.get(jti)
+        observe_auth_cache('redis', hit=cache is not None)
+        if cache is None:
+            self.redis_misses += 1
+            return None
+
+        self.redis_hits += 1
+        self.local.set(jti, cache, _ttl(payload, settings.token_local_cache_expire))
+        return cache
+
+    def remember(self, payload: dict, value: bool):
+        """Сохраняем результат проверки токена только в локальном кэше.
+
+        :param payload: Данные из токена
+        :param value: Результат проверки
+
+        """
+        jti = str(UUID(payload.get('jti')))
+        local_ttl = _ttl(payload, settings.token_local_cache_expire)
+        self.local.set(jti, str(int(value)), local_ttl)
+
+    async def put(self, payload: dict, value: bool):
+        """Сохраняем результат проверки токена в локальном кэше и в Redis.
+
+        :param payload: Данные из токена
+        :param value: Результат проверки
+
+        """
+        self.remember(payload, value)
+        jti = str(UUID(payload.get('jti')))
+        ex = int(_ttl(payload, settings.cache_expire))
+        if ex > 0:
+            await redis_db.client.set(jti, int(value), ex)
+
+    def forget(self, jti: str):
+        """Удаляем токен из локального кэша, например, после отзыва.
+
+        :param jti: Идентификатор токена
+
+        """
+        try:
+            self.local.delete(str(UUID(jti)))
+        except ValueError:
+            logger.warning('Invalid jti: {0}'.format(jti))
+
+    def stats(self) -> dict:
+        """Счетчики попаданий и промахов локального кэша и кэша в Redis."""
+        return {
+            'local_hits': self.local.hits,
+            'local_misses': self.local.misses,
+            'local_size': len(self.local),
+            'redis_hits': self.redis_hits,
+            'redis_misses': self.redis_misses,
+        }
+
+
 class JWTBearer(HTTPBearer):
     """Работа с токенами."""
 
     def __init__(self, auto_error: bool = True):
         """Конструктор класса."""
         super().__init__(auto_error=auto_error)
+        self._pending: dict[str, asyncio.Future] = {}
+        self.cache = TokenCache()
 
     async def __call__(self, request: Request):
         """Работа с credentials.
@@ -43,6 +146,7 @@ class JWTBearer(HTTPBearer):
                     status_code=status.HTTP_403_FORBIDDEN, detail='Auth: Invalid token or expired token.',
                 )
 
+            request.state.token_payload = payload
             return UUID(payload.get('sub'))
 
         raise HTTPException(
@@ -53,6 +157,8 @@ class JWTBearer(HTTPBearer):
         """
         Если токен валидный и не истек срок его действия, то возвращает данные токена.
 
+        В локальном режиме также проверяется подпись токена.
+
         :param token: Токен для проверки
         :return: Данные из токена в виде словаря
 
@@ -61,7 +167,7 @@ class JWTBearer(HTTPBearer):
 
         """
         try:
-            payload = decode(token, options={'verify_signature': False})
+            payload = _decode(token)
             exp = int(str(payload.get('exp')))
             if exp > datetime.now(timezone.utc).timestamp():
                 return payload
@@ -70,45 +176,140 @@ class JWTBearer(HTTPBearer):
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Expired token.')
 
-    @backoff.on_exception(backoff.expo, aiohttp.ClientError)
     async def check_auth(self, token: str, payload: dict) -> bool:
         """
         Проверяем валидность в токена во внешнем сервисе и кэшируем результат.
 
+        В локальном режиме внешний сервис не используется, проверяется только
+        отсутствие токена в списке отозванных.
+
+        Одновременные проверки одного и того же токена объединяются в один
+        запрос к сервису авторизации. Запрос повторяется при ошибке
+        соединения или таймауте не более settings.auth_max_tries раз.
+
         :param token: Токен
         :param payload: Данные из токена
 
+        Raises:
+            HTTPException: HTTP_503_SERVICE_UNAVAILABLE, сервис авторизации недоступен
+
         """
         if not settings.jwt_validate:
             return True
 
-        cache = await self._jwt_from_cache(UUID(payload.get('jti')))
+        cache = await self.cache.get(payload)
         if cache is not None:
             return bool(int(cache))
 
+        if settings.jwt_verify_mode == LOCAL_VERIFY_MODE:
+            # Подпись уже проверена, в Redis нет отметки об отзыве токена.
+            self.cache.remember(payload, True)
+            return True
+
+        pending = self._pending.get(token)
+        if pending is None:
+            pending = asyncio.ensure_future(self._request_auth(token, payload))
+            self._pending[token] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(token, None))
+        try:
+            return await asyncio.shield(pending)
+        except AUTH_ERRORS as exc:
+            logger.error('Auth service is unavailable: {0!r}'.format(exc))
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Auth service is unavailable.',
+            )
+
+    def forget(self, jti: str):
+        """Удаляем токен из локального кэша, например, после отзыва.
+
+        :param jti: Идентификатор токена
+
+        """
+        self.cache.forget(jti)
+
+    def cache_stats(self) -> dict:
+        """Счетчики попаданий и промахов локального кэша и кэша в Redis."""
+        return self.cache.stats()
+
+    @backoff.on_exception(backoff.expo, AUTH_ERRORS, max_tries=settings.auth_max_tries)
+    async def _request_auth(self, token: str, payload: dict) -> bool:
+        """Запрос к сервису авторизации через общую сессию с пулом соединений."""
         res = False
 
-        session = aiohttp.ClientSession()
-        async with session.get(
+        async with http_client.session.get(
             settings.auth_url, headers={'Authorization': 'Bearer {0}'.format(token)},
         ) as auth_response:
             if auth_response.status == status.HTTP_200_OK:
                 res = True
 
-            await self._put_jwt_to_cache(payload, res)
+            await self.cache.put(payload, res)
             return res
 
-    async def _jwt_from_cache(self, jti: UUID) -> bool:
-        return await redis_db.client.get(str(jti))
 
-    async def _put_jwt_to_cache(self, payload: dict, value: bool):
-        ex = settings.cache_expire
-        dt_now = datetime.now(timezone.utc).timestamp()
-        exp = int(str(payload.get('exp')))
-        if exp - dt_now < ex:
-            ex = exp - datetime.now(timezone.utc).timestamp()
+def _decode(token: str) -> dict:
+    """Декодируем токен, в локальном режиме проверяя подпись.
+
+    Raises:
+        PublicKeyError: нет ключа для проверки подписи
+
+    """
+    if settings.jwt_verify_mode != LOCAL_VERIFY_MODE:
+        return decode(token, options={'verify_signature': False})
 
-        await redis_db.client.set(payload.get('jti'), int(value), ex)
+    key = public_keys.get(get_unverified_header(token).get('kid'))
+    return decode(
+        token, key, algorithms=settings.jwt_algorithms, options={'verify_exp': False},
+    )
+
+
+def _ttl(payload: dict, max_ttl: float) -> float:
+    """Время жизни записи в кэше, не больше оставшегося срока действия токена."""
+    exp = int(str(payload.get('exp')))
+    return min(max_ttl, exp - datetime.now(timezone.utc).timestamp())
 
 
 bearer = JWTBearer()
+
+
+async def revoke_token(payload: dict):
+    """Отзываем токен во всех процессах API (logout).
+
+    Результат проверки токена в Redis заменяется на отрицательный до
+    истечения срока действия токена, а идентификатор токена публикуется в
+    канал отзыва.
+
+    :param payload: Данные из токена
+
+    """
+    jti = str(UUID(payload.get('jti')))
+    exp = int(str(payload.get('exp')))
+    ttl = int(exp - datetime.now(timezone.utc).timestamp())
+    if ttl <= 0:
+        return
+    await redis_db.client.set(jti, 0, ttl)
+    await redis_db.client.publish(settings.token_revoke_channel, jti)
+
+
+async def listen_revocations(jwt_bearer: 'JWTBearer'):
+    """Фоновая задача: удаляем отозванные токены из локального кэша.
+
+    При потере соединения с Redis подписка восстанавливается.
+
+    :param jwt_bearer: Экземпляр JWTBearer, кэш которого нужно очищать
+
+    """
+    while True:
+        try:
+            async with redis_db.client.pubsub() as pubsub:
+                await pubsub.subscribe(settings.token_revoke_channel)
+                await _forget_revoked(pubsub, jwt_bearer)
+        except RedisError as exc:
+            logger.warning('Revocation listener failed: {0!r}'.format(exc))
+            await asyncio.sleep(REVOCATION_RETRY_DELAY)
+
+
+async def _forget_revoked(pubsub: PubSub, jwt_bearer: 'JWTBearer'):
+    """Обрабатываем сообщения из канала отзыва токенов."""
+    async for message in pubsub.listen():
+        if message['type'] == 'message':
+            jwt_bearer.forget(message['data'])
@@ -0,0 +1,103 @@
+"""Кэш сериализованных ответов API в Redis.
+
+В кэше хранится уже готовый JSON, поэтому при попадании в кэш не нужно ни
+обращаться к Mongo, ни создавать модели Pydantic. Данные, которые зависят от
+пользователя (например, закладка), в кэш не попадают и добавляются к ответу
+отдельно функцией merge_json.
+
+Записи удаляются из кэша сервисами UGC при изменении данных, кроме того, у
+каждой записи есть время жизни на случай гонки между чтением и записью.
+
+"""
+import logging
+from typing import Optional
+from uuid import UUID
+
+from redis.exceptions import RedisError
+
+from db import redis_db
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AggregateCache:
+    """Кэш сериализованных ответов для одного вида объектов."""
+
+    def __init__(self, prefix: str):
+        """Конструктор класса.
+
+        Args:
+          prefix: префикс ключей в Redis.
+
+        """
+        self.prefix = prefix
+
+    async def get(self, obj_id: UUID) -> Optional[str]:
+        """Получаем JSON из кэша, None - записи нет или кэш недоступен.
+
+        Args:
+          obj_id: идентификатор объекта.
+
+        """
+        if not self._enabled():
+            return None
+        try:
+            return await redis_db.client.get(self._key(obj_id))
+        except RedisError as exc:
+            logger.warning('Cache get failed: {0!r}'.format(exc))
+            return None
+
+    async def set(self, obj_id: UUID, body: str):
+        """Сохраняем JSON в кэш.
+
+        Args:
+          obj_id: идентификатор объекта;
+          body: сериализованный ответ.
+
+        """
+        if not self._enabled():
+            return
+        try:
+            await redis_db.client.set(self._key(obj_id), body, ex=settings.aggregate_cache_expire)
+        except RedisError as exc:
+            logger.warning('Cache set failed: {0!r}'.format(exc))
+
+    async def invalidate(self, *obj_ids: Optional[UUID]):
+        """Удаляем записи из кэша.
+
+        Args:
+          obj_ids: идентификаторы объектов, None пропускаются.
+
+        """
+        keys = [self._key(obj_id) for obj_id in obj_ids if obj_id]
+        if not keys or not self._enabled():
+            return
+        try:
+            await redis_db.client.delete(*keys)
+        except RedisError as exc:
+            logger.warning('Cache invalidate failed: {0!r}'.format(exc))
+
+    def _key(self, obj_id: UUID) -> str:
+        return '{0}:{1}'.format(self.prefix, obj_id)
+
+    def _enabled(self) -> bool:
+        return settings.aggregate_cache and redis_db.client is not None
+
+
+def merge_json(body: str, **fields: str) -> str:
+    """Добавляем поля к сериализованному JSON объекту без его разбора.
+
+    Args:
+      body: JSON объект;
+      fields: названия полей и их значения, уже сериализованные в JSON.
+
+    """
+    extra = [
+        '"{0}":{1}'.format(name, field_value) for name, field_value in fields.items()
+    ]
+    return '{0},{1}}}'.format(body[:-1], ','.join(extra))
+
+
+film_cache = AggregateCache('film_card')
+review_cache = AggregateCache('review_card')
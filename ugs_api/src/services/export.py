@@ -0,0 +1,87 @@
+"""Выгрузка всех пользовательских данных в формате NDJSON.
+
+Каждая строка выгрузки - JSON объект одной записи с полем type (like,
+review_like, review, bookmark). Записи читаются курсорами БД пачками и
+отдаются клиенту частями по мере чтения, поэтому память не зависит от
+объема истории пользователя.
+
+"""
+import zlib
+from functools import lru_cache
+from typing import AsyncIterator
+from uuid import UUID
+
+import orjson
+from fastapi import Depends
+
+from services.ugc.base_service import UGCService
+from services.ugc.bookmark import BookmarkService, get_bookmark_service
+from services.ugc.like import LikeService, get_like_service, get_review_like_service
+from services.ugc.review import ReviewService, get_review_service
+from settings import settings
+
+GZIP_WBITS = 31
+
+
+class ExportService:
+    """Сервис для выгрузки пользовательских данных."""
+
+    def __init__(self, sources: dict[str, UGCService]):
+        """Конструктор класса.
+
+        Args:
+          sources: сервисы UGC по типу записей.
+
+        """
+        self.sources = sources
+
+    async def export(self, user_id: UUID, compress: bool = False) -> AsyncIterator[bytes]:
+        """Части выгрузки размером около settings.export_chunk_size байт.
+
+        Args:
+          user_id: идентификатор пользователя;
+          compress: сжимать выгрузку gzip.
+
+        """
+        compressor = zlib.compressobj(wbits=GZIP_WBITS) if compress else None
+        chunk = bytearray()
+        async for line in self._lines(user_id):
+            chunk += line
+            if len(chunk) < settings.export_chunk_size:
+                continue
+            output = compressor.compress(bytes(chunk)) if compressor else bytes(chunk)
+            chunk.clear()
+            if output:
+                yield output
+
+        output = bytes(chunk)
+        if compressor:
+            output = compressor.compress(output) + compressor.flush()
+        if output:
+            yield output
+
+    async def _lines(self, user_id: UUID) -> AsyncIterator[bytes]:
+        """Строки NDJSON всех записей пользователя по типам."""
+        for record_type, source in self.sources.items():
+            records = source.iterate(user_id=user_id, batch_size=settings.export_batch_size)
+            async for record in records:
+                line = dict(record.dict(), type=record_type)
+                yield orjson.dumps(line, option=orjson.OPT_APPEND_NEWLINE)
+
+
+@lru_cache()
+def get_export_service(
+    like: LikeService = Depends(get_like_service),
+    review_like: LikeService = Depends(get_review_like_service),
+    review: ReviewService = Depends(get_review_service),
+    bookmark: BookmarkService = Depends(get_bookmark_service),
+):
+    """DI для FastAPI. Получаем сервис для выгрузки пользовательских данных."""
+    return ExportService(
+        sources={
+            'like': like,
+            'review_like': review_like,
+            'review': review,
+            'bookmark': bookmark,
+        },
+    )
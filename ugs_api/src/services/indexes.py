@@ -0,0 +1,82 @@
+"""Создание и проверка индексов для всех UGC таблиц (коллекций).
+
+Индексы описываются декларативно в сервисах, здесь они только собираются
+вместе и применяются к БД или сравниваются с уже существующими.
+
+"""
+import asyncio
+import logging
+from typing import Sequence
+
+from db_managers.abstract_manager import AbstractDBManager, Index
+from services.ugc.bookmark import get_bookmark_service
+from services.ugc.like import get_like_service, get_review_like_service
+from services.ugc.review import get_review_service
+
+logger = logging.getLogger(__name__)
+
+IndexDiff = dict[str, list[str]]
+
+
+def get_index_specs(db: AbstractDBManager) -> dict[str, Sequence[Index]]:
+    """Собираем индексы всех UGC сервисов.
+
+    Args:
+      db: инициализированный менеджер для работы с БД.
+
+    """
+    services = (
+        get_like_service(db=db),
+        get_review_like_service(db=db),
+        get_review_service(db=db),
+        get_bookmark_service(db=db),
+    )
+    specs: dict[str, Sequence[Index]] = {}
+    for service in services:
+        specs.update(service.all_indexes())
+    return specs
+
+
+async def apply_indexes(db: AbstractDBManager):
+    """Создаем недостающие индексы. Повторный вызов ничего не меняет.
+
+    Args:
+      db: инициализированный менеджер для работы с БД.
+
+    """
+    specs = get_index_specs(db)
+    await asyncio.gather(*[
+        db.create_indexes(table, indexes) for table, indexes in specs.items()
+    ])
+    logger.info('Indexes created for: {0}'.format(', '.join(specs)))
+
+
+async def diff_indexes(db: AbstractDBManager) -> dict[str, IndexDiff]:
+    """Сравниваем описанные индексы с существующими в БД.
+
+    Args:
+      db: инициализированный менеджер для работы с БД.
+
+    Returns:
+      Словарь вида {таблица: {'missing': [...], 'changed': [...], 'extra': [...]}},
+      таблицы без расхождений в него не попадают.
+
+    """
+    specs = get_index_specs(db)
+    existing_indexes = await asyncio.gather(*[db.get_indexes(table) for table in specs])
+
+    diff = {}
+    for (table, indexes), table_indexes in zip(specs.items(), existing_indexes):
+        existing = {index.name: index for index in table_indexes}
+        expected = {index.name: index for index in indexes}
+        table_diff = {
+            'missing': [name for name in expected if name not in existing],
+            'changed': [
+                name for name, index in expected.items()
+                if name in existing and existing[name] != index
+            ],
+            'extra': [name for name in existing if name not in expected],
+        }
+        if any(table_diff.values()):
+            diff[table] = table_diff
+    return diff
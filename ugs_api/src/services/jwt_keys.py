@@ -0,0 +1,105 @@
+"""Публичные ключи для локальной проверки подписи токенов.
+
+Ключи загружаются из файла settings.jwt_public_keys в формате JWKS (JSON)
+или PEM. Файл перечитывается при изменении, изменения проверяются не чаще
+одного раза в settings.jwt_keys_reload_interval секунд, поэтому ротация
+ключей не требует перезапуска API.
+
+"""
+import logging
+import os
+import time
+from typing import Any, Optional
+
+from jwt import PyJWKSet
+from jwt.exceptions import PyJWTError
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PublicKeyError(Exception):
+    """Исключение при отсутствии подходящего ключа."""
+
+
+class PublicKeys:
+    """Набор публичных ключей с перезагрузкой при изменении файла."""
+
+    def __init__(self, path: Optional[str], reload_interval: float):
+        """Конструктор класса.
+
+        Args:
+          path: путь к файлу с ключами (JWKS или PEM);
+          reload_interval: интервал проверки изменения файла в секундах.
+
+        """
+        self.path = path
+        self.reload_interval = reload_interval
+        self._keys: dict[Optional[str], Any] = {}
+        self._mtime: float = 0
+        self._next_check: float = 0
+
+    def load(self):
+        """Загружаем ключи из файла.
+
+        Для JWKS ключи индексируются по kid, PEM ключ используется для
+        токенов с любым kid.
+
+        Raises:
+          PublicKeyError: путь к файлу не задан или файл содержит некорректные ключи.
+
+        """
+        if not self.path:
+            raise PublicKeyError('JWT_PUBLIC_KEYS is not set')
+
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path) as keys_file:
+            raw_keys = keys_file.read()
+
+        if raw_keys.lstrip().startswith('{'):
+            try:
+                jwks = PyJWKSet.from_json(raw_keys)
+            except (ValueError, PyJWTError) as exc:
+                raise PublicKeyError('Invalid JWKS: {0!r}'.format(exc))
+            self._keys = {jwk.key_id: jwk.key for jwk in jwks.keys}
+        else:
+            self._keys = {None: raw_keys}
+
+        self._mtime = mtime
+        self._next_check = time.monotonic() + self.reload_interval
+        logger.info('Loaded {0} JWT public keys from {1}'.format(len(self._keys), self.path))
+
+    def get(self, kid: Optional[str]) -> Any:
+        """Ключ для проверки подписи токена.
+
+        Args:
+          kid: идентификатор ключа из заголовка токена.
+
+        Raises:
+          PublicKeyError: ключ не найден.
+
+        """
+        self._reload_if_changed()
+        key = self._keys.get(kid, self._keys.get(None))
+        if key is not None:
+            return key
+        raise PublicKeyError('Unknown key id: {0}'.format(kid))
+
+    def _reload_if_changed(self):
+        """Перечитываем файл, если он изменился. Ошибки не прерывают работу."""
+        if time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.reload_interval
+        try:
+            self._reload()
+        except (OSError, PublicKeyError) as exc:
+            logger.error('Failed to reload JWT public keys: {0!r}'.format(exc))
+
+    def _reload(self):
+        mtime = os.stat(str(self.path)).st_mtime
+        if not self._keys or mtime != self._mtime:
+            self.load()
+
+
+public_keys = PublicKeys(settings.jwt_public_keys, settings.jwt_keys_reload_interval)
@@ -0,0 +1,218 @@
+"""Место просмотра фильма (закладка) в Redis.
+
+Плееры сообщают о месте просмотра каждые несколько секунд. Последнее место
+для пары (фильм, пользователь) хранится в Redis, а ключ пары добавляется в
+множество измененных записей. Периодически измененные записи извлекаются из
+множества (SPOP атомарен, поэтому несколько процессов API не сбросят одну и
+ту же запись дважды) и записываются в Mongo пакетами. Таким образом,
+кол-во записей в Mongo за период сброса не превышает кол-ва зрителей.
+
+При удалении места просмотра (удаление или явная запись закладки) время
+удаления сохраняется на DELETED_EXPIRE секунд, чтобы сброс, который прочитал
+место просмотра раньше, не восстановил удаленную закладку.
+
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from redis.exceptions import RedisError
+
+from db import redis_db
+from models.ugc_models import Bookmark
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'progress:dirty'
+# Время хранения отметки об удалении, должно превышать время сброса пакета.
+DELETED_EXPIRE = 300
+
+
+@dataclass(frozen=True)
+class ProgressKeys:
+    """Ключи Redis для места просмотра пары (фильм, пользователь).
+
+    Args:
+      prefix: префикс ключей в Redis.
+
+    """
+
+    prefix: str
+
+    def member(self, obj_id: UUID, user_id: UUID) -> str:
+        """Элемент множества измененных записей."""
+        return '{0}:{1}'.format(obj_id, user_id)
+
+    def progress(self, member: str) -> str:
+        """Ключ места просмотра."""
+        return '{0}:{1}'.format(self.prefix, member)
+
+    def deleted(self, member: str) -> str:
+        """Ключ времени удаления места просмотра."""
+        return '{0}:deleted:{1}'.format(self.prefix, member)
+
+
+class ProgressCache:
+    """Последнее место просмотра и множество еще не сброшенных в БД записей."""
+
+    def __init__(self, prefix: str = 'progress'):
+        """Конструктор класса.
+
+        Args:
+          prefix: префикс ключей в Redis.
+
+        """
+        self.keys = ProgressKeys(prefix)
+
+    async def set(self, bookmark: Bookmark) -> bool:
+        """Сохраняем место просмотра и отмечаем запись для сброса в БД.
+
+        Args:
+          bookmark: закладка с местом просмотра.
+
+        Returns:
+          False - кэш отключен или недоступен, закладку нужно записать в БД.
+
+        """
+        if not _enabled():
+            return False
+        member = self.keys.member(bookmark.obj_id, bookmark.user_id)
+        key = self.keys.progress(member)
+        try:
+            async with redis_db.client.pipeline(transaction=True) as pipe:
+                pipe.set(key, bookmark.json(), ex=settings.progress_expire)
+                pipe.sadd(DIRTY_KEY, member)
+                await pipe.execute()
+        except RedisError as exc:
+            logger.warning('Progress set failed: {0!r}'.format(exc))
+            return False
+        return True
+
+    async def get(self, obj_id: UUID, user_id: UUID) -> Optional[Bookmark]:
+        """Получаем место просмотра, None - записи нет или кэш недоступен.
+
+        Args:
+          obj_id: идентификатор фильма;
+          user_id: идентификатор пользователя.
+
+        """
+        if not _enabled():
+            return None
+        key = self.keys.progress(self.keys.member(obj_id, user_id))
+        try:
+            raw_bookmark = await redis_db.client.get(key)
+        except RedisError as exc:
+            logger.warning('Progress get failed: {0!r}'.format(exc))
+            return None
+        return Bookmark.parse_raw(raw_bookmark) if raw_bookmark else None
+
+    async def delete(self, obj_id: UUID, user_id: UUID):
+        """Удаляем место просмотра, например при удалении закладки.
+
+        Время удаления сохраняется, чтобы отменить запись места просмотра
+        одновременным сбросом (см. deleted).
+
+        Args:
+          obj_id: идентификатор фильма;
+          user_id: идентификатор пользователя.
+
+        """
+        if not _enabled():
+            return
+        member = self.keys.member(obj_id, user_id)
+        deleted_at = datetime.now().isoformat()
+        try:
+            async with redis_db.client.pipeline(transaction=True) as pipe:
+                pipe.delete(self.keys.progress(member))
+                pipe.srem(DIRTY_KEY, member)
+                pipe.set(self.keys.deleted(member), deleted_at, ex=DELETED_EXPIRE)
+                await pipe.execute()
+        except RedisError as exc:
+            logger.warning('Progress delete failed: {0!r}'.format(exc))
+
+    async def pop_dirty(self, count: int) -> Optional[list[Bookmark]]:
+        """Извлекаем до count измененных записей для сброса в БД.
+
+        Args:
+          count: максимальное кол-во записей.
+
+        Returns:
+          Места просмотра (истекшие пропускаются) или None, если множество
+          измененных записей пусто или кэш недоступен.
+
+        """
+        if not _enabled():
+            return None
+        try:
+            raw_bookmarks = await _pop_dirty(self.keys, count)
+        except RedisError as exc:
+            logger.warning('Progress pop failed: {0!r}'.format(exc))
+            return None
+        if raw_bookmarks is None:
+            return None
+        return [
+            Bookmark.parse_raw(raw_bookmark)
+            for raw_bookmark in raw_bookmarks
+            if raw_bookmark
+        ]
+
+    async def mark_dirty(self, bookmarks: list[Bookmark]):
+        """Возвращаем записи в множество измененных, если сброс не удался.
+
+        Args:
+          bookmarks: закладки, не записанные в БД.
+
+        """
+        if not bookmarks or not _enabled():
+            return
+        members = [self.keys.member(bookmark.obj_id, bookmark.user_id) for bookmark in bookmarks]
+        try:
+            await redis_db.client.sadd(DIRTY_KEY, *members)
+        except RedisError as exc:
+            logger.error('{0} playback positions were lost: {1!r}'.format(len(members), exc))
+
+    async def deleted(self, bookmarks: list[Bookmark]) -> list[Bookmark]:
+        """Места просмотра, удаленные после их сохранения.
+
+        Args:
+          bookmarks: записанные в БД места просмотра.
+
+        Returns:
+          Места просмотра, которые нужно удалить из БД повторно. Если кэш
+          недоступен, возвращается пустой список.
+
+        """
+        if not bookmarks or not _enabled():
+            return []
+        keys = [
+            self.keys.deleted(self.keys.member(bookmark.obj_id, bookmark.user_id))
+            for bookmark in bookmarks
+        ]
+        try:
+            deleted_at = await redis_db.client.mget(keys)
+        except RedisError as exc:
+            logger.warning('Progress deleted check failed: {0!r}'.format(exc))
+            return []
+        return [
+            bookmark
+            for bookmark, raw_date in zip(bookmarks, deleted_at)
+            if raw_date and datetime.fromisoformat(raw_date) > bookmark.date
+        ]
+
+
+async def _pop_dirty(keys: ProgressKeys, count: int) -> Optional[list]:
+    """Извлекаем до count элементов множества и читаем их места просмотра."""
+    members = await redis_db.client.spop(DIRTY_KEY, count)
+    if not members:
+        return None
+    return await redis_db.client.mget([keys.progress(member) for member in members])
+
+
+def _enabled() -> bool:
+    return settings.progress_cache and redis_db.client is not None
+
+
+progress_cache = ProgressCache()
@@ -0,0 +1,71 @@
+"""Локальный (в памяти процесса) кэш результатов проверки токенов.
+
+Используется перед кэшем в Redis, чтобы не обращаться к Redis при каждой
+проверке недавно проверенного токена. Кэш ограничен по размеру (вытесняются
+давно не использованные записи) и по времени жизни записей.
+
+"""
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TTLCache:
+    """Ограниченный по размеру LRU кэш с временем жизни записей."""
+
+    def __init__(self, max_size: int):
+        """Конструктор класса.
+
+        Args:
+          max_size: максимальное кол-во записей.
+
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        """Получаем значение, None - записи нет или истек срок ее жизни.
+
+        Args:
+          key: ключ записи.
+
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, cache_value: str, ttl: float):
+        """Сохраняем значение.
+
+        Args:
+          key: ключ записи;
+          cache_value: значение;
+          ttl: время жизни записи в секундах.
+
+        """
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, cache_value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        """Удаляем запись.
+
+        Args:
+          key: ключ записи.
+
+        """
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        """Кол-во записей, включая просроченные."""
+        return len(self._entries)
@@ -1,13 +1,24 @@
 """Базовые UGS сервисы и сопутствующие исключения."""
-from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional, Sequence
 from uuid import UUID
 
-from db_managers.abstract_manager import AbstractDBManager
+from db_managers.abstract_manager import AbstractDBManager, BulkOperation, Index
 from models.ugc_models import UGCModel
+from services.ugc.queries import UGCKey, create_search_query, key_query, new_version, ugc_key
+from services.versions import USER_SCOPE, Scope, versions
+from services.write_buffer import create_buffer
 
 MAX_PAGE_SIZE = 9999
 
+UGC_INDEXES = (
+    Index(fields=(('obj_id', 1), ('user_id', 1)), unique=True),
+    Index(fields=(('obj_id', 1), ('date', -1))),
+    Index(fields=(('user_id', 1), ('date', -1))),
+)
+
+# Операция пакетной записи: (obj_id, дополнительные данные или None для удаления).
+UGCOperation = tuple[UUID, Optional[dict]]
+
 
 class UGSServiceError(Exception):
     """Базовое исключение для всех ошибок в работе AbstractService."""
@@ -21,8 +32,8 @@ class DocNotFoundError(UGSServiceError):
     """Исключение при попытке получить отсутствующую запись."""
 
 
-class UGCService:
-    """Базовый класс для UGS сервисов."""
+class UGCReader:
+    """Базовый класс для чтения записей UGS сервисов."""
 
     def __init__(
         self,
@@ -55,7 +66,7 @@ class UGCService:
 
         """
         doc = await self.db.get(
-            self.collection_name, self._create_search_query(obj_id, user_id),
+            self.collection_name, create_search_query(obj_id, user_id),
         )
         if not doc:
             return None
@@ -68,21 +79,50 @@ class UGCService:
         page_size: int = 10,
         page_number: int = 1,
         sort: str = '_id',
+        after: Optional[str] = None,
     ):
         """GET запрос для поиска данных. Возвращает несколько значений.
 
         Можно фильтровать запрос по пользователю или фильму.
-        Поддерживается пагинация (LIMIT / OFFSET) и сортировку.
+        Поддерживается пагинация (LIMIT / OFFSET или курсор) и сортировку.
 
         Args:
           obj_id: идентификатор связанного объекта (фильма / обзора);
           user_id: идентификатор пользователя;
           page_size: кол-во данных на странице;
           page_number: номер страницы;
-          sort: поле для сортировки, '-' означает обратный порядок сортировки.
+          sort: поле для сортировки, '-' означает обратный порядок сортировки;
+          after: курсор следующей страницы, при наличии page_number не учитывается.
 
         """
-        search_query = self._create_search_query(obj_id, user_id)
+        page, _ = await self.search_page(
+            obj_id, user_id, page_size, page_number, sort, after,
+        )
+        return page
+
+    async def search_page(
+        self,
+        obj_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None,
+        page_size: int = 10,
+        page_number: int = 1,
+        sort: str = '_id',
+        after: Optional[str] = None,
+    ) -> tuple[list, Optional[str]]:
+        """То же, что и search, но дополнительно возвращает курсор следующей страницы.
+
+        Курсор равен None, если страница последняя.
+
+        Args:
+          obj_id: идентификатор связанного объекта (фильма / обзора);
+          user_id: идентификатор пользователя;
+          page_size: кол-во данных на странице;
+          page_number: номер страницы;
+          sort: поле для сортировки, '-' означает обратный порядок сортировки;
+          after: курсор следующей страницы, при наличии page_number не учитывается.
+
+        """
+        search_query = create_search_query(obj_id, user_id)
         sort_order = -1 if sort.startswith('-') else 1
         docs = await self.db.search(
             self.collection_name,
@@ -90,53 +130,54 @@ class UGCService:
             page_size,
             page_size * (page_number - 1),
             sort=[(sort.lstrip('-'), sort_order)],
+            after=after,
         )
         if not docs:
-            return []
-        return [self.model(**doc) for doc in docs]
+            return [], None
+        next_page = self.make_cursor(docs, page_size, sort)
+        return [self.model(**doc) for doc in docs], next_page
 
-    async def create(
+    async def iterate(
         self,
-        obj_id: UUID,
-        user_id: UUID,
-        **kwargs,
-    ):
-        """CREATE запрос для создания данных.
+        obj_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[UGCModel]:
+        """Все записи пользователя или фильма, начиная с последних.
 
-        Если у этого пользователя для этого фильма уже была создана запись,
-        то заменяем старую на новую.
+        В отличие от search записи не собираются в список, поэтому память
+        не зависит от их кол-ва.
 
         Args:
           obj_id: идентификатор связанного объекта (фильма / обзора);
-          user_id: идентификатор пользователя,
-          kwargs: дополнительные данные объекта.
+          user_id: идентификатор пользователя;
+          batch_size: кол-во записей, получаемых из БД за один запрос.
 
         """
-        if await self.get(obj_id, user_id) is not None:
-            await self.delete(obj_id, user_id)
-
-        search_query = self._create_search_query(obj_id, user_id)
-        search_query.update(kwargs)
-        search_query['date'] = datetime.now()
-        await self.db.create(self.collection_name, search_query)
-
-    async def delete(self, obj_id: Optional[UUID] = None, user_id: Optional[UUID] = None):
-        """DELETE запрос для удаления данных.
-
-        На данным этапе считаем, что связка "пользователь + фильм" уникальна и
-        ничего лишнего мы не удалим. Можно добавить проверку на наличие записи,
-        но это лишний запрос в БД:
+        docs = self.db.iterate(
+            self.collection_name,
+            create_search_query(obj_id, user_id),
+            sort=[('date', -1)],
+            batch_size=batch_size,
+        )
+        async for doc in docs:
+            yield self.model(**doc)
 
-        if not await self.get(obj_id, user_id):
-            raise DocNotFoundError('Запись не существует')
+    def make_cursor(self, docs: list, page_size: int, sort: str) -> Optional[str]:
+        """Курсор для получения страницы, следующей за docs.
 
         Args:
-          obj_id: идентификатор связанного объекта (фильма / обзора);
-          user_id: идентификатор пользователя.
+          docs: записи текущей страницы;
+          page_size: кол-во данных на странице;
+          sort: поле для сортировки, '-' означает обратный порядок сортировки.
+
+        Returns:
+          Курсор или None, если страница последняя.
 
         """
-        search_query = self._create_search_query(obj_id, user_id)
-        await self.db.delete(self.collection_name, search_query)
+        if len(docs) < page_size:
+            return None
+        return self.db.make_cursor(docs[-1], sort.lstrip('-'))
 
     async def aggregate(
         self,
@@ -148,11 +189,14 @@ class UGCService:
         page_size: int = 10,
         page_number: int = 1,
         sort: str = '-avg',
+        after: Optional[str] = None,
     ):
         """GET запрос для агрегирования данных из нескольких таблиц (коллекций).
 
-        Поддерживается пагинация (LIMIT / OFFSET) и сортировку.
-        Добавляет свойства "avg" и "sum" по которым также можно сортировать.
+        Поддерживается пагинация (LIMIT / OFFSET или курсор) и сортировку.
+        Добавляет свойства "avg" и "sum" по которым также можно сортировать,
+        но такая сортировка объединяет все найденные записи на каждой
+        странице (см. MongoManager.aggregate).
 
         Args:
           related_table: имя связанной таблицы (коллекции);
@@ -163,10 +207,11 @@ class UGCService:
           user_id: идентификатор пользователя;
           page_size: кол-во данных на странице;
           page_number: номер страницы;
-          sort: поле для сортировки, '-' означает обратный порядок сортировки.
+          sort: поле для сортировки, '-' означает обратный порядок сортировки;
+          after: курсор следующей страницы, при наличии page_number не учитывается.
 
         """
-        search_query = self._create_search_query(obj_id, user_id)
+        search_query = create_search_query(obj_id, user_id)
         sort_order = -1 if sort.startswith('-') else 1
         return await self.db.aggregate(
             self.collection_name,
@@ -177,21 +222,159 @@ class UGCService:
             page_size,
             page_size * (page_number - 1),
             sort=[sort.lstrip('-'), sort_order],
+            after=after,
         )
 
-    def _create_search_query(self, obj_id, user_id):
-        """Для простоты конвертации в bson приводим UUID к строке.
 
-        Альтернатива - bson.Binary.from_uuid().
+class UGCService(UGCReader):
+    """Базовый класс для UGS сервисов: чтение и запись."""
+
+    def __init__(
+        self,
+        model: type[UGCModel],
+        db: AbstractDBManager,
+        collection_name: str,
+        indexes: Sequence[Index] = UGC_INDEXES,
+        write_behind: bool = False,
+        version_scope: Optional[str] = None,
+    ):
+        """Базовый конструктор класса.
+
+        Args:
+          model: модель UGCModel (Pydantic) для валидации данных;
+          db: инициализированный менеджер для работы с БД;
+          collection_name: название таблицы (коллекции) БД;
+          indexes: индексы таблицы (коллекции);
+          write_behind: записывать изменения через буфер отложенной записи;
+          version_scope: вид связанного объекта для счетчиков версий (ETag),
+          None - версии связанных объектов не изменяются.
+
+        """
+        super().__init__(model=model, db=db, collection_name=collection_name)
+        self.indexes = indexes
+        self.buffer = create_buffer(collection_name, self.apply_batch) if write_behind else None
+        self.version_scope = version_scope
+
+    def all_indexes(self) -> dict[str, Sequence[Index]]:
+        """Индексы всех таблиц (коллекций), с которыми работает сервис."""
+        return {self.collection_name: self.indexes}
+
+    async def create(
+        self,
+        obj_id: UUID,
+        user_id: UUID,
+        **kwargs,
+    ):
+        """CREATE запрос для создания данных.
+
+        Если у этого пользователя для этого фильма уже была создана запись,
+        то заменяем старую на новую. Замена выполняется одним атомарным
+        запросом к БД. При включенной отложенной записи запись помещается в
+        буфер и возвращается None.
+
+        Args:
+          obj_id: идентификатор связанного объекта (фильма / обзора);
+          user_id: идентификатор пользователя,
+          kwargs: дополнительные данные объекта.
+
+        Returns:
+          Замененная запись или None, если запись была создана.
+
+        """
+        search_query = create_search_query(obj_id, user_id)
+        obj_data = new_version(obj_id, user_id, kwargs)
+        if self.buffer:
+            await self.buffer.put(ugc_key(obj_id, user_id), obj_data)
+            return None
+        old_doc = await self.db.replace(self.collection_name, search_query, obj_data)
+        await versions.bump(*self._scopes(obj_id, user_id))
+        if not old_doc:
+            return None
+        return self.model(**old_doc)
+
+    async def delete(self, obj_id: Optional[UUID] = None, user_id: Optional[UUID] = None):
+        """DELETE запрос для удаления данных.
+
+        На данным этапе считаем, что связка "пользователь + фильм" уникальна и
+        ничего лишнего мы не удалим. Можно добавить проверку на наличие записи,
+        но это лишний запрос в БД:
+
+        if not await self.get(obj_id, user_id):
+            raise DocNotFoundError('Запись не существует')
 
         Args:
           obj_id: идентификатор связанного объекта (фильма / обзора);
           user_id: идентификатор пользователя.
 
         """
-        query = {}
-        if obj_id:
-            query['obj_id'] = str(obj_id)
-        if user_id:
-            query['user_id'] = str(user_id)
-        return query
+        if self.buffer and obj_id and user_id:
+            await self.buffer.put(ugc_key(obj_id, user_id), None)
+            return
+        search_query = create_search_query(obj_id, user_id)
+        await self.db.delete(self.collection_name, search_query)
+        await versions.bump(*self._scopes(obj_id, user_id))
+
+    async def write_many(
+        self, user_id: UUID, operations: Sequence[UGCOperation],
+    ) -> list[Optional[str]]:
+        """Пакетная запись данных пользователя одним запросом к БД.
+
+        Операции с одним и тем же объектом объединяются, выполняется
+        последняя из них. Буфер отложенной записи не используется.
+
+        Args:
+          user_id: идентификатор пользователя;
+          operations: пары (идентификатор объекта, дополнительные данные
+          объекта), None вместо данных - удаление записи.
+
+        Returns:
+          Ошибки записи в порядке операций, None - операция выполнена.
+
+        Raises:
+          DBManagerError: БД недоступна.
+
+        """
+        keys = [ugc_key(obj_id, user_id) for obj_id, _ in operations]
+        changes: dict[UGCKey, Optional[dict]] = {}
+        for key, (obj_id, fields) in zip(keys, operations):
+            changes.pop(key, None)
+            if fields is not None:
+                fields = new_version(obj_id, user_id, fields)
+            changes[key] = fields
+        errors = await self.apply_batch(changes)
+        return [errors[op_key] for op_key in keys]
+
+    async def apply_batch(
+        self, changes: dict[UGCKey, Optional[dict]],
+    ) -> dict[UGCKey, Optional[str]]:
+        """Пакетная запись изменений одним запросом к БД.
+
+        Args:
+          changes: новые версии записей по ключам, None - удаление записи.
+
+        Returns:
+          Ошибки записи по ключам, None - запись выполнена.
+
+        Raises:
+          DBManagerError: БД недоступна.
+
+        """
+        keys = list(changes)
+        operations = [
+            BulkOperation(search=key_query(key), obj_data=changes[key])
+            for key in keys
+        ]
+        errors = await self.db.bulk_write(self.collection_name, operations)
+        await versions.bump(*[
+            scope
+            for key, error in zip(keys, errors) if error is None
+            for scope in self._scopes(*key)
+        ])
+        return dict(zip(keys, errors))
+
+    def _scopes(self, obj_id, user_id) -> list[Scope]:
+        """Объекты, версии которых изменяются при изменении записи."""
+        scopes = [(USER_SCOPE, user_id)]
+        if self.version_scope:
+            scopes.append((self.version_scope, obj_id))
+        return scopes
@@ -1,29 +1,244 @@
-"""Сервис для закладок пользователя."""
+"""Сервис для закладок пользователя.
+
+Место просмотра, о котором часто сообщает плеер, сначала записывается в
+Redis (services.progress) и периодически сбрасывается в коллекцию закладок
+пакетом. Поэтому при чтении закладки сначала проверяется Redis.
+
+"""
+import asyncio
+import logging
+from datetime import datetime
 from functools import lru_cache
+from typing import Optional, Sequence
 from uuid import UUID
 
 from fastapi import Depends
 
-from db_managers.abstract_manager import AbstractDBManager
+from db_managers.abstract_manager import AbstractDBManager, BulkOperation, DBManagerError
 from db_managers.mongo import get_db_manager
 from models.ugc_models import Bookmark
-from services.ugc.base_service import UGCService
+from services.progress import ProgressCache, progress_cache
+from services.ugc.base_service import UGCOperation, UGCService
+from services.ugc.queries import create_search_query
+from services.versions import USER_SCOPE, versions
+from settings import settings
+
+logger = logging.getLogger(__name__)
 
 
 class BookmarkService(UGCService):
     """Сервис для закладок пользователя."""
 
-    def create(
+    def __init__(
+        self,
+        model: type[Bookmark],
+        db: AbstractDBManager,
+        collection_name: str,
+        write_behind: bool = False,
+        progress: Optional[ProgressCache] = None,
+    ):
+        """Конструктор класса.
+
+        Args:
+          model: модель Bookmark (Pydantic) для валидации данных;
+          db: инициализированный менеджер для работы с БД;
+          collection_name: название таблицы (коллекции) БД;
+          write_behind: записывать изменения через буфер отложенной записи;
+          progress: кэш места просмотра в Redis.
+
+        """
+        super().__init__(
+            model=model, db=db, collection_name=collection_name, write_behind=write_behind,
+        )
+        self.progress = progress
+
+    async def get(self, obj_id: UUID, user_id: UUID):
+        """Переопределяем метод get, место просмотра сначала ищем в Redis."""
+        if self.progress:
+            bookmark = await self.progress.get(obj_id, user_id)
+            if bookmark:
+                return bookmark
+        return await super().get(obj_id, user_id)
+
+    async def create(
         self,
         obj_id: UUID,
         user_id: UUID,
         timestamp: int = 0,
     ):
-        """Переопределяем метод create, добавляем timestamp."""
-        return super().create(obj_id, user_id, timestamp=timestamp)
+        """Переопределяем метод create, добавляем timestamp.
+
+        Возвращает замененную закладку или None, если закладка создана.
+        Место просмотра в Redis удаляется, чтобы не заменить новую закладку
+        при следующем сбросе.
+
+        """
+        if self.progress:
+            await self.progress.delete(obj_id, user_id)
+        return await super().create(obj_id, user_id, timestamp=timestamp)
+
+    async def delete(self, obj_id: Optional[UUID] = None, user_id: Optional[UUID] = None):
+        """Переопределяем метод delete, удаляем место просмотра в Redis."""
+        if self.progress and obj_id and user_id:
+            await self.progress.delete(obj_id, user_id)
+        await super().delete(obj_id, user_id)
+
+    async def write_many(
+        self, user_id: UUID, operations: Sequence[UGCOperation],
+    ) -> list[Optional[str]]:
+        """Переопределяем метод write_many, удаляем места просмотра в Redis."""
+        if self.progress:
+            progress = self.progress
+            await asyncio.gather(*[
+                progress.delete(obj_id, user_id) for obj_id, _ in operations
+            ])
+        return await super().write_many(user_id, operations)
+
+    async def update_progress(self, obj_id: UUID, user_id: UUID, timestamp: int):
+        """Сохраняем место просмотра.
+
+        Место просмотра записывается в Redis и попадает в БД при следующем
+        сбросе. Если Redis недоступен, закладка записывается в БД сразу.
+        Закладка в ответе о фильме читается из Redis, поэтому версия
+        пользователя изменяется сразу.
+
+        Args:
+          obj_id: идентификатор фильма;
+          user_id: идентификатор пользователя;
+          timestamp: место просмотра.
+
+        """
+        bookmark = Bookmark(
+            obj_id=obj_id, user_id=user_id, timestamp=timestamp, date=datetime.now(),
+        )
+        if not self.progress or not await self.progress.set(bookmark):
+            await self.create(obj_id, user_id, timestamp=timestamp)
+            return
+        await versions.bump((USER_SCOPE, user_id))
+
+    async def flush_progress(self, batch_size: int) -> int:
+        """Записываем в БД все измененные места просмотра пакетами.
+
+        Args:
+          batch_size: максимальное кол-во записей в пакете.
+
+        Returns:
+          Кол-во записанных закладок.
+
+        """
+        if not self.progress:
+            return 0
+        writer = ProgressWriter(self.db, self.collection_name, self.progress)
+        return await writer.flush(batch_size)
+
+
+class ProgressWriter:
+    """Сброс мест просмотра из Redis в коллекцию закладок."""
+
+    def __init__(self, db: AbstractDBManager, collection_name: str, progress: ProgressCache):
+        """Конструктор класса.
+
+        Args:
+          db: инициализированный менеджер для работы с БД;
+          collection_name: название таблицы (коллекции) закладок;
+          progress: кэш места просмотра в Redis.
+
+        """
+        self.db = db
+        self.collection_name = collection_name
+        self.progress = progress
+
+    async def flush(self, batch_size: int) -> int:
+        """Записываем в БД все измененные места просмотра пакетами.
+
+        Пакеты извлекаются, пока множество измененных записей не опустеет.
+        Если БД недоступна, записи пакета возвращаются в множество
+        измененных, а сброс прекращается до следующего периода.
+
+        Args:
+          batch_size: максимальное кол-во записей в пакете.
+
+        Returns:
+          Кол-во записанных закладок.
+
+        """
+        flushed = 0
+        while True:
+            bookmarks = await self.progress.pop_dirty(batch_size)
+            if bookmarks is None:
+                break
+            try:
+                flushed += await self._write(bookmarks)
+            except DBManagerError as exc:
+                logger.error('Progress flush failed: {0}'.format(exc))
+                await self.progress.mark_dirty(bookmarks)
+                break
+        return flushed
+
+    async def _write(self, bookmarks: list[Bookmark]) -> int:
+        """Записываем пакет мест просмотра одним запросом.
+
+        Место просмотра заменяет только более старую закладку, поэтому
+        закладка, записанная create после сохранения места просмотра, не
+        заменяется (операция завершается ошибкой уникального индекса).
+        Закладки, удаленные во время сброса, удаляются повторно.
+
+        """
+        if not bookmarks:
+            return 0
+        operations = [
+            BulkOperation(
+                search=_progress_query(bookmark, '$lt'),
+                obj_data=dict(
+                    create_search_query(bookmark.obj_id, bookmark.user_id),
+                    timestamp=bookmark.timestamp,
+                    date=bookmark.date,
+                ),
+            )
+            for bookmark in bookmarks
+        ]
+        errors = await self.db.bulk_write(self.collection_name, operations)
+        written = [bookmark for bookmark, error in zip(bookmarks, errors) if error is None]
+        deleted = await self.progress.deleted(written)
+        await asyncio.gather(*[
+            self.db.delete(self.collection_name, _progress_query(bookmark, '$lte'))
+            for bookmark in deleted
+        ])
+        return len(written)
+
+
+def _progress_query(bookmark: Bookmark, operator: str) -> dict:
+    """Условие поиска закладки с датой раньше (operator) даты места просмотра."""
+    search = create_search_query(bookmark.obj_id, bookmark.user_id)
+    search['date'] = {operator: bookmark.date}
+    return search
+
+
+async def flush_progress_periodically(service: BookmarkService):
+    """Периодический сброс мест просмотра из Redis в БД.
+
+    Args:
+      service: сервис закладок.
+
+    """
+    while True:
+        await asyncio.sleep(settings.progress_flush_interval)
+        try:
+            flushed = await service.flush_progress(settings.progress_flush_batch_size)
+        except Exception:
+            logger.exception('Progress flush failed')
+            continue
+        if flushed:
+            logger.debug('Flushed {0} playback positions'.format(flushed))
 
 
 @lru_cache()
 def get_bookmark_service(db: AbstractDBManager = Depends(get_db_manager)):
     """DI для FastAPI. Получаем сервис лайков для закладок."""
-    return BookmarkService(model=Bookmark, db=db, collection_name='bookmarks')
+    return BookmarkService(
+        model=Bookmark,
+        db=db,
+        collection_name='bookmarks',
+        write_behind=settings.write_behind,
+        progress=progress_cache,
+    )
@@ -1,40 +1,269 @@
 """Сервис для лайктов / рейтинга.
 
 Лайки для фильмов и для обзоров представлены одним сервисом, но данные будут
-храниться в разных коллекциях.
+храниться в разных коллекциях. Счетчики рейтинга изменяются вместе с
+оценками (services.ugc.ratings), как и кэш и версии связанных объектов
+(services.ugc.related).
 
 """
+import asyncio
 from functools import lru_cache
+from typing import Optional, Sequence
 from uuid import UUID
 
 from fastapi import Depends
 
-from db_managers.abstract_manager import AbstractDBManager
+from db_managers.abstract_manager import AbstractDBManager, DBManagerError, Index
 from db_managers.mongo import get_db_manager
 from models.ugc_models import Like
+from services.cache import AggregateCache, film_cache, review_cache
 from services.ugc.base_service import UGCService
+from services.ugc.queries import UGCKey, create_search_query, key_query, ugc_key
+from services.ugc.ratings import RATING_INDEXES, RatingCounters, rating_delta
+from services.ugc.related import AUTHOR_REVIEW, REVIEW_PARENTS, RelatedObjects, invalidate_related
+from services.versions import FILM_SCOPE, REVIEW_SCOPE, versions
+from settings import settings
+
+BACKFILL_BATCH_SIZE = 1000
+BACKFILL_SORT = (('obj_id', 1), ('user_id', 1))
 
 
 class LikeService(UGCService):
     """Сервис для лайков / рейтинга."""
 
-    def create(
+    def __init__(
+        self,
+        model: type[Like],
+        db: AbstractDBManager,
+        collection_name: str,
+        rating_collection_name: str,
+        cache: Optional[AggregateCache] = None,
+        obj_collection_name: Optional[str] = None,
+        obj_id_field: str = 'obj_id',
+        write_behind: bool = False,
+        version_scope: Optional[str] = None,
+        related: Sequence[RelatedObjects] = (),
+    ):
+        """Конструктор класса.
+
+        Args:
+          model: модель Like (Pydantic) для валидации данных;
+          db: инициализированный менеджер для работы с БД;
+          collection_name: название таблицы (коллекции) БД;
+          rating_collection_name: название таблицы (коллекции) со счетчиками рейтинга;
+          cache: кэш объектов (фильмов / обзоров), который сбрасывается при записи;
+          obj_collection_name: таблица (коллекция) оцениваемых объектов, в
+          записях которой поддерживаются поля likes_sum, likes_count и likes_avg;
+          obj_id_field: поле идентификатора в таблице оцениваемых объектов;
+          write_behind: записывать оценки через буфер отложенной записи;
+          version_scope: вид оцениваемых объектов для счетчиков версий (ETag);
+          related: объекты, ответ API которых зависит от оценок.
+
+        """
+        super().__init__(
+            model=model,
+            db=db,
+            collection_name=collection_name,
+            write_behind=write_behind,
+            version_scope=version_scope,
+        )
+        self.ratings = RatingCounters(
+            db=db,
+            collection_name=rating_collection_name,
+            cache=cache,
+            obj_collection_name=obj_collection_name,
+            obj_id_field=obj_id_field,
+        )
+        self.related = related
+
+    def all_indexes(self) -> dict[str, Sequence[Index]]:
+        """Добавляем индексы таблицы (коллекции) со счетчиками рейтинга."""
+        indexes = super().all_indexes()
+        indexes[self.ratings.collection_name] = RATING_INDEXES
+        return indexes
+
+    async def create(
         self,
         obj_id: UUID,
         user_id: UUID,
         score=10,
     ):
-        """Переопределяем метод create, score для лайка - 10, для дизлайка - 0."""
-        return super().create(obj_id, user_id, score=score)
+        """Переопределяем метод create, score для лайка - 10, для дизлайка - 0.
+
+        При замене оценки счетчики рейтинга уменьшаются на старую оценку и
+        увеличиваются на новую. Старая оценка возвращается из той же
+        операции записи, что и новая.
+
+        При отложенной записи счетчики изменяются при сбросе буфера.
+
+        """
+        if self.buffer:
+            return await super().create(obj_id, user_id, score=score)
+        old_like = await super().create(obj_id, user_id, score=score)
+
+        delta = rating_delta(score)
+        if old_like is not None:
+            old_delta = rating_delta(old_like.score, sign=-1)
+            delta = {field: delta[field] + old_delta[field] for field in delta}
+        await self.ratings.update(obj_id, delta)
+        await invalidate_related(self.db, self.related, [ugc_key(obj_id, user_id)])
+        return old_like
+
+    async def delete(self, obj_id: Optional[UUID] = None, user_id: Optional[UUID] = None):
+        """Переопределяем метод delete, уменьшаем счетчики рейтинга.
+
+        Запись удаляется и возвращается одним запросом, поэтому при
+        одновременных запросах счетчики уменьшатся только один раз.
+
+        """
+        if self.buffer:
+            await super().delete(obj_id, user_id)
+            return
+        old_doc = await self.db.delete_one(
+            self.collection_name, create_search_query(obj_id, user_id),
+        )
+        if not old_doc:
+            return
+        old_key = (old_doc['obj_id'], old_doc['user_id'])
+        delta = rating_delta(old_doc['score'], sign=-1)
+        await self.ratings.update(obj_id, delta)
+        await versions.bump(*self._scopes(obj_id, user_id))
+        await invalidate_related(self.db, self.related, [old_key])
+
+    async def apply_batch(
+        self, changes: dict[UGCKey, Optional[dict]],
+    ) -> dict[UGCKey, Optional[str]]:
+        """Переопределяем метод apply_batch, изменяем счетчики рейтинга.
+
+        Каждая оценка заменяется (удаляется) отдельным атомарным запросом,
+        который возвращает старую оценку, как в create и delete. Изменения
+        счетчиков строятся по этим оценкам, поэтому одновременная запись той
+        же оценки не учитывается дважды, а повторное применение пакета не
+        изменяет счетчики. Одновременно выполняется не больше
+        settings.batch_write_concurrency запросов, чтобы пакет не занимал
+        все соединения с БД. Изменения счетчиков всех объектов записываются
+        одним пакетом.
+
+        Args:
+          changes: новые версии оценок по ключам, None - удаление оценки.
+
+        Returns:
+          Ошибки записи по ключам, None - оценка записана. Счетчики изменены
+          только для записанных оценок.
+
+        Raises:
+          DBManagerError: БД недоступна, не записана ни одна оценка.
+
+        """
+        keys = list(changes)
+        semaphore = asyncio.Semaphore(settings.batch_write_concurrency)
+        written_docs = await asyncio.gather(
+            *[self._write_change(key, changes[key], semaphore) for key in keys],
+        )
+        db_error: Optional[DBManagerError] = None
+        errors: dict[UGCKey, Optional[str]] = dict.fromkeys(keys)
+        written = []
+        deltas: dict[str, dict] = {}
+        for key, (old_doc, error) in zip(keys, written_docs):
+            if error is not None:
+                db_error = error
+                errors[key] = str(error)
+                continue
+            written.append(key)
+            change = changes[key]
+            obj_deltas = (
+                rating_delta(change['score'] if change else None),
+                rating_delta(old_doc['score'] if old_doc else None, sign=-1),
+                deltas.get(key[0], rating_delta(None)),
+            )
+            deltas[key[0]] = {
+                field: sum(delta[field] for delta in obj_deltas) for field in obj_deltas[0]
+            }
+        if db_error is not None and not written:
+            raise db_error
+        await versions.bump(*[
+            scope for written_key in written for scope in self._scopes(*written_key)
+        ])
+        await self.ratings.update_many(deltas)
+        await invalidate_related(self.db, self.related, written)
+        return errors
+
+    async def backfill_ratings(self) -> int:
+        """Пересчитываем счетчики рейтинга объектов по коллекции оценок.
+
+        Оценки читаются по уникальному индексу (obj_id, user_id), поэтому
+        оценки одного объекта идут подряд, а в памяти находятся счетчики не
+        более BACKFILL_BATCH_SIZE объектов. Счетчики заменяются пакетами.
+        Запись не атомарна относительно одновременных изменений оценок,
+        поэтому команду нужно выполнять до начала чтения рейтинга из
+        счетчиков, пока оценки не изменяются.
+
+        Returns:
+          Кол-во объектов с оценками.
+
+        """
+        total = 0
+        batch: dict[str, dict] = {}
+        docs = self.db.iterate(
+            self.collection_name, {}, sort=list(BACKFILL_SORT), batch_size=BACKFILL_BATCH_SIZE,
+        )
+        async for doc in docs:
+            obj_id = doc['obj_id']
+            if obj_id not in batch and len(batch) >= BACKFILL_BATCH_SIZE:
+                total += await self.ratings.replace_many(batch)
+                batch = {}
+            counters = batch.setdefault(obj_id, rating_delta(None))
+            for field, field_delta in rating_delta(doc['score']).items():
+                counters[field] += field_delta
+        return total + await self.ratings.replace_many(batch)
+
+    async def _write_change(
+        self, key: UGCKey, change: Optional[dict], semaphore: asyncio.Semaphore,
+    ) -> tuple[Optional[dict], Optional[DBManagerError]]:
+        """Записываем (удаляем) оценку, возвращаем старую запись и ошибку БД.
+
+        Перехватывается только DBManagerError, остальные исключения
+        прерывают пакет до изменения счетчиков.
+
+        """
+        async with semaphore:
+            try:
+                if change is None:
+                    old_doc = await self.db.delete_one(self.collection_name, key_query(key))
+                else:
+                    old_doc = await self.db.replace(self.collection_name, key_query(key), change)
+            except DBManagerError as exc:
+                return None, exc
+        return old_doc, None
 
 
 @lru_cache()
 def get_like_service(db: AbstractDBManager = Depends(get_db_manager)):
     """DI для FastAPI. Получаем сервис лайков для фильмов."""
-    return LikeService(model=Like, db=db, collection_name='like')
+    return LikeService(
+        model=Like,
+        db=db,
+        collection_name='like',
+        rating_collection_name='like_rating',
+        cache=film_cache,
+        write_behind=settings.write_behind,
+        version_scope=FILM_SCOPE,
+        related=(AUTHOR_REVIEW,),
+    )
 
 
 @lru_cache()
 def get_review_like_service(db: AbstractDBManager = Depends(get_db_manager)):
     """DI для FastAPI. Получаем сервис лайков для обзоров."""
-    return LikeService(model=Like, db=db, collection_name='review_like')
+    return LikeService(
+        model=Like,
+        db=db,
+        collection_name='review_like',
+        rating_collection_name='review_like_rating',
+        cache=review_cache,
+        obj_collection_name='review',
+        obj_id_field='review_id',
+        write_behind=settings.write_behind,
+        version_scope=REVIEW_SCOPE,
+        related=(REVIEW_PARENTS,),
+    )
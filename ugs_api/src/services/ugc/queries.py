@@ -0,0 +1,50 @@
+"""Условия поиска и ключи записей UGS сервисов."""
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+# Ключ записи для пакетной записи: (obj_id, user_id).
+UGCKey = tuple[str, str]
+
+
+def create_search_query(obj_id: Optional[UUID], user_id: Optional[UUID]) -> dict:
+    """Для простоты конвертации в bson приводим UUID к строке.
+
+    Альтернатива - bson.Binary.from_uuid().
+
+    Args:
+      obj_id: идентификатор связанного объекта (фильма / обзора);
+      user_id: идентификатор пользователя.
+
+    """
+    query = {}
+    if obj_id:
+        query['obj_id'] = str(obj_id)
+    if user_id:
+        query['user_id'] = str(user_id)
+    return query
+
+
+def new_version(obj_id: UUID, user_id: UUID, fields: dict) -> dict:
+    """Новая версия записи с датой изменения.
+
+    Args:
+      obj_id: идентификатор связанного объекта (фильма / обзора);
+      user_id: идентификатор пользователя;
+      fields: дополнительные данные объекта.
+
+    """
+    obj_data = dict(create_search_query(obj_id, user_id), **fields)
+    obj_data['date'] = datetime.now()
+    return obj_data
+
+
+def ugc_key(obj_id: UUID, user_id: UUID) -> UGCKey:
+    """Ключ записи для пакетной записи."""
+    return str(obj_id), str(user_id)
+
+
+def key_query(key: UGCKey) -> dict:
+    """Условие поиска записи по ключу пакетной записи."""
+    obj_id, user_id = key
+    return {'obj_id': obj_id, 'user_id': user_id}
@@ -0,0 +1,206 @@
+"""Счетчики рейтинга оцениваемых объектов (фильмов / обзоров).
+
+Рейтинг объекта хранится в отдельной коллекции в виде счетчиков (сумма и
+кол-во оценок, кол-во лайков и дизлайков), которые изменяются при каждой
+записи или удалении оценки. Для обзоров сумма, кол-во и средняя оценка
+дополнительно хранятся в самом обзоре, чтобы сортировать по ним список
+обзоров без объединения коллекций.
+
+"""
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import Optional, Sequence
+from uuid import UUID
+
+from db_managers.abstract_manager import AbstractDBManager, BulkOperation, Index
+from models.ugc_models import Rating
+from services.cache import AggregateCache
+
+logger = logging.getLogger(__name__)
+
+LIKE_SCORE = 10
+DISLIKE_SCORE = 0
+
+RATING_INDEXES = (
+    Index(fields=(('obj_id', 1),), unique=True),
+)
+
+OBJ_LIKES_FIELDS = (('sum', 'likes_sum'), ('count', 'likes_count'))
+OBJ_LIKES_AVERAGES = MappingProxyType({'likes_avg': ('likes_sum', 'likes_count')})
+
+
+def rating_delta(score: Optional[int], sign: int = 1) -> dict:
+    """Изменение счетчиков рейтинга при добавлении (удалении) одной оценки.
+
+    Args:
+      score: оценка, None - оценки нет и счетчики не меняются;
+      sign: 1 - оценка добавлена, -1 - оценка удалена.
+
+    """
+    if score is None:
+        return {'sum': 0, 'count': 0, 'likes': 0, 'dislikes': 0}
+    return {
+        'sum': sign * score,
+        'count': sign,
+        'likes': sign if score == LIKE_SCORE else 0,
+        'dislikes': sign if score == DISLIKE_SCORE else 0,
+    }
+
+
+class RatingCounters:
+    """Счетчики рейтинга объектов одного вида."""
+
+    def __init__(
+        self,
+        db: AbstractDBManager,
+        collection_name: str,
+        cache: Optional[AggregateCache] = None,
+        obj_collection_name: Optional[str] = None,
+        obj_id_field: str = 'obj_id',
+    ):
+        """Конструктор класса.
+
+        Args:
+          db: инициализированный менеджер для работы с БД;
+          collection_name: название таблицы (коллекции) со счетчиками рейтинга;
+          cache: кэш объектов (фильмов / обзоров), который сбрасывается при записи;
+          obj_collection_name: таблица (коллекция) оцениваемых объектов, в
+          записях которой поддерживаются поля likes_sum, likes_count и likes_avg;
+          obj_id_field: поле идентификатора в таблице оцениваемых объектов.
+
+        """
+        self.db = db
+        self.collection_name = collection_name
+        self.cache = cache
+        self.obj_collection_name = obj_collection_name
+        self.obj_id_field = obj_id_field
+
+    async def get(self, obj_id: UUID) -> Rating:
+        """Получаем счетчики рейтинга объекта одним запросом.
+
+        Args:
+          obj_id: идентификатор объекта (фильма / обзора).
+
+        """
+        doc = await self.db.get(self.collection_name, {'obj_id': str(obj_id)})
+        if not doc:
+            return Rating(obj_id=obj_id)
+        return Rating(**doc)
+
+    async def get_many(self, obj_ids: Sequence[UUID]) -> list[Rating]:
+        """Получаем счетчики рейтинга нескольких объектов одним запросом.
+
+        Args:
+          obj_ids: идентификаторы объектов, порядок сохраняется.
+
+        """
+        docs = await self.db.get_many(
+            self.collection_name, [{'obj_id': str(obj_id)} for obj_id in obj_ids],
+        )
+        ratings = {doc['obj_id']: Rating(**doc) for doc in docs}
+        return [ratings.get(str(obj_id), Rating(obj_id=obj_id)) for obj_id in obj_ids]
+
+    async def update(self, obj_id: Optional[UUID], delta: dict):
+        """Применяем изменения к счетчикам рейтинга и сбрасываем кэш объекта.
+
+        Кэш сбрасывается и без изменения счетчиков: при замене оценки такой
+        же оценкой изменяется список последних оценок в карточке объекта.
+
+        Args:
+          obj_id: идентификатор объекта;
+          delta: изменения счетчиков (см. rating_delta).
+
+        """
+        updates = []
+        if any(delta.values()):
+            updates.append(
+                self.db.increment(self.collection_name, {'obj_id': str(obj_id)}, delta),
+            )
+        if updates and self.obj_collection_name:
+            updates.append(self._update_obj_likes(obj_id, delta))
+        await asyncio.gather(*updates)
+        if self.cache:
+            await self.cache.invalidate(obj_id)
+
+    async def update_many(self, deltas: dict[str, dict]):
+        """Пакетное изменение счетчиков рейтинга нескольких объектов.
+
+        Кэш сбрасывается для всех объектов, в том числе с нулевым изменением
+        счетчиков (см. update).
+
+        Args:
+          deltas: изменения счетчиков по идентификаторам объектов.
+
+        """
+        changed = {
+            obj_id: delta
+            for obj_id, delta in deltas.items()
+            if any(delta.values())
+        }
+        updates = []
+        if changed:
+            updates.append(self.db.bulk_write(self.collection_name, [
+                BulkOperation(search={'obj_id': obj_id}, increment=delta)
+                for obj_id, delta in changed.items()
+            ]))
+        if changed and self.obj_collection_name:
+            updates.append(self.db.bulk_write(self.obj_collection_name, [
+                BulkOperation(
+                    search={self.obj_id_field: obj_id},
+                    increment=_obj_likes_fields(delta),
+                    averages=OBJ_LIKES_AVERAGES,
+                    upsert=False,
+                )
+                for obj_id, delta in changed.items()
+            ]))
+        for errors in await asyncio.gather(*updates):
+            _log_errors(errors)
+        if self.cache:
+            await self.cache.invalidate(*[UUID(obj_id) for obj_id in deltas])
+
+    async def replace_many(self, ratings: dict[str, dict]) -> int:
+        """Заменяем счетчики рейтинга нескольких объектов одним пакетом.
+
+        Args:
+          ratings: счетчики по идентификаторам объектов.
+
+        Returns:
+          Кол-во объектов.
+
+        """
+        errors = await self.db.bulk_write(self.collection_name, [
+            BulkOperation(search={'obj_id': obj_id}, obj_data=dict(counters, obj_id=obj_id))
+            for obj_id, counters in ratings.items()
+        ])
+        _log_errors(errors)
+        return len(ratings)
+
+    async def _update_obj_likes(self, obj_id: Optional[UUID], delta: dict):
+        """Изменяем сумму, кол-во и среднюю оценку в записи объекта.
+
+        Запись объекта не создается, если ее нет (например, обзор удален).
+
+        """
+        await self.db.increment(
+            str(self.obj_collection_name),
+            {self.obj_id_field: str(obj_id)},
+            _obj_likes_fields(delta),
+            averages=OBJ_LIKES_AVERAGES,
+            upsert=False,
+        )
+
+
+def _obj_likes_fields(delta: dict) -> dict:
+    """Изменения полей likes_sum и likes_count записи объекта."""
+    return {
+        obj_field: delta[rating_field]
+        for rating_field, obj_field in OBJ_LIKES_FIELDS
+    }
+
+
+def _log_errors(errors: list[Optional[str]]):
+    """Логируем ошибки пакетного изменения счетчиков."""
+    failed = [error for error in errors if error]
+    if failed:
+        logger.error('Failed to update {0} ratings: {1}'.format(len(failed), failed[0]))
@@ -0,0 +1,93 @@
+"""Объекты, ответ API которых зависит от оценок, но не является их объектом.
+
+Например, в карточке фильма есть средняя оценка лайков обзоров, а в
+карточке обзора - оценка фильма автором обзора. При записи оценки кэш и
+версии таких объектов тоже изменяются.
+
+"""
+import asyncio
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Sequence
+from uuid import UUID
+
+from db_managers.abstract_manager import AbstractDBManager
+from services.cache import film_cache, review_cache
+from services.ugc.base_service import UGCKey
+from services.versions import FILM_SCOPE, REVIEW_SCOPE, USER_SCOPE, versions
+from settings import settings
+
+
+@dataclass(frozen=True)
+class RelatedObjects:
+    """Связанные с оценками объекты одной таблицы (коллекции).
+
+    Args:
+      collection_name: таблица (коллекция) связанных объектов;
+      search_fields: пары (поле связанного объекта, поле оценки obj_id / user_id);
+      scope_fields: пары (поле идентификатора в связанном объекте, вид объекта
+      для счетчиков версий).
+
+    """
+
+    collection_name: str
+    search_fields: tuple[tuple[str, str], ...]
+    scope_fields: tuple[tuple[str, str], ...]
+
+    def query(self, key: UGCKey) -> dict:
+        """Условие поиска связанного объекта по ключу оценки."""
+        like_fields = dict(zip(('obj_id', 'user_id'), key))
+        return {field: like_fields[like_field] for field, like_field in self.search_fields}
+
+
+# Обзор, лайки которого записаны: его фильм и автор.
+REVIEW_PARENTS = RelatedObjects(
+    collection_name='review',
+    search_fields=(('review_id', 'obj_id'),),
+    scope_fields=(('obj_id', FILM_SCOPE), ('user_id', USER_SCOPE)),
+)
+# Обзор автора оценки фильма: в нем показывается оценка фильма автором.
+AUTHOR_REVIEW = RelatedObjects(
+    collection_name='review',
+    search_fields=(('obj_id', 'obj_id'), ('user_id', 'user_id')),
+    scope_fields=(('review_id', REVIEW_SCOPE),),
+)
+SCOPE_CACHES = MappingProxyType({FILM_SCOPE: film_cache, REVIEW_SCOPE: review_cache})
+
+
+async def invalidate_related(
+    db: AbstractDBManager, related: Sequence[RelatedObjects], keys: Sequence[UGCKey],
+):
+    """Сбрасываем кэш и изменяем версии объектов, связанных с оценками.
+
+    Args:
+      db: менеджер для работы с БД;
+      related: связанные объекты;
+      keys: ключи записанных оценок.
+
+    """
+    if not keys or not (settings.etag or settings.aggregate_cache):
+        return
+    await asyncio.gather(*[
+        _invalidate_objects(db, related_objects, keys) for related_objects in related
+    ])
+
+
+async def _invalidate_objects(
+    db: AbstractDBManager, related: RelatedObjects, keys: Sequence[UGCKey],
+):
+    """Находим связанные объекты одним запросом, сбрасываем их кэш и версии."""
+    docs = await db.get_many(
+        related.collection_name, [related.query(key) for key in keys],
+    )
+    scope_ids: dict[str, list[UUID]] = {scope: [] for _, scope in related.scope_fields}
+    for doc in docs:
+        for id_field, id_scope in related.scope_fields:
+            scope_ids[id_scope].append(UUID(doc[id_field]))
+    await asyncio.gather(*[
+        SCOPE_CACHES[scope].invalidate(*obj_ids)
+        for scope, obj_ids in scope_ids.items() if scope in SCOPE_CACHES
+    ])
+    await versions.bump(*[
+        (scope, obj_id) for scope, obj_ids in scope_ids.items() for obj_id in obj_ids
+    ])
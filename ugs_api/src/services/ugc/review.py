@@ -1,31 +1,151 @@
 """Сервис для обзоров (рецензий)."""
+import asyncio
 from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, Sequence
 from uuid import UUID, uuid4
 
 from fastapi import Depends
 
-from db_managers.abstract_manager import AbstractDBManager
+from db_managers.abstract_manager import AbstractDBManager, Index
 from db_managers.mongo import get_db_manager
 from models.ugc_models import Review
-from services.ugc.base_service import UGCService
+from services.cache import AggregateCache, film_cache, review_cache
+from services.ugc.base_service import UGC_INDEXES, UGCService
+from services.ugc.queries import create_search_query
+from services.versions import FILM_SCOPE, REVIEW_SCOPE, versions
 
 MAX_PAGE_SIZE = 9999
 
+REVIEW_INDEXES = (
+    *UGC_INDEXES,
+    Index(fields=(('review_id', 1),), unique=True),
+    Index(
+        fields=(('obj_id', 1), ('likes_avg', -1), ('_id', -1)),
+    ),
+    Index(
+        fields=(('obj_id', 1), ('likes_sum', -1), ('_id', -1)),
+    ),
+)
+
+# Сортировки по рейтингу обзора и соответствующие им поля записи обзора.
+SORT_FIELDS = MappingProxyType({'avg': 'likes_avg', 'sum': 'likes_sum'})
+BACKFILL_PAGE_SIZE = 1000
+
 
 class ReviewService(UGCService):
     """Сервис для обзоров (рецензий)."""
 
-    def create(
+    def __init__(
+        self,
+        model: type[Review],
+        db: AbstractDBManager,
+        collection_name: str,
+        indexes: Sequence[Index] = REVIEW_INDEXES,
+        film_cache: Optional[AggregateCache] = None,
+        review_cache: Optional[AggregateCache] = None,
+    ):
+        """Конструктор класса.
+
+        Args:
+          model: модель Review (Pydantic) для валидации данных;
+          db: инициализированный менеджер для работы с БД;
+          collection_name: название таблицы (коллекции) БД;
+          indexes: индексы таблицы (коллекции);
+          film_cache: кэш фильмов, содержащих последние обзоры;
+          review_cache: кэш обзоров.
+
+        """
+        super().__init__(
+            model=model,
+            db=db,
+            collection_name=collection_name,
+            indexes=indexes,
+            version_scope=FILM_SCOPE,
+        )
+        self.film_cache = film_cache
+        self.review_cache = review_cache
+
+    async def create(
         self,
         obj_id: UUID,
         user_id: UUID,
         title: str = '',
         text: str = '',
     ):
-        """Переопределяем метод create, добавляя поля title и text."""
-        return super().create(
+        """Переопределяем метод create, добавляя поля title и text.
+
+        Возвращает замененный обзор или None, если обзор создан.
+
+        """
+        old_review = await super().create(
             obj_id, user_id, title=title, text=text, review_id=str(uuid4()),
         )
+        await self._invalidate(obj_id, old_review)
+        return old_review
+
+    async def delete(self, obj_id: Optional[UUID] = None, user_id: Optional[UUID] = None):
+        """Переопределяем метод delete, сбрасываем кэш фильма и обзора."""
+        old_doc = await self.db.delete_one(
+            self.collection_name, create_search_query(obj_id, user_id),
+        )
+        if old_doc:
+            await self._invalidate(obj_id, self.model(**old_doc))
+            await versions.bump(*self._scopes(obj_id, user_id))
+
+    async def search_page(
+        self,
+        obj_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None,
+        page_size: int = 10,
+        page_number: int = 1,
+        sort: str = '_id',
+        after: Optional[str] = None,
+    ) -> tuple[list, Optional[str]]:
+        """Переопределяем метод search_page, добавляя сортировки avg и sum.
+
+        Сортировка по рейтингу выполняется по полям likes_avg и likes_sum
+        записи обзора, для которых есть индексы.
+
+        """
+        sort_field = sort.lstrip('-')
+        sort = sort.replace(sort_field, SORT_FIELDS.get(sort_field, sort_field))
+        return await super().search_page(
+            obj_id, user_id, page_size, page_number, sort, after,
+        )
+
+    async def backfill_likes(self, like_collection_name: str) -> int:
+        """Заполняем поля likes_sum, likes_count и likes_avg всех обзоров.
+
+        Значения считаются по коллекции лайков. Запись значений не атомарна
+        относительно одновременных изменений лайков, поэтому команду лучше
+        выполнять до начала их записи.
+
+        Args:
+          like_collection_name: название таблицы (коллекции) лайков обзоров.
+
+        Returns:
+          Кол-во обработанных обзоров.
+
+        """
+        total = 0
+        after = None
+        while True:
+            docs = await self.aggregate(
+                like_collection_name,
+                ['review_id', 'obj_id'],
+                'score',
+                page_size=BACKFILL_PAGE_SIZE,
+                sort='_id',
+                after=after,
+            )
+            await asyncio.gather(*[
+                _set_likes(self.db, self.collection_name, doc) for doc in docs
+            ])
+            total += len(docs)
+            after = self.make_cursor(docs, BACKFILL_PAGE_SIZE, '_id')
+            if not after:
+                return total
 
     async def get_by_id(self, review_id: UUID):
         """GET запрос для поиска данных по id. Возвращает только одно значение.
@@ -41,8 +161,37 @@ class ReviewService(UGCService):
             return None
         return self.model(**doc)
 
+    async def _invalidate(self, obj_id: Optional[UUID], old_review: Optional[Review]):
+        """Сбрасываем кэш фильма и обзора и изменяем версию замененного (удаленного) обзора.
+
+        Версии фильма и автора обзора изменяются при записи обзора.
+
+        """
+        if self.film_cache:
+            await self.film_cache.invalidate(obj_id)
+        if self.review_cache and old_review:
+            await self.review_cache.invalidate(old_review.review_id)
+        if old_review:
+            await versions.bump((REVIEW_SCOPE, old_review.review_id))
+
+
+async def _set_likes(db: AbstractDBManager, collection_name: str, doc: dict):
+    """Записываем в обзор значения, посчитанные методом aggregate."""
+    await db.update(
+        collection_name,
+        {'review_id': doc['review_id']},
+        {'likes_sum': doc['sum'], 'likes_count': doc['count'], 'likes_avg': doc['avg']},
+    )
+
 
 @lru_cache()
 def get_review_service(db: AbstractDBManager = Depends(get_db_manager)):
     """DI для FastAPI. Получаем сервис лайков для обзоров."""
-    return ReviewService(model=Review, db=db, collection_name='review')
+    return ReviewService(
+        model=Review,
+        db=db,
+        collection_name='review',
+        indexes=REVIEW_INDEXES,
+        film_cache=film_cache,
+        review_cache=review_cache,
+    )
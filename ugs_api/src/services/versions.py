@@ -0,0 +1,134 @@
+"""Счетчики версий объектов для ETag и условных GET запросов.
+
+Версия объекта (фильма, обзора, пользователя) хранится в Redis и
+увеличивается сервисами UGC при каждой записи, которая меняет ответ API для
+этого объекта. ETag ответа составляется из версий всех объектов, от которых
+ответ зависит, поэтому проверить If-None-Match можно до запросов к Mongo.
+
+Запись оценки изменяет версии и связанных объектов, ответ которых от нее
+зависит (лайки обзоров в карточке фильма и в кабинете автора обзора, оценка
+фильма в карточке обзора), см. services.ugc.related.RelatedObjects.
+
+Счетчик создается со значением time_ns, а не с нуля, чтобы после потери
+данных Redis новые версии не совпали с уже выданными ETag.
+
+"""
+import hashlib
+import logging
+import time
+from typing import Optional, Union
+from uuid import UUID
+
+from fastapi import Request
+from redis.exceptions import RedisError
+
+from db import redis_db
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+ScopeId = Union[UUID, str, None]
+# Объект с версией: (вид объекта, идентификатор).
+Scope = tuple[str, ScopeId]
+
+FILM_SCOPE = 'film'
+REVIEW_SCOPE = 'review'
+USER_SCOPE = 'user'
+ETAG_DIGEST_SIZE = 12
+
+
+class VersionCounter:
+    """Счетчики версий объектов в Redis."""
+
+    def __init__(self, prefix: str = 'version'):
+        """Конструктор класса.
+
+        Args:
+          prefix: префикс ключей в Redis.
+
+        """
+        self.prefix = prefix
+
+    async def bump(self, *scopes: Scope):
+        """Увеличиваем версии объектов после записи.
+
+        Args:
+          scopes: объекты, None вместо идентификатора пропускаются.
+
+        """
+        keys = [self._key(scope) for scope in scopes if scope[1]]
+        if not keys or not self._enabled():
+            return
+        try:
+            async with redis_db.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, time.time_ns(), nx=True)
+                    pipe.incr(key)
+                await pipe.execute()
+        except RedisError as exc:
+            logger.warning('Version bump failed: {0!r}'.format(exc))
+
+    async def etag(self, *scopes: Scope) -> Optional[str]:
+        """Строгий ETag по версиям объектов, None - версии недоступны.
+
+        Args:
+          scopes: объекты, от которых зависит ответ.
+
+        """
+        if not self._enabled():
+            return None
+        keys = [self._key(scope) for scope in scopes]
+        try:
+            versions = await self._get_versions(keys)
+        except RedisError as exc:
+            logger.warning('Version get failed: {0!r}'.format(exc))
+            return None
+        tag_source = ':'.join(keys + versions).encode()
+        digest = hashlib.blake2b(tag_source, digest_size=ETAG_DIGEST_SIZE)
+        return '"{0}"'.format(digest.hexdigest())
+
+    async def _get_versions(self, keys: list[str]) -> list[str]:
+        """Версии объектов, отсутствующие счетчики создаются."""
+        versions = await redis_db.client.mget(keys)
+        if all(versions):
+            return list(versions)
+        async with redis_db.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, time.time_ns(), nx=True)
+            pipe.mget(keys)
+            pipe_results = await pipe.execute()
+        return list(pipe_results[-1])
+
+    def _key(self, scope: Scope) -> str:
+        return '{0}:{1}:{2}'.format(self.prefix, *scope)
+
+    def _enabled(self) -> bool:
+        return settings.etag and redis_db.client is not None
+
+
+def not_modified(request: Request, etag: Optional[str]) -> bool:
+    """Проверяем, совпадает ли ETag с одним из переданных в If-None-Match.
+
+    Args:
+      request: запрос клиента;
+      etag: текущий ETag ответа.
+
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if not etag or not if_none_match:
+        return False
+    client_tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return etag in client_tags or '*' in client_tags
+
+
+def etag_headers(etag: Optional[str]) -> dict[str, str]:
+    """Заголовки ответа с ETag, если он есть.
+
+    Args:
+      etag: текущий ETag ответа.
+
+    """
+    return {'ETag': etag} if etag else {}
+
+
+versions = VersionCounter()
@@ -0,0 +1,192 @@
+"""Буфер отложенной записи (write-behind) для UGC сервисов.
+
+Запись подтверждается клиенту сразу после помещения в буфер. Изменения одной
+записи (obj_id, user_id) объединяются, в БД попадает только последнее
+(last write wins). Буфер сбрасывается в БД пакетами через bulk_write, когда
+в нем накопилось settings.write_behind_batch_size записей или прошло
+settings.write_behind_interval секунд.
+
+Гарантии сохранности:
+  - при штатной остановке API буфер сбрасывается (close_buffers);
+  - при аварийном завершении процесса теряются записи, не сброшенные за
+    последние write_behind_interval секунд;
+  - если БД недоступна, записи остаются в буфере до следующей попытки,
+    а при превышении write_behind_max_pending запросы ждут сброса буфера;
+  - записи, отклоненные БД (например, из-за ошибки валидации), не
+    повторяются и учитываются в счетчике failed_items; это относится и к
+    оценкам, запрос которых не выполнен, если другие оценки пакета записаны;
+  - до сброса буфера запись не видна при чтении, в том числе ее автору.
+
+"""
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+from itertools import islice
+from typing import Awaitable, Callable, Hashable, Optional
+
+from db_managers.abstract_manager import DBManagerError
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Функция сброса: изменения по ключам -> ошибки по ключам (None - успешно).
+FlushFunc = Callable[[dict], Awaitable[dict]]
+
+
+@dataclass
+class BufferMetrics:
+    """Счетчики сброса буфера."""
+
+    flushes: int = 0
+    flushed_items: int = 0
+    failed_flushes: int = 0
+    failed_items: int = 0
+    last_flush_seconds: float = 0
+    max_flush_seconds: float = 0
+
+
+class WriteBuffer:
+    """Буфер отложенной записи с объединением изменений одной записи."""
+
+    def __init__(
+        self,
+        name: str,
+        flush_func: FlushFunc,
+        batch_size: int,
+        interval: float,
+        max_pending: int,
+    ):
+        """Конструктор класса.
+
+        Args:
+          name: название буфера для логов и метрик;
+          flush_func: функция пакетной записи изменений в БД;
+          batch_size: кол-во записей, при котором буфер сбрасывается сразу;
+          interval: максимальное время нахождения записи в буфере, сек.;
+          max_pending: кол-во записей, при котором запросы ждут сброса буфера.
+
+        """
+        self.name = name
+        self.flush_func = flush_func
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.metrics = BufferMetrics()
+        self._pending: dict = {}
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def put(self, key: Hashable, change):
+        """Помещаем изменение записи в буфер.
+
+        Args:
+          key: ключ записи, изменения одного ключа объединяются;
+          change: изменение записи, None - удаление записи.
+
+        """
+        self._pending.pop(key, None)
+        self._pending[key] = change
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        elif len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    async def flush(self):
+        """Сбрасываем в БД все накопленные изменения пакетами по batch_size.
+
+        При недоступности БД изменения возвращаются в буфер, если за время
+        сброса они не были заменены более новыми.
+
+        """
+        async with self._lock:
+            while self._pending:
+                keys = list(islice(self._pending, self.batch_size))
+                batch = {key: self._pending.pop(key) for key in keys}
+                if not await self._flush_batch(batch):
+                    _requeue(self._pending, batch)
+                    return
+
+    async def close(self):
+        """Останавливаем периодический сброс и сбрасываем остаток буфера."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self._pending:
+            logger.error('Write buffer {0}: {1} changes were lost'.format(self.name, len(self._pending)))
+
+    def stats(self) -> dict:
+        """Метрики буфера: глубина очереди и время сброса."""
+        return dict(asdict(self.metrics), depth=len(self._pending))
+
+    async def _run(self):
+        """Периодический сброс буфера по времени или по размеру."""
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass  # noqa: WPS420
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('Write buffer {0} flush failed'.format(self.name))
+
+    async def _flush_batch(self, batch: dict) -> bool:
+        """Запись одного пакета. False - БД недоступна, пакет не записан."""
+        metrics = self.metrics
+        started = time.perf_counter()
+        try:
+            errors = await self.flush_func(batch)
+        except DBManagerError as exc:
+            metrics.failed_flushes += 1
+            logger.error('Write buffer {0} flush failed: {1}'.format(self.name, exc))
+            return False
+
+        metrics.last_flush_seconds = time.perf_counter() - started
+        metrics.max_flush_seconds = max(metrics.max_flush_seconds, metrics.last_flush_seconds)
+        metrics.flushes += 1
+        failed = [key for key, error in errors.items() if error]
+        metrics.failed_items += len(failed)
+        metrics.flushed_items += len(batch) - len(failed)
+        if failed:
+            logger.error('Write buffer {0}: {1} changes rejected'.format(self.name, len(failed)))
+        return True
+
+
+def _requeue(pending: dict, batch: dict):
+    """Возвращаем в буфер изменения, не замененные более новыми."""
+    for key, change in batch.items():
+        pending.setdefault(key, change)
+
+
+write_buffers: list[WriteBuffer] = []
+
+
+def create_buffer(name: str, flush_func: FlushFunc) -> WriteBuffer:
+    """Создаем буфер с параметрами из настроек и регистрируем его для сброса при остановке.
+
+    Args:
+      name: название буфера для логов и метрик;
+      flush_func: функция пакетной записи изменений в БД.
+
+    """
+    buffer = WriteBuffer(
+        name,
+        flush_func,
+        batch_size=settings.write_behind_batch_size,
+        interval=settings.write_behind_interval,
+        max_pending=settings.write_behind_max_pending,
+    )
+    write_buffers.append(buffer)
+    return buffer
+
+
+async def close_buffers():
+    """Сбрасываем все буферы при остановке API."""
+    await asyncio.gather(*[buffer.close() for buffer in write_buffers])
@@ -1,4 +1,6 @@
 """Config for fast api."""
+from typing import Literal
+from uuid import UUID
 
 from pydantic import BaseModel, BaseSettings
 
@@ -9,6 +11,14 @@ class Logging(BaseModel):
     level_root: str = 'INFO'
     level_uvicorn: str = 'INFO'
     level_console: str = 'DEBUG'
+    # Логи пишутся в очередь, а в поток вывода - отдельным потоком.
+    queue: bool = True
+    queue_size: int = 10000
+    # При переполнении очереди отбрасывается новая (new) или самая старая (old) запись.
+    queue_drop: Literal['new', 'old'] = 'new'
+    # Формат JSON для Logstash вместо текстового.
+    json_format: bool = False
+    tag: str = 'ugs_api'
 
 
 class Settings(BaseSettings):
@@ -24,14 +34,62 @@ class Settings(BaseSettings):
 
     jwt_validate: bool = True
     auth_url: str = 'http://127.0.0.1:5000/api/v1/user/is_authenticated'
+    jwt_verify_mode: Literal['remote', 'local'] = 'remote'
+    jwt_public_keys: str | None = None
+    jwt_algorithms: list[str] = ['RS256']
+    jwt_keys_reload_interval: int = 30
     cache_expire: int = 600
+    token_local_cache_size: int = 10000
+    token_local_cache_expire: int = 30
+    token_revoke_channel: str = 'jwt_revoked'
+    auth_pool_size: int = 20
+    auth_timeout: float = 5.0
+    auth_max_tries: int = 3
+
+    aggregate_cache: bool = True
+    aggregate_cache_expire: int = 60
 
     MONGO_HOST = '127.0.0.1'
     MONGO_PORT = 27017
     MONGO_DB_NAME = 'ugc'
+    MONGO_CREATE_INDEXES = True
     DEFAULT_LIMIT = 10
     DEFAULT_OFFSET = 0
 
+    branch_timeout: float = 2.0
+
+    batch_max_size: int = 500
+    # Кол-во одновременных запросов к БД при пакетной записи оценок.
+    batch_write_concurrency: int = 10
+
+    progress_cache: bool = True
+    progress_expire: int = 86400
+    progress_flush_interval: float = 5.0
+    progress_flush_batch_size: int = 1000
+    ratings_max_ids: int = 100
+    export_batch_size: int = 500
+    export_chunk_size: int = 65536
+
+    metrics: bool = True
+
+    # Порог медленного запроса к Mongo, 0 - журнал отключен.
+    slow_query_ms: int = 100
+    # Доля медленных запросов, для которых выполняется explain, 0 - отключено.
+    slow_query_explain_rate: float = 0
+    slow_query_explain_verbosity: Literal['queryPlanner', 'executionStats'] = 'queryPlanner'
+    # Размер коллекции журнала в байтах (16 MiB).
+    slow_query_log_size: int = 16777216
+
+    etag: bool = True
+
+    write_behind: bool = False
+    write_behind_batch_size: int = 500
+    write_behind_interval: float = 0.5
+    write_behind_max_pending: int = 50000
+
+    admin_api: bool = False
+    admin_users: list[UUID] = []
+
     sentry_dsn: str | None = None
     traces_sample_rate: float = 1.0
 
@@ -1,5 +1,6 @@
 """Тесты работы закладок."""
 from http import HTTPStatus
+from uuid import uuid4
 
 import pytest
 from testdata import TEST_AUTH_TOKEN, TEST_FILM_ID, TEST_USER_ID
@@ -75,3 +76,42 @@ async def test_delete_bookmark(make_json_request):
 
     assert not response.body['bookmark']
     assert not response.body['bookmark']
+
+
+async def test_batch_bookmarks(make_json_request):
+    """Тестируем пакетную запись закладок с местом окончания просмотра."""
+    film_id = str(uuid4())
+    operations = [
+        {'film_id': film_id, 'timestamp': 60},
+        {'film_id': film_id, 'timestamp': 120},
+    ]
+    response = await make_json_request(
+        url='/api/v1/users/bookmarks/batch', json=operations, auth_token=TEST_AUTH_TOKEN,
+    )
+    assert response.status == HTTPStatus.OK
+    assert [item['status'] for item in response.body] == ['ok', 'ok']
+
+    response = await make_json_request(
+        url='/api/v1/films/{0}'.format(film_id), auth_token=TEST_AUTH_TOKEN, method='GET',
+    )
+    assert response.body['bookmark']['timestamp'] == 120
+
+
+async def test_update_progress(make_json_request):
+    """Тестируем сохранение места просмотра.
+
+    Место просмотра сначала записывается в Redis, но сразу видно в закладке.
+
+    """
+    film_id = str(uuid4())
+    url = '/api/v1/users/bookmarks/progress/{0}'.format(film_id)
+    for timestamp in (10, 20, 30):
+        response = await make_json_request(
+            url=url, params={'timestamp': timestamp}, auth_token=TEST_AUTH_TOKEN,
+        )
+        assert response.status == HTTPStatus.ACCEPTED
+
+    response = await make_json_request(
+        url='/api/v1/films/{0}'.format(film_id), auth_token=TEST_AUTH_TOKEN, method='GET',
+    )
+    assert response.body['bookmark']['timestamp'] == 30
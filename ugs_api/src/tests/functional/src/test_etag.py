@@ -0,0 +1,92 @@
+"""Тесты условных GET запросов (ETag / If-None-Match)."""
+from http import HTTPStatus
+from uuid import uuid4
+
+import pytest
+from testdata import make_auth_token
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_film_not_modified(make_json_request):
+    """Тестируем ответ 304 на запрос фильма с актуальным ETag.
+
+    После добавления лайка версия фильма изменяется и старый ETag больше
+    не совпадает.
+
+    """
+    auth_token = make_auth_token(str(uuid4()))
+    url = '/api/v1/films/{0}'.format(uuid4())
+    response = await make_json_request(url=url, auth_token=auth_token, method='GET')
+    assert response.status == HTTPStatus.OK
+    etag = response.headers['ETag']
+
+    response = await make_json_request(
+        url=url, auth_token=auth_token, method='GET', headers={'If-None-Match': etag},
+    )
+    assert response.status == HTTPStatus.NOT_MODIFIED
+    assert response.headers['ETag'] == etag
+
+    response = await make_json_request(url='{0}/add_like/'.format(url), auth_token=auth_token)
+    assert response.status == HTTPStatus.CREATED
+
+    response = await make_json_request(
+        url=url, auth_token=auth_token, method='GET', headers={'If-None-Match': etag},
+    )
+    assert response.status == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+    assert response.body['likes'] == 1
+
+
+async def test_my_account_not_modified(make_json_request):
+    """Тестируем ответ 304 на запрос личного кабинета и сброс ETag закладкой."""
+    auth_token = make_auth_token(str(uuid4()))
+    url = '/api/v1/users/my_account'
+    response = await make_json_request(url=url, auth_token=auth_token, method='GET')
+    etag = response.headers['ETag']
+
+    response = await make_json_request(
+        url=url, auth_token=auth_token, method='GET', headers={'If-None-Match': etag},
+    )
+    assert response.status == HTTPStatus.NOT_MODIFIED
+
+    response = await make_json_request(
+        url='/api/v1/users/bookmarks/add/{0}/'.format(uuid4()), auth_token=auth_token,
+    )
+    assert response.status == HTTPStatus.CREATED
+
+    response = await make_json_request(
+        url=url, auth_token=auth_token, method='GET', headers={'If-None-Match': etag},
+    )
+    assert response.status == HTTPStatus.OK
+    assert len(response.body['bookmarks']) == 1
+
+
+async def test_film_etag_changes_on_review_like(make_json_request):
+    """Тестируем изменение ETag фильма при лайке обзора из его карточки."""
+    auth_token = make_auth_token(str(uuid4()))
+    url = '/api/v1/films/{0}'.format(uuid4())
+    response = await make_json_request(
+        url='{0}/add_review/'.format(url),
+        params={'title': 'Title', 'text': 'Some_long_text'},
+        auth_token=auth_token,
+    )
+    assert response.status == HTTPStatus.CREATED
+
+    response = await make_json_request(url=url, auth_token=auth_token, method='GET')
+    etag = response.headers['ETag']
+    review_id = response.body['recent_reviews'][0]['review_id']
+
+    response = await make_json_request(
+        url='/api/v1/reviews/{0}/add_like'.format(review_id),
+        params={'score': 10},
+        auth_token=make_auth_token(str(uuid4())),
+    )
+    assert response.status == HTTPStatus.CREATED
+
+    response = await make_json_request(
+        url=url, auth_token=auth_token, method='GET', headers={'If-None-Match': etag},
+    )
+    assert response.status == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+    assert response.body['recent_reviews'][0]['likes_count'] == 1
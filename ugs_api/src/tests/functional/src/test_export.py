@@ -0,0 +1,41 @@
+"""Тесты выгрузки пользовательских данных."""
+import json
+from http import HTTPStatus
+from uuid import uuid4
+
+import pytest
+from testdata import make_auth_token
+
+from tests.functional.test_settings import test_settings
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.mark.parametrize('compress', ['false', 'true'])
+async def test_export_user_data(session, make_json_request, compress):
+    """Тестируем потоковую выгрузку всех данных пользователя в NDJSON.
+
+    В выгрузку попадают все записи пользователя, а не только последние 10.
+
+    """
+    auth_token = make_auth_token(str(uuid4()))
+    for _ in range(12):
+        response = await make_json_request(
+            url='/api/v1/films/{0}/add_like/'.format(uuid4()), auth_token=auth_token,
+        )
+        assert response.status == HTTPStatus.CREATED
+    response = await make_json_request(
+        url='/api/v1/users/bookmarks/add/{0}/'.format(uuid4()), auth_token=auth_token,
+    )
+    assert response.status == HTTPStatus.CREATED
+
+    url = test_settings.service_url + '/api/v1/users/my_account/export'
+    headers = {'Authorization': 'Bearer {0}'.format(auth_token)}
+    async with session.get(url, params={'gzip': compress}, headers=headers) as response:
+        assert response.status == HTTPStatus.OK
+        lines = (await response.read()).splitlines()
+
+    records = [json.loads(line) for line in lines]
+    types = [record['type'] for record in records]
+    assert types.count('like') == 12
+    assert types.count('bookmark') == 1
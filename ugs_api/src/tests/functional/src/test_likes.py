@@ -1,8 +1,9 @@
 """Тесты работы лайков."""
 from http import HTTPStatus
+from uuid import uuid4
 
 import pytest
-from testdata import TEST_AUTH_TOKEN, TEST_FILM_ID, TEST_USER_ID
+from testdata import TEST_AUTH_TOKEN, TEST_FILM_ID, TEST_USER_ID, make_auth_token
 
 pytestmark = pytest.mark.asyncio
 
@@ -103,3 +104,91 @@ async def test_delete_like(make_json_request):
     assert response.body['dislikes'] == 0
     assert response.body['absolute_rating'] is None
     assert response.body['average_rating'] is None
+
+
+async def test_batch_likes(make_json_request):
+    """Тестируем пакетную запись лайков.
+
+    Результат возвращается для каждой операции, операции с одним фильмом
+    объединяются, выполняется последняя из них.
+
+    """
+    liked_film, removed_film = str(uuid4()), str(uuid4())
+    operations = [
+        {'film_id': liked_film, 'score': 0},
+        {'film_id': removed_film, 'score': 10},
+        {'film_id': liked_film, 'score': 10},
+        {'film_id': removed_film, 'delete': True},
+    ]
+    response = await make_json_request(
+        url='/api/v1/films/likes/batch', json=operations, auth_token=TEST_AUTH_TOKEN,
+    )
+    assert response.status == HTTPStatus.OK
+    assert [item['status'] for item in response.body] == ['ok'] * len(operations)
+
+    response = await make_json_request(
+        url='/api/v1/films/{0}'.format(liked_film), auth_token=TEST_AUTH_TOKEN, method='GET',
+    )
+    assert response.body['likes'] == 1
+    assert response.body['dislikes'] == 0
+
+    response = await make_json_request(
+        url='/api/v1/films/{0}'.format(removed_film), auth_token=TEST_AUTH_TOKEN, method='GET',
+    )
+    assert not response.body['likes']
+
+
+async def test_batch_likes_validation(make_json_request):
+    response = await make_json_request(
+        url='/api/v1/films/likes/batch',
+        json=[{'film_id': str(uuid4()), 'score': 11}],
+        auth_token=TEST_AUTH_TOKEN,
+    )
+    assert response.status == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_film_ratings(make_json_request):
+    """Тестируем получение рейтинга нескольких фильмов одним запросом."""
+    liked_film, new_film = str(uuid4()), str(uuid4())
+    response = await make_json_request(
+        url='/api/v1/films/{0}/add_like/'.format(liked_film), params={'score': 10}, auth_token=TEST_AUTH_TOKEN,
+    )
+    assert response.status == HTTPStatus.CREATED
+
+    response = await make_json_request(
+        url='/api/v1/films/ratings',
+        params={'ids': '{0},{1}'.format(new_film, liked_film)},
+        method='GET',
+    )
+    assert response.status == HTTPStatus.OK
+    assert [rating['film_id'] for rating in response.body] == [new_film, liked_film]
+    assert response.body[0]['likes'] == 0
+    assert response.body[1]['likes'] == 1
+    assert response.body[1]['average_rating'] == 10
+
+
+async def test_rating_counters(make_json_request):
+    """Тестируем счетчики рейтинга при добавлении, замене и удалении оценок."""
+    film_id = str(uuid4())
+    first_token, second_token = make_auth_token(str(uuid4())), make_auth_token(str(uuid4()))
+    like_url = '/api/v1/films/{0}/add_like/'.format(film_id)
+    steps = (
+        (like_url, 'POST', first_token, {'score': 10}, (10, 10, 1, 0)),
+        (like_url, 'POST', second_token, {'score': 0}, (10, 5, 1, 1)),
+        (like_url, 'POST', first_token, {'score': 4}, (4, 2, 0, 1)),
+        ('/api/v1/films/{0}/remove_like/'.format(film_id), 'DELETE', second_token, {}, (4, 4, 0, 0)),
+    )
+    for url, method, token, params, rating in steps:
+        response = await make_json_request(url=url, params=params, auth_token=token, method=method)
+        assert response.status in {HTTPStatus.OK, HTTPStatus.CREATED}
+
+        response = await make_json_request(
+            url='/api/v1/films/ratings', params={'ids': film_id}, method='GET',
+        )
+        film_rating = response.body[0]
+        assert (
+            film_rating['absolute_rating'],
+            film_rating['average_rating'],
+            film_rating['likes'],
+            film_rating['dislikes'],
+        ) == rating
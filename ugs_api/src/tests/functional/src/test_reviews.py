@@ -1,8 +1,9 @@
 """Тесты работы обзоров."""
 from http import HTTPStatus
+from uuid import uuid4
 
 import pytest
-from testdata import TEST_AUTH_TOKEN, TEST_FILM_ID, TEST_USER_ID
+from testdata import TEST_AUTH_TOKEN, TEST_FILM_ID, TEST_USER_ID, make_auth_token
 
 pytestmark = pytest.mark.asyncio
 
@@ -93,3 +94,109 @@ async def test_delete_like(make_json_request):
 
     assert TEST_USER_ID not in users_id_list
     assert TEST_FILM_ID not in films_id_list
+
+
+@pytest.mark.parametrize('sort', ['_id', '-date', '-avg', 'sum'])
+async def test_reviews_cursor_pagination(make_json_request, sort):
+    """Тестируем постраничный вывод обзоров с помощью курсора.
+
+    Курсор следующей страницы возвращается в заголовке X-Next-Page.
+    Страницы не должны пересекаться, на последней странице курсора нет.
+
+    """
+    film_id = str(uuid4())
+    for _ in range(15):
+        response = await make_json_request(
+            url='/api/v1/films/{0}/add_review/'.format(film_id),
+            params={'title': 'Title', 'text': 'Some_long_text'},
+            auth_token=make_auth_token(str(uuid4())),
+        )
+        assert response.status == HTTPStatus.CREATED
+
+    url = '/api/v1/reviews/film/{0}'.format(film_id)
+    response = await make_json_request(
+        url=url, params={'sort': sort}, method='GET',
+    )
+    assert response.status == HTTPStatus.OK
+    first_page = [review['review_id'] for review in response.body]
+    next_page = response.headers.get('X-Next-Page')
+    assert len(first_page) == 10
+    assert next_page
+
+    response = await make_json_request(
+        url=url, params={'sort': sort, 'page[after]': next_page}, method='GET',
+    )
+    assert response.status == HTTPStatus.OK
+    second_page = [review['review_id'] for review in response.body]
+    assert len(second_page) == 5
+    assert not set(first_page) & set(second_page)
+    assert 'X-Next-Page' not in response.headers
+
+
+async def test_reviews_invalid_cursor(make_json_request):
+    url = '/api/v1/reviews/film/{0}'.format(TEST_FILM_ID)
+    response = await make_json_request(
+        url=url, params={'page[after]': 'invalid'}, method='GET',
+    )
+    assert response.status == HTTPStatus.BAD_REQUEST
+
+
+async def test_reviews_sorted_by_likes(make_json_request):
+    """Тестируем сортировку обзоров по сумме лайков, хранящейся в обзоре."""
+    film_id = str(uuid4())
+    for _ in range(3):
+        response = await make_json_request(
+            url='/api/v1/films/{0}/add_review/'.format(film_id),
+            params={'title': 'Title', 'text': 'Some_long_text'},
+            auth_token=make_auth_token(str(uuid4())),
+        )
+        assert response.status == HTTPStatus.CREATED
+
+    url = '/api/v1/reviews/film/{0}'.format(film_id)
+    response = await make_json_request(url=url, method='GET')
+    review_id = response.body[-1]['review_id']
+
+    for score in (10, 10, 0):
+        response = await make_json_request(
+            url='/api/v1/reviews/{0}/add_like'.format(review_id),
+            params={'score': score},
+            auth_token=make_auth_token(str(uuid4())),
+        )
+        assert response.status == HTTPStatus.CREATED
+
+    response = await make_json_request(url=url, params={'sort': '-sum'}, method='GET')
+    assert response.status == HTTPStatus.OK
+    top_review = response.body[0]
+    assert top_review['review_id'] == review_id
+    assert top_review['absolute_rating'] == 20
+    assert top_review['average_rating'] == pytest.approx(20 / 3)
+
+
+async def test_cached_cards_match_schema(make_json_request):
+    """Тестируем, что карточки фильма и обзора из кэша соответствуют схеме ответа.
+
+    Карточки отдаются из кэша готовым JSON без response_model, поэтому
+    поля ответа сверяются со схемой OpenAPI при первом и повторном запросе.
+
+    """
+    response = await make_json_request(url='/api/openapi.json', method='GET')
+    schemas = response.body['components']['schemas']
+
+    auth_token = make_auth_token(str(uuid4()))
+    film_url = '/api/v1/films/{0}'.format(uuid4())
+    response = await make_json_request(
+        url='{0}/add_review/'.format(film_url),
+        params={'title': 'Title', 'text': 'Some_long_text'},
+        auth_token=auth_token,
+    )
+    assert response.status == HTTPStatus.CREATED
+    response = await make_json_request(url=film_url, auth_token=auth_token, method='GET')
+    review_url = '/api/v1/reviews/{0}'.format(response.body['recent_reviews'][0]['review_id'])
+
+    for url, schema_name in ((film_url, 'FilmAggregateModel'), (review_url, 'ReviewAggregateDetailModel')):
+        schema = schemas[schema_name]
+        for _ in range(2):
+            response = await make_json_request(url=url, auth_token=auth_token, method='GET')
+            assert response.status == HTTPStatus.OK
+            assert set(response.body) == set(schema['properties'])
+            assert set(schema.get('required', [])) <= set(response.body)
@@ -0,0 +1,55 @@
+"""Тесты сортировки, передаваемой в find при чтении журнала медленных запросов."""
+import pytest
+
+from db_managers.mongo import MongoManager
+from db_managers.slow_queries import SLOW_QUERIES_COLLECTION
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeCursor:
+    """Курсор Motor, запоминающий параметры запроса."""
+
+    def __init__(self):
+        self.sort_spec = None
+
+    def skip(self, offset):
+        return self
+
+    def limit(self, limit):
+        return self
+
+    def sort(self, sort_spec):
+        self.sort_spec = sort_spec
+        return self
+
+    async def to_list(self, length):
+        return []
+
+
+class FakeCollection:
+    """Коллекция Motor, запоминающая последний курсор."""
+
+    def __init__(self):
+        self.cursor = FakeCursor()
+
+    def find(self, search):
+        return self.cursor
+
+
+def make_manager(collection: FakeCollection) -> MongoManager:
+    return MongoManager(client={'ugc': {SLOW_QUERIES_COLLECTION: collection}}, db_name='ugc')
+
+
+async def test_slow_queries_natural_order():
+    """Журнал (capped коллекция) читается в обратном порядке записи, без _id."""
+    collection = FakeCollection()
+    await make_manager(collection).search(SLOW_QUERIES_COLLECTION, {}, 10, 0, sort=[('$natural', -1)])
+    assert collection.cursor.sort_spec == [('$natural', -1)]
+
+
+async def test_field_sort_adds_id():
+    """К сортировке по полю добавляется _id для однозначного порядка."""
+    collection = FakeCollection()
+    await make_manager(collection).search(SLOW_QUERIES_COLLECTION, {}, 10, 0, sort=[('date', -1)])
+    assert collection.cursor.sort_spec == [('date', -1), ('_id', -1)]
@@ -16,3 +16,11 @@ WRONG_AUTH_TOKEN = jwt.encode(
     'secret',
     algorithm='HS256',
 )
+
+
+def make_auth_token(user_id: str) -> str:
+    return jwt.encode(
+        {'sub': user_id, 'exp': int(datetime.now().timestamp() + 1000)},
+        'secret',
+        algorithm='HS256',
+    )